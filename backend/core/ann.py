@@ -0,0 +1,212 @@
+import os
+import numpy as np
+import torch
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.scoring import RecipeScorer, Representation, recipe_scorer
+from core.interactions import to_complex
+
+CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.abspath(os.path.join(CORE_DIR, ".."))
+ANN_INDEX_PATH = os.environ.get(
+    "ANN_INDEX_PATH", os.path.join(BASE_DIR, "embedding", "recipe_ivf.npz")
+)
+# Number of inverted lists probed per query; higher is slower but closer to exact.
+ANN_NPROBE = int(os.environ.get("ANN_NPROBE", "8"))
+
+METRIC_L2 = "l2"
+METRIC_IP = "ip"
+
+def _complex_to_real(x: torch.Tensor) -> torch.Tensor:
+    # (..., d) complex -> (..., 2d) real, interleaved (re, im)
+    return torch.view_as_real(x.resolve_conj()).reshape(*x.shape[:-1], -1)
+
+# For each supported interaction: how recipe head vectors are embedded, how a
+# (relation, tail) criterion becomes a query in that space, and the search metric.
+# TransE:   -||h + r - t||            -> nearest h to (t - r)
+# RotatE:   -||h * r - t||, |r| = 1   -> nearest h to (t * conj(r))
+# DistMult: <h, r, t>                 -> max inner product of h with (r * t)
+# ComplEx:  Re(<h, r, conj(t)>)       -> max inner product of [Re h, Im h] with [Re z, -Im z], z = r * conj(t)
+def _real(h: torch.Tensor) -> torch.Tensor:
+    return h
+
+def _complex(h: torch.Tensor) -> torch.Tensor:
+    return _complex_to_real(to_complex(h))
+
+def _transe_query(r: torch.Tensor, t: torch.Tensor) -> torch.Tensor:
+    return t - r
+
+def _rotate_query(r: torch.Tensor, t: torch.Tensor) -> torch.Tensor:
+    return _complex_to_real(to_complex(t) * torch.conj(to_complex(r)))
+
+def _distmult_query(r: torch.Tensor, t: torch.Tensor) -> torch.Tensor:
+    return r * t
+
+def _complex_query(r: torch.Tensor, t: torch.Tensor) -> torch.Tensor:
+    z = to_complex(r) * torch.conj(to_complex(t))
+    return _complex_to_real(torch.conj(z))
+
+SUPPORTED_INTERACTIONS: Dict[str, Tuple[Callable, Callable, str]] = {
+    "TransEInteraction": (_real, _transe_query, METRIC_L2),
+    "RotatEInteraction": (_complex, _rotate_query, METRIC_L2),
+    "DistMultInteraction": (_real, _distmult_query, METRIC_IP),
+    "ComplExInteraction": (_complex, _complex_query, METRIC_IP),
+}
+
+def _similarity(queries: np.ndarray, vectors: np.ndarray, metric: str) -> np.ndarray:
+    """
+    Higher is closer. (Q, d) x (N, d) -> (Q, N)
+    """
+    ip = queries @ vectors.T
+    if metric == METRIC_IP:
+        return ip
+    # -||q - v||^2 up to the per-query constant ||q||^2
+    return 2 * ip - (vectors * vectors).sum(axis=1)[None, :]
+
+def _kmeans(vectors: np.ndarray, n_lists: int, n_iter: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = _similarity(vectors, centroids, METRIC_L2).argmax(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=n_lists)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty lists with random points so every list stays usable
+        if not filled.all():
+            centroids[~filled] = vectors[rng.choice(len(vectors), int((~filled).sum()), replace=False)]
+    return centroids
+
+class IVFIndex:
+    """
+    Inverted-file index: vectors are bucketed by their nearest k-means centroid and a
+    query only visits the `nprobe` most promising buckets.
+    """
+
+    def __init__(self, centroids: np.ndarray, list_offsets: np.ndarray, list_items: np.ndarray, metric: str):
+        self.centroids = centroids
+        self.list_offsets = list_offsets  # CSR layout: items of list i are list_items[offsets[i]:offsets[i+1]]
+        self.list_items = list_items
+        self.metric = metric
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        metric: str,
+        n_lists: Optional[int] = None,
+        n_iter: int = 20,
+        train_size: int = 100_000,
+        seed: int = 0,
+        chunk_size: int = 65_536,
+    ) -> "IVFIndex":
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        n = len(vectors)
+        if n_lists is None:
+            n_lists = max(1, int(4 * np.sqrt(n)))
+        n_lists = min(n_lists, n)
+
+        rng = np.random.default_rng(seed)
+        train = vectors if n <= train_size else vectors[rng.choice(n, train_size, replace=False)]
+        centroids = _kmeans(train, n_lists, n_iter, seed)
+
+        assign = np.concatenate([
+            _similarity(vectors[i:i + chunk_size], centroids, METRIC_L2).argmax(axis=1)
+            for i in range(0, n, chunk_size)
+        ])
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=n_lists)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return cls(centroids, offsets.astype(np.int64), order.astype(np.int64), metric)
+
+    def search(self, queries: np.ndarray, nprobe: int) -> np.ndarray:
+        """
+        Returns the sorted union of items in the `nprobe` best lists of every query.
+        """
+        nprobe = max(1, min(nprobe, self.n_lists))
+        sims = _similarity(np.asarray(queries, dtype=np.float32), self.centroids, self.metric)
+        probed = np.unique(np.argpartition(-sims, nprobe - 1, axis=1)[:, :nprobe])
+        parts = [self.list_items[self.list_offsets[i]:self.list_offsets[i + 1]] for i in probed]
+        return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+    def save(self, path: str, **extra: np.ndarray) -> None:
+        np.savez(
+            path,
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_items=self.list_items,
+            metric=np.array(self.metric),
+            **extra,
+        )
+
+class RecipeANNIndex:
+    """
+    Candidate generator in front of RecipeScorer: each criterion is turned into a query
+    vector in recipe-embedding space, the IVF index returns the union of nearby recipes,
+    and only those are scored exactly.
+    """
+
+    def __init__(self, scorer: RecipeScorer, ivf: IVFIndex):
+        self.scorer = scorer
+        self.ivf = ivf
+        _, self._query_fn, _ = SUPPORTED_INTERACTIONS[scorer.interaction_name]
+
+    @torch.inference_mode()
+    def candidates(
+        self,
+        criteria: List[Tuple[str, str]],
+        nprobe: Optional[int] = None,
+        min_candidates: int = 1,
+    ) -> Optional[torch.Tensor]:
+        """
+        Returns candidate column positions into scorer.recipe_ids, or None when too few
+        candidates were found and the caller should fall back to exact scoring.
+        """
+        r, t = self.scorer.criterion_representations(criteria)
+        queries = self._query_fn(r, t).cpu().numpy()
+        found = self.ivf.search(queries, nprobe or ANN_NPROBE)
+        if len(found) < min_candidates:
+            return None
+        return torch.as_tensor(found, dtype=torch.long)
+
+def recipe_vectors(scorer: RecipeScorer) -> Tuple[np.ndarray, str]:
+    """
+    Recipe head representations as a real (num_recipes, d) matrix plus the search metric.
+    """
+    name = scorer.interaction_name
+    if name not in SUPPORTED_INTERACTIONS:
+        raise ValueError(f"ANN retrieval is not supported for interaction: {name}")
+    embed_fn, _, metric = SUPPORTED_INTERACTIONS[name]
+    h: Representation = scorer.recipe_representations
+    with torch.inference_mode():
+        return embed_fn(h).cpu().numpy().astype(np.float32), metric
+
+def build_recipe_index(scorer: RecipeScorer, path: str = ANN_INDEX_PATH, **kwargs) -> IVFIndex:
+    """
+    Builds the IVF index over the scorer's recipe embeddings and saves it to `path`.
+    """
+    vectors, metric = recipe_vectors(scorer)
+    ivf = IVFIndex.build(vectors, metric, **kwargs)
+    ivf.save(path, recipe_ids=scorer.recipe_ids, interaction=np.array(scorer.interaction_name))
+    return ivf
+
+def load_recipe_index(scorer: RecipeScorer, path: str = ANN_INDEX_PATH) -> Optional[RecipeANNIndex]:
+    """
+    Loads a prebuilt index, or returns None if it is missing or was built for another model.
+    """
+    if scorer.interaction_name not in SUPPORTED_INTERACTIONS or not os.path.exists(path):
+        return None
+    data = np.load(path)
+    if str(data["interaction"]) != scorer.interaction_name or not np.array_equal(data["recipe_ids"], scorer.recipe_ids):
+        print(f"[DEBUG] Ignoring stale ANN index at {path}; rebuild it with tools/build_ann_index.py")
+        return None
+    ivf = IVFIndex(data["centroids"], data["list_offsets"], data["list_items"], str(data["metric"]))
+    return RecipeANNIndex(scorer, ivf)
+
+# Optional: only present once the index has been built offline
+recipe_index = load_recipe_index(recipe_scorer)
@@ -0,0 +1,119 @@
+import os
+import time
+import asyncio
+from contextlib import contextmanager
+from typing import AsyncIterator, Awaitable, Dict, Iterator, Optional, TypeVar
+from fastapi import Request
+
+T = TypeVar("T")
+
+# Per-stage time limits (seconds) for the generation pipeline
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "120"))
+VLM_TIMEOUT = float(os.environ.get("VLM_TIMEOUT", "180"))
+# How often a running request checks whether its client went away
+DISCONNECT_POLL_INTERVAL = 0.5
+
+class StageTimeoutError(Exception):
+    """
+    A pipeline stage did not finish within its time limit.
+    """
+
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"Stage '{stage}' timed out after {timeout:.0f}s")
+        self.stage = stage
+        self.timeout = timeout
+
+class ClientDisconnectedError(Exception):
+    """
+    The HTTP client disconnected before the pipeline finished.
+    """
+
+async def run_stage(stage: str, coro: Awaitable[T], timeout: float) -> T:
+    """
+    Awaits `coro`, cancelling it and raising StageTimeoutError after `timeout` seconds.
+    """
+    try:
+        return await asyncio.wait_for(coro, timeout=timeout)
+    except asyncio.TimeoutError:
+        print(f"[DEBUG] Stage '{stage}' timed out after {timeout}s")
+        raise StageTimeoutError(stage, timeout)
+
+class StageTimings:
+    """
+    Wall-clock duration of the stages of one pipeline run, in milliseconds. Stages
+    running concurrently are timed independently, so they can add up to more than "total".
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.ms: Dict[str, float] = {}
+
+    def record(self, stage: str, since: float) -> None:
+        self.ms[stage] = round((time.perf_counter() - since) * 1000, 1)
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        since = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, since)
+
+    def finish(self) -> Dict[str, float]:
+        self.record("total", self.start)
+        print(f"[DEBUG] Stage timings (ms): {self.ms}")
+        return dict(self.ms)
+
+    def server_timing(self) -> str:
+        """
+        The timings as a Server-Timing header value.
+        """
+        return ", ".join(f"{stage};dur={ms}" for stage, ms in self.ms.items())
+
+async def stream_stage(stage: str, chunks: AsyncIterator[T], timeout: float) -> AsyncIterator[T]:
+    """
+    Re-yields `chunks`, raising StageTimeoutError if the whole stream takes longer
+    than `timeout` seconds.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    iterator = chunks.__aiter__()
+    try:
+        while True:
+            try:
+                chunk = await asyncio.wait_for(iterator.__anext__(), timeout=max(0.0, deadline - loop.time()))
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                print(f"[DEBUG] Stage '{stage}' timed out after {timeout}s")
+                raise StageTimeoutError(stage, timeout)
+            yield chunk
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+async def _wait_for_disconnect(request: Request) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+async def cancel_on_disconnect(request: Optional[Request], coro: Awaitable[T]) -> T:
+    """
+    Runs `coro` and cancels it (and every stage it is awaiting) as soon as the client
+    of `request` disconnects, raising ClientDisconnectedError.
+    """
+    if request is None:
+        return await coro
+    work = asyncio.ensure_future(coro)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if work in done:
+            return work.result()
+        work.cancel()
+        print("[DEBUG] Client disconnected, cancelled generation")
+        raise ClientDisconnectedError()
+    finally:
+        watcher.cancel()
+        if not work.done():
+            work.cancel()
@@ -0,0 +1,137 @@
+import os
+import time
+import queue
+import bisect
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# Requests arriving within this window after the first one are scored together.
+# 0 disables waiting: a batch is whatever queued up while the previous one ran.
+BATCH_WINDOW_MS = float(os.environ.get("RECOMMEND_BATCH_WINDOW_MS", "2"))
+MAX_BATCH_SIZE = int(os.environ.get("RECOMMEND_MAX_BATCH", "32"))
+MICRO_BATCHING = os.environ.get("RECOMMEND_MICRO_BATCHING", "1") not in ("0", "false", "off")
+
+class Histogram:
+    """
+    Fixed-bucket histogram with cumulative ("less or equal") counts, as in Prometheus.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot: +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            cumulative, running = {}, 0
+            for bound, n in zip(self.buckets + [float("inf")], self._counts):
+                running += n
+                cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "mean": self.sum / self.count if self.count else None,
+                "buckets": cumulative,
+            }
+
+class _Pending:
+    __slots__ = ("item", "future", "enqueued")
+
+    def __init__(self, item: Any):
+        self.item = item
+        self.future: Future = Future()
+        self.enqueued = time.perf_counter()
+
+class MicroBatchScheduler:
+    """
+    Coalesces concurrent calls into batches for `process_batch`, which maps a list of
+    items to a list of results in the same order. A caller blocks in submit() until its
+    result is ready; a single dispatcher thread collects items for up to `window_ms`
+    after the first one arrives (or until `max_batch_size` items are waiting) and runs
+    them as one call. Queue depth, batch size and wait time are recorded as histograms.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], List[Any]],
+        window_ms: float = BATCH_WINDOW_MS,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        name: str = "scheduler",
+    ):
+        self.process_batch = process_batch
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self.name = name
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self.queue_depth = Histogram([0, 1, 2, 4, 8, 16, 32, 64, 128])
+        self.batch_size = Histogram([1, 2, 4, 8, 16, 32, 64])
+        self.wait_ms = Histogram([0.5, 1, 2, 3, 5, 10, 25, 50, 100, 250])
+
+    def _ensure_started(self) -> None:
+        # Started on first use so that each forked gunicorn worker gets its own thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Queues `item` and blocks until its batch has been processed.
+        Exceptions raised by process_batch are re-raised in every caller of that batch.
+        """
+        self._ensure_started()
+        pending = _Pending(item)
+        self._queue.put(pending)
+        return pending.future.result(timeout=timeout)
+
+    def _collect(self) -> List[_Pending]:
+        first = self._queue.get()
+        batch = [first]
+        deadline = first.enqueued + self.window_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            dispatched = time.perf_counter()
+            self.queue_depth.observe(self._queue.qsize())
+            self.batch_size.observe(len(batch))
+            for pending in batch:
+                self.wait_ms.observe((dispatched - pending.enqueued) * 1000)
+            try:
+                results = self.process_batch([pending.item for pending in batch])
+                for pending, result in zip(batch, results):
+                    pending.future.set_result(result)
+            except Exception as e:
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window_ms,
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": self.queue_depth.snapshot(),
+            "batch_size": self.batch_size.snapshot(),
+            "wait_ms": self.wait_ms.snapshot(),
+        }
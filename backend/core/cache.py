@@ -0,0 +1,100 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from typing import Any, Callable, Dict, List, Optional
+
+CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.abspath(os.path.join(CORE_DIR, ".."))
+CACHE_DIR = os.environ.get("KGE_CACHE_DIR", os.path.join(BASE_DIR, "cache"))
+# Durable application state (queued jobs, stored images). Kept out of CACHE_DIR, whose
+# entries are derived artifacts that tools.build_cache --force discards.
+STATE_DIR = os.environ.get("APP_STATE_DIR", os.path.join(BASE_DIR, "state"))
+
+# Bump when the on-disk layout of any cache entry changes.
+CACHE_VERSION = 1
+MANIFEST = "manifest.json"
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    SHA-256 of a file, read in chunks.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _source_info(path: str) -> Dict[str, Any]:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": file_digest(path)}
+
+def _is_fresh(manifest: Dict[str, Any], sources: List[str], key: Optional[Dict[str, Any]]) -> bool:
+    if manifest.get("version") != CACHE_VERSION:
+        return False
+    # Round-trip through JSON so tuples compare equal to the lists stored in the manifest
+    if manifest.get("key") != json.loads(json.dumps(key)):
+        return False
+    recorded = manifest.get("sources", {})
+    if set(recorded) != {os.path.abspath(p) for p in sources}:
+        return False
+    for path in sources:
+        info = recorded[os.path.abspath(path)]
+        st = os.stat(path)
+        # Unchanged size and mtime: trust the recorded hash without re-reading the file
+        if st.st_size == info["size"] and st.st_mtime_ns == info["mtime_ns"]:
+            continue
+        if st.st_size != info["size"] or file_digest(path) != info["sha256"]:
+            return False
+    return True
+
+def load_or_build(
+    name: str,
+    sources: List[str],
+    build: Callable[[], Any],
+    save: Callable[[Any, str], None],
+    load: Callable[[str], Any],
+    rebuild: bool = False,
+    key: Optional[Dict[str, Any]] = None,
+) -> Any:
+    """
+    Returns load(<cache dir>) if the cache entry `name` was built from the current
+    contents of `sources` and with the same `key` (JSON-serializable settings the
+    build depends on, e.g. env-configured limits); otherwise runs build(), writes it
+    with save(obj, dir) and returns the freshly built object. Entries are written to a temporary directory and
+    renamed into place, so a concurrent reader never sees a half-written cache.
+    """
+    entry_dir = os.path.join(CACHE_DIR, name)
+    manifest_path = os.path.join(entry_dir, MANIFEST)
+
+    if not rebuild and os.path.exists(manifest_path):
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if _is_fresh(manifest, sources, key):
+                print(f"[DEBUG] Loading '{name}' from binary cache {entry_dir}")
+                return load(entry_dir)
+            print(f"[DEBUG] Cache '{name}' is stale, rebuilding")
+        except Exception as e:
+            print(f"[DEBUG] Cache '{name}' unreadable ({e}), rebuilding")
+
+    # Hash before building so a source edited mid-build is caught on the next start
+    infos = {os.path.abspath(p): _source_info(p) for p in sources}
+    obj = build()
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f".{name}-", dir=CACHE_DIR)
+    try:
+        save(obj, tmp_dir)
+        with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+            json.dump({"version": CACHE_VERSION, "sources": infos, "key": key}, f, indent=2)
+        if os.path.exists(entry_dir):
+            shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+        print(f"[DEBUG] Wrote binary cache '{name}' to {entry_dir}")
+    except Exception as e:
+        # The cache is an optimization; never fail startup because it could not be written
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        print(f"[DEBUG] Could not write cache '{name}': {e}")
+    return obj
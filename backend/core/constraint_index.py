@@ -0,0 +1,108 @@
+import os
+import numpy as np
+from typing import Mapping, Sequence
+
+from core.cache import load_or_build
+from core.engine_store import ENGINE_DIR, ENGINE_MODE, load_array
+from core.scoring import recipe_scorer
+
+# Entity types that can be used as hard constraints; labels are "<type>_<value>"
+CONSTRAINT_TYPES = ("ingredient", "diet_type", "meal_type", "cuisine_region", "health_attribute")
+CONSTRAINTS_CACHE = "constraints"
+# Postings arrays, saved both in the binary cache and in the exported engine
+ARRAYS = ("constraint_tails", "constraint_offsets", "constraint_recipes")
+
+class ConstraintIndex:
+    """
+    Inverted index from attribute entities (ingredients, diet types, ...) to the recipes
+    linked to them in the knowledge graph, as sorted int32 arrays of recipe positions
+    (columns of the score matrix) in CSR layout. A hard constraint is the intersection
+    of the posting lists of its entities, shortest first.
+    """
+
+    def __init__(self, tails: np.ndarray, offsets: np.ndarray, recipes: np.ndarray):
+        self.tails = tails      # sorted entity ids that have postings
+        self.offsets = offsets  # postings of tails[i] are recipes[offsets[i]:offsets[i + 1]]
+        self.recipes = recipes
+
+    @classmethod
+    def build(
+        cls,
+        mapped_triples: np.ndarray,
+        recipe_entity_ids: np.ndarray,
+        entity_to_id: Mapping[str, int],
+    ) -> "ConstraintIndex":
+        """
+        Builds the index from id-encoded (head, relation, tail) triples whose heads are
+        recipe entities and whose tails are entities of a CONSTRAINT_TYPES type.
+        """
+        prefixes = tuple(f"{t}_" for t in CONSTRAINT_TYPES)
+        num_entities = max(len(entity_to_id), int(mapped_triples[:, [0, 2]].max(initial=-1)) + 1)
+        is_constraint = np.zeros(num_entities, dtype=bool)
+        is_constraint[[i for label, i in entity_to_id.items() if label.startswith(prefixes)]] = True
+        column = np.full(num_entities, -1, dtype=np.int64)
+        column[recipe_entity_ids] = np.arange(len(recipe_entity_ids))
+
+        heads, tails = mapped_triples[:, 0], mapped_triples[:, 2]
+        keep = (column[heads] >= 0) & is_constraint[tails]
+        pairs = np.unique(np.stack([tails[keep], column[heads[keep]]], axis=1), axis=0)
+        unique_tails, starts = np.unique(pairs[:, 0], return_index=True)
+        offsets = np.append(starts, len(pairs)).astype(np.int64)
+        return cls(unique_tails.astype(np.int64), offsets, pairs[:, 1].astype(np.int32))
+
+    def save(self, out_dir: str) -> None:
+        for name, array in zip(ARRAYS, (self.tails, self.offsets, self.recipes)):
+            np.save(os.path.join(out_dir, f"{name}.npy"), array)
+
+    @classmethod
+    def load(cls, directory: str) -> "ConstraintIndex":
+        return cls(*(load_array(directory, name) for name in ARRAYS))
+
+    def __len__(self) -> int:
+        return len(self.tails)
+
+    def postings(self, entity_id: int) -> np.ndarray:
+        i = int(np.searchsorted(self.tails, entity_id))
+        if i == len(self.tails) or self.tails[i] != entity_id:
+            return self.recipes[:0]
+        return self.recipes[self.offsets[i]:self.offsets[i + 1]]
+
+    def candidates(self, entity_ids: Sequence[int]) -> np.ndarray:
+        """
+        Sorted positions of the recipes linked to every one of the given entities.
+        """
+        lists = sorted((self.postings(i) for i in entity_ids), key=len)
+        if not lists:
+            raise ValueError("A hard constraint needs at least one entity")
+        result = np.asarray(lists[0])
+        for postings in lists[1:]:
+            if len(result) == 0:
+                break
+            result = np.intersect1d(result, postings, assume_unique=True)
+        return result
+
+def _build_from_triples() -> ConstraintIndex:
+    from core.model import triples_factory
+    return ConstraintIndex.build(
+        triples_factory.mapped_triples.numpy(),
+        recipe_scorer.recipe_entity_ids.numpy(),
+        recipe_scorer.entity_to_id,
+    )
+
+def load_constraint_index(mode: str = ENGINE_MODE) -> ConstraintIndex:
+    """
+    The index of the exported engine in "mmap" mode (memory-mapped), otherwise built
+    from the triples factory and kept in the binary cache.
+    """
+    if mode == "mmap":
+        return ConstraintIndex.load(ENGINE_DIR)
+    from core.model import TRIPLES_PATH
+    return load_or_build(
+        CONSTRAINTS_CACHE,
+        sources=[TRIPLES_PATH],
+        build=_build_from_triples,
+        save=lambda index, d: index.save(d),
+        load=ConstraintIndex.load,
+    )
+
+constraint_index = load_constraint_index()
@@ -1,46 +1,180 @@
 import os
 import re
+import json
 import pandas as pd
-from typing import List
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from collections import Counter
 
+from core.cache import load_or_build
+from core.engine_store import ENGINE_DIR, ENGINE_MODE, MappedRecipeStore, load_ingredient_counts
+from core.prompt_compaction import SNIPPET_SETTINGS, prompt_snippet
+
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 CSV_PATH = os.path.join(BASE_DIR, "data", "dataFullLargerRegionAndCountryWithServingsBin.csv")
 
+RECIPES_CACHE = "recipes"
+RECIPES_CACHE_FILE = "recipes.pkl"
+
 def load_recipes_df() -> pd.DataFrame:
     """
     CSV dosyasından tarif verilerini yükler. Dosya bulunamazsa hata fırlatır.
+    Ayrıştırılmış tablo ikili önbellekte tutulur; CSV değişince önbellek yeniden oluşturulur.
     """
     if not os.path.exists(CSV_PATH):
         raise FileNotFoundError(f"CSV not found at {CSV_PATH}")
-    return pd.read_csv(CSV_PATH)
+    return load_or_build(
+        RECIPES_CACHE,
+        sources=[CSV_PATH],
+        build=lambda: pd.read_csv(CSV_PATH),
+        save=lambda df, d: df.to_pickle(os.path.join(d, RECIPES_CACHE_FILE)),
+        load=lambda d: pd.read_pickle(os.path.join(d, RECIPES_CACHE_FILE)),
+    )
+
+def _row_records(df: pd.DataFrame) -> Dict[int, Dict[str, Any]]:
+    """
+    RecipeId -> JSON'a hazır satır sözlüğü (NaN -> None, numpy tipleri -> Python tipleri).
+    """
+    unique = df.drop_duplicates(subset="RecipeId", keep="first")
+    records = unique.astype(object).where(unique.notna(), None).to_dict("records")
+    return {int(row["RecipeId"]): row for row in records}
+
+PROMPT_SNIPPETS_CACHE = "prompt_snippets"
+PROMPT_SNIPPETS_CACHE_FILE = "prompt_snippets.pkl"
+
+def build_prompt_snippets(df: pd.DataFrame) -> Dict[int, str]:
+    """
+    RecipeId -> LLM istemindeki kısaltılmış örnek alanları (JSON metni olarak).
+    """
+    return {rid: json.dumps(prompt_snippet(row)) for rid, row in _row_records(df).items()}
+
+def load_prompt_snippets(df: pd.DataFrame) -> Dict[int, str]:
+    """
+    Tarif başına istem parçalarını döndürür. CSV'den bir kere hesaplanır ve ikili
+    önbellekte tutulur; sonraki açılışlar yalnızca önbelleği okur. Kısaltma ayarları
+    (PROMPT_FIELD_CHARS, PROMPT_LIST_ITEMS) değişince önbellek yeniden oluşturulur.
+    """
+    return load_or_build(
+        PROMPT_SNIPPETS_CACHE,
+        sources=[CSV_PATH],
+        build=lambda: build_prompt_snippets(df),
+        save=lambda snippets, d: pd.to_pickle(snippets, os.path.join(d, PROMPT_SNIPPETS_CACHE_FILE)),
+        load=lambda d: pd.read_pickle(os.path.join(d, PROMPT_SNIPPETS_CACHE_FILE)),
+        key=SNIPPET_SETTINGS,
+    )
+
+class RecipeStore:
+    """
+    RecipeId -> JSON'a hazır satır sözlüğü. Satırlar yükleme sırasında bir kere
+    serileştirilir (NaN -> None, numpy tipleri -> Python tipleri), böylece her istek
+    DataFrame taraması yerine tek bir sözlük araması olur.
+    Dönen sözlükler paylaşılır; çağıranlar bunları değiştirmemelidir.
+    LLM istemlerindeki örnek tarif metinleri (prompt snippet) önceden hesaplanmış
+    olarak verilir (load_prompt_snippets); verilmeyen tarifler için istek anında üretilir.
+    """
+
+    def __init__(self, df: pd.DataFrame, snippets: Optional[Dict[int, str]] = None):
+        self._rows: Dict[int, Dict[str, Any]] = _row_records(df)
+        self._snippets: Dict[int, str] = snippets or {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def records(self) -> Dict[int, Dict[str, Any]]:
+        return self._rows
+
+    def get(self, recipe_id: Any) -> Optional[Dict[str, Any]]:
+        try:
+            return self._rows.get(int(recipe_id))
+        except (TypeError, ValueError):
+            return None
+
+    def fetch_many(self, recipe_ids: Iterable[Any]) -> List[Dict[str, Any]]:
+        """
+        Verilen ID'lerin satırlarını sırayla döndürür; bulunamayanlar atlanır.
+        """
+        rows = (self.get(rid) for rid in recipe_ids)
+        return [row for row in rows if row is not None]
+
+    def snippets(self, recipe_ids: Iterable[Any]) -> List[Dict[str, str]]:
+        """
+        Verilen ID'lerin kısaltılmış istem alanlarını sırayla döndürür; bulunamayanlar atlanır.
+        """
+        snippets = []
+        for rid in recipe_ids:
+            row = self.get(rid)
+            if row is None:
+                continue
+            cached = self._snippets.get(int(rid))
+            snippets.append(json.loads(cached) if cached is not None else prompt_snippet(row))
+        return snippets
 
 # DataFrame'i modül yüklenirken bir kere yükleyelim.
-recipes_df = load_recipes_df()
+# "mmap" modunda CSV hiç okunmaz: satırlar dışa aktarılmış motor dosyalarından eşlenir.
+if ENGINE_MODE == "mmap":
+    recipes_df = None
+    recipe_store = MappedRecipeStore(ENGINE_DIR)
+else:
+    recipes_df = load_recipes_df()
+    recipe_store = RecipeStore(recipes_df, load_prompt_snippets(recipes_df))
 
-def get_unique_ingredients() -> List[str]:
+def count_ingredients(df: pd.DataFrame) -> List[Tuple[str, int]]:
     """
-    'BestUsdaIngredientName' sütunundan malzemeleri ayıklar.
+    'BestUsdaIngredientName' sütunundan malzemeleri ayıklar ve kullanım sayılarıyla döndürür.
     Noktalı virgülle ayrılan malzeme isimlerini korur.
-    
+
     Malzemeler önce kullanım sıklığına göre (azalan) sonra da alfabetik sıraya göre sıralanır.
     """
-    if "BestUsdaIngredientName" not in recipes_df.columns:
+    if "BestUsdaIngredientName" not in df.columns:
         return []
-    
+
     # Tüm satırlardan malzeme isimlerini tek seferde elde etmek için list comprehension kullanıyoruz.
     ingredients = [
         part.strip()
-        for ing_str in recipes_df["BestUsdaIngredientName"].dropna()
+        for ing_str in df["BestUsdaIngredientName"].dropna()
         for part in ing_str.split(';')
         if part.strip() and part.strip().lower() not in {"unknown", "nan"}
     ]
-    
+
     # Malzeme kullanım frekanslarını sayıyoruz.
     counter = Counter(ingredients)
-    
+
     # Frekansı yüksekten düşüğe, eşitlik durumunda alfabetik sıraya göre sıralıyoruz.
-    return sorted(counter.keys(), key=lambda ing: (-counter[ing], ing))
+    return sorted(counter.items(), key=lambda item: (-item[1], item[0]))
+
+INGREDIENTS_CACHE = "ingredients"
+INGREDIENTS_CACHE_FILE = "ingredient_counts.json"
+
+def _save_ingredient_counts(counts: List[Tuple[str, int]], cache_dir: str) -> None:
+    with open(os.path.join(cache_dir, INGREDIENTS_CACHE_FILE), "w", encoding="utf-8") as f:
+        json.dump(counts, f, ensure_ascii=False)
+
+def _load_ingredient_counts(cache_dir: str) -> List[Tuple[str, int]]:
+    with open(os.path.join(cache_dir, INGREDIENTS_CACHE_FILE), encoding="utf-8") as f:
+        return [(name, count) for name, count in json.load(f)]
+
+def load_ingredient_vocabulary() -> List[Tuple[str, int]]:
+    """
+    Malzeme sözlüğünü kullanım sayılarıyla döndürür. "mmap" modunda dışa aktarılmış
+    motordan okunur; aksi halde CSV'den bir kere sayılır ve ikili önbellekte tutulur.
+    """
+    if recipes_df is None:
+        return load_ingredient_counts(ENGINE_DIR)
+    return load_or_build(
+        INGREDIENTS_CACHE,
+        sources=[CSV_PATH],
+        build=lambda: count_ingredients(recipes_df),
+        save=_save_ingredient_counts,
+        load=_load_ingredient_counts,
+    )
+
+# Malzeme frekansları da yükleme sırasında bir kere hesaplanır; istekler bunu yeniden saymaz.
+ingredient_counts = load_ingredient_vocabulary()
+
+def get_unique_ingredients() -> List[str]:
+    """
+    Benzersiz malzeme isimlerini kullanım sıklığına göre (azalan) sonra alfabetik sırayla döndürür.
+    """
+    return [name for name, _ in ingredient_counts]
 
 def load_recipes_from_dataframe(df: pd.DataFrame) -> dict:
     """
@@ -0,0 +1,351 @@
+import os
+import json
+import shutil
+import tempfile
+import warnings
+import bisect
+import numpy as np
+import torch
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from core.interactions import interaction_config
+from core.quantization import PRECISIONS, QuantizedMatrix, QuantizedRepresentation, quantize_representation
+from core.prompt_compaction import SNIPPET_SETTINGS, prompt_snippet
+
+CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.abspath(os.path.join(CORE_DIR, ".."))
+# "pickle" unpickles the PyKEEN model at startup; "mmap" maps the exported engine files
+ENGINE_MODE = os.environ.get("KGE_ENGINE", "pickle")
+ENGINE_DIR = os.environ.get("KGE_ENGINE_DIR", os.path.join(BASE_DIR, "embedding", "engine"))
+
+# Bump when the exported file layout changes
+ENGINE_VERSION = 3
+MANIFEST = "manifest.json"
+ENGINE_MODES = ("pickle", "mmap")
+
+def _save(out_dir: str, name: str, array: np.ndarray) -> None:
+    np.save(os.path.join(out_dir, f"{name}.npy"), np.ascontiguousarray(array))
+
+def load_array(engine_dir: str, name: str) -> np.ndarray:
+    """
+    Read-only memory map of an exported array. Pages are shared by every process
+    mapping the same file and are never copied, since nothing writes to them.
+    """
+    return np.load(os.path.join(engine_dir, f"{name}.npy"), mmap_mode="r")
+
+def as_tensor(array: np.ndarray) -> torch.Tensor:
+    """
+    Zero-copy tensor view of a (read-only) numpy array.
+    """
+    with warnings.catch_warnings():
+        # torch warns that the memory map is not writable; scoring never writes to it
+        warnings.simplefilter("ignore", UserWarning)
+        return torch.from_numpy(array)
+
+class StringTable:
+    """
+    A sequence of strings stored as one UTF-8 blob plus offsets, so that millions of
+    strings live in two flat (mappable) arrays instead of as Python objects.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @staticmethod
+    def encode(strings: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+    @classmethod
+    def save(cls, out_dir: str, name: str, strings: Sequence[str]) -> None:
+        blob, offsets = cls.encode(strings)
+        _save(out_dir, f"{name}_blob", blob)
+        _save(out_dir, f"{name}_offsets", offsets)
+
+    @classmethod
+    def load(cls, engine_dir: str, name: str) -> "StringTable":
+        return cls(load_array(engine_dir, f"{name}_blob"), load_array(engine_dir, f"{name}_offsets"))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+class MappedLabelIndex(Mapping):
+    """
+    Read-only label -> id mapping over a sorted StringTable (binary search), a drop-in
+    for the entity_to_id / relation_to_id dicts of a TriplesFactory.
+    """
+
+    def __init__(self, labels: StringTable, ids: np.ndarray):
+        self.labels = labels  # sorted
+        self.ids = ids
+
+    @classmethod
+    def save(cls, out_dir: str, name: str, label_to_id: Dict[str, int]) -> None:
+        labels = sorted(label_to_id)
+        StringTable.save(out_dir, name, labels)
+        _save(out_dir, f"{name}_ids", np.array([label_to_id[label] for label in labels], dtype=np.int64))
+
+    @classmethod
+    def load(cls, engine_dir: str, name: str) -> "MappedLabelIndex":
+        return cls(StringTable.load(engine_dir, name), load_array(engine_dir, f"{name}_ids"))
+
+    def __getitem__(self, label: str) -> int:
+        if isinstance(label, str):
+            i = bisect.bisect_left(self.labels, label)
+            if i < len(self.labels) and self.labels[i] == label:
+                return int(self.ids[i])
+        raise KeyError(label)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.labels)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def with_prefix(self, prefix: str) -> Iterator[str]:
+        """
+        Labels starting with `prefix`, found by binary search instead of a full scan.
+        """
+        i = bisect.bisect_left(self.labels, prefix)
+        while i < len(self.labels):
+            label = self.labels[i]
+            if not label.startswith(prefix):
+                break
+            yield label
+            i += 1
+
+class MappedRecipeStore:
+    """
+    RecipeStore over exported JSON rows: RecipeId lookups binary-search a sorted id
+    array and decode only the requested row. Prompt snippets are exported alongside;
+    engines exported without them, or with other compaction settings than the current
+    SNIPPET_SETTINGS, compute a snippet from the row on lookup.
+    """
+
+    def __init__(self, engine_dir: str):
+        self.ids = load_array(engine_dir, "recipe_row_ids")
+        self.rows = StringTable.load(engine_dir, "recipe_rows")
+        self.snippet_rows = None
+        exported = load_manifest(engine_dir).get("prompt_snippets")
+        if exported == json.loads(json.dumps(SNIPPET_SETTINGS)):
+            self.snippet_rows = StringTable.load(engine_dir, "recipe_snippets")
+        elif exported is not None:
+            print("[DEBUG] Exported prompt snippets use other compaction settings; computing them on lookup")
+
+    @staticmethod
+    def save(out_dir: str, records: Dict[int, Dict[str, Any]]) -> None:
+        ids = sorted(records)
+        _save(out_dir, "recipe_row_ids", np.array(ids, dtype=np.int64))
+        StringTable.save(out_dir, "recipe_rows", [json.dumps(records[i], default=str) for i in ids])
+        StringTable.save(out_dir, "recipe_snippets", [json.dumps(prompt_snippet(records[i])) for i in ids])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _index(self, recipe_id: Any) -> Optional[int]:
+        try:
+            key = int(recipe_id)
+        except (TypeError, ValueError):
+            return None
+        i = int(np.searchsorted(self.ids, key))
+        if i < len(self.ids) and self.ids[i] == key:
+            return i
+        return None
+
+    def get(self, recipe_id: Any) -> Optional[Dict[str, Any]]:
+        i = self._index(recipe_id)
+        return None if i is None else json.loads(self.rows[i])
+
+    def fetch_many(self, recipe_ids) -> List[Dict[str, Any]]:
+        rows = (self.get(rid) for rid in recipe_ids)
+        return [row for row in rows if row is not None]
+
+    def snippets(self, recipe_ids) -> List[Dict[str, str]]:
+        snippets = []
+        for rid in recipe_ids:
+            i = self._index(rid)
+            if i is None:
+                continue
+            if self.snippet_rows is not None:
+                snippets.append(json.loads(self.snippet_rows[i]))
+            else:
+                snippets.append(prompt_snippet(json.loads(self.rows[i])))
+        return snippets
+
+def _save_representation(out_dir: str, name: str, rep) -> int:
+    reps = [rep] if isinstance(rep, torch.Tensor) else list(rep)
+    for i, r in enumerate(reps):
+        _save(out_dir, f"{name}_{i}", r.detach().cpu().numpy())
+    return len(reps)
+
+def _recipe_slice(scorer) -> Optional[int]:
+    """
+    Start of the recipe block in the tail representations when the recipe head vectors
+    are just rows [start, start + num_recipes) of them (same representation, contiguous
+    ids, which TriplesFactory's sorted label ids give), else None.
+    """
+    ids = scorer.recipe_entity_ids
+    if len(ids) == 0 or not torch.equal(ids, torch.arange(int(ids[0]), int(ids[0]) + len(ids))):
+        return None
+    h, t = scorer.recipe_representations, scorer.tail_representations
+    hs = [h] if isinstance(h, torch.Tensor) else list(h)
+    ts = [t] if isinstance(t, torch.Tensor) else list(t)
+    start = int(ids[0])
+    if len(hs) != len(ts) or not all(torch.equal(a, b[start:start + len(ids)]) for a, b in zip(hs, ts)):
+        return None
+    return start
+
+def load_representation(engine_dir: str, name: str, count: int):
+    reps = [as_tensor(load_array(engine_dir, f"{name}_{i}")) for i in range(count)]
+    return reps[0] if count == 1 else reps
+
+def _save_quantized(out_dir: str, name: str, rep: QuantizedRepresentation) -> List[Dict[str, Any]]:
+    """
+    Writes the data (and int8 scale) arrays of each quantized component; returns
+    what is needed to rebuild them, for the manifest.
+    """
+    parts = [rep] if isinstance(rep, QuantizedMatrix) else list(rep)
+    meta = []
+    for i, q in enumerate(parts):
+        _save(out_dir, f"{name}_{i}_data", q.data.numpy())
+        if q.scale is not None:
+            _save(out_dir, f"{name}_{i}_scale", q.scale.numpy())
+        meta.append({"shape": list(q.shape), "is_complex": q.is_complex, "scaled": q.scale is not None})
+    return meta
+
+def load_quantized_representation(engine_dir: str, name: str, meta: List[Dict[str, Any]]) -> QuantizedRepresentation:
+    """
+    Quantized representation over memory maps of the exported arrays, shared by every worker.
+    """
+    parts = [
+        QuantizedMatrix(
+            as_tensor(load_array(engine_dir, f"{name}_{i}_data")),
+            as_tensor(load_array(engine_dir, f"{name}_{i}_scale")) if m["scaled"] else None,
+            torch.Size(m["shape"]),
+            m["is_complex"],
+        )
+        for i, m in enumerate(meta)
+    ]
+    return parts[0] if len(parts) == 1 else parts
+
+def load_recipe_representation(engine_dir: str, manifest: Dict[str, Any]):
+    """
+    Recipe head representations; a view into the tail arrays when they were not stored separately.
+    """
+    counts = manifest["representations"]
+    start = manifest.get("recipe_slice_start")
+    if start is None:
+        return load_representation(engine_dir, "recipe_h", counts["recipe_h"])
+    tails = load_representation(engine_dir, "entity_t", counts["entity_t"])
+    stop = start + manifest["num_recipes"]
+    if isinstance(tails, torch.Tensor):
+        return tails[start:stop]
+    return [t[start:stop] for t in tails]
+
+def export_engine(
+    scorer,
+    records: Dict[int, Dict[str, Any]],
+    ingredient_counts: List[Tuple[str, int]],
+    constraints,
+    out_dir: str = ENGINE_DIR,
+    precision: str = "float32",
+) -> Dict[str, Any]:
+    """
+    Writes everything the API needs to serve recommendations into `out_dir`: the
+    materialized recipe/tail/relation representations of a fast-path RecipeScorer,
+    its label indexes, the interaction name and hyperparameters, the recipe rows, the
+    ingredient frequencies and the hard-constraint index (core/constraint_index.py).
+    Interactions without a native implementation (core/interactions.py) are pickled
+    instead and need pykeen to load. With a float16/int8 `precision` the recipe head
+    vectors are quantized here, so workers map the quantized arrays instead of each
+    quantizing a private copy. The directory is replaced atomically. Returns the manifest.
+    """
+    if scorer.interaction_name is None:
+        raise ValueError(
+            "Only models on the cached scoring fast path (ERModel without inverse triples) can be exported"
+        )
+    if scorer.precision != "float32":
+        raise ValueError("Export from a float32 scorer; pass the target precision to export_engine instead")
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown embedding precision: {precision}. Choose from {PRECISIONS}")
+
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".engine-", dir=parent)
+    try:
+        # Recipe vectors are usually a contiguous block of the entity table; store them once
+        start = _recipe_slice(scorer)
+        quantized = precision != "float32"
+        native = interaction_config(scorer.interaction)
+        manifest = {
+            "version": ENGINE_VERSION,
+            "interaction": scorer.interaction_name,
+            # None: no native implementation, the module is pickled to interaction.pt
+            "interaction_kwargs": native["kwargs"] if native is not None else None,
+            "predict_with_sigmoid": bool(scorer.predict_with_sigmoid),
+            "representations": {
+                "recipe_h": 0 if start is not None or quantized else _save_representation(
+                    tmp_dir, "recipe_h", scorer.recipe_representations
+                ),
+                "entity_t": _save_representation(tmp_dir, "entity_t", scorer.tail_representations),
+                "relation": _save_representation(tmp_dir, "relation", scorer.relation_representations),
+            },
+            "recipe_slice_start": start,
+            # float16/int8: the recipe head vectors are only stored as recipe_q_* arrays
+            "recipe_precision": precision,
+            "recipe_quantized": _save_quantized(
+                tmp_dir, "recipe_q", quantize_representation(scorer.recipe_representations, precision)
+            ) if quantized else None,
+            "num_recipes": scorer.num_recipes,
+            "num_rows": len(records),
+            # Compaction settings the exported recipe_snippets were built with
+            "prompt_snippets": SNIPPET_SETTINGS,
+        }
+        if native is None:
+            torch.save(scorer.interaction, os.path.join(tmp_dir, "interaction.pt"))
+        _save(tmp_dir, "recipe_entity_ids", scorer.recipe_entity_ids.numpy())
+        _save(tmp_dir, "recipe_ids", np.asarray(scorer.recipe_ids))
+        MappedLabelIndex.save(tmp_dir, "entity_labels", dict(scorer.entity_to_id))
+        MappedLabelIndex.save(tmp_dir, "relation_labels", dict(scorer.relation_to_id))
+        MappedRecipeStore.save(tmp_dir, records)
+        constraints.save(tmp_dir)
+        StringTable.save(tmp_dir, "ingredient_names", [name for name, _ in ingredient_counts])
+        _save(tmp_dir, "ingredient_counts", np.array([n for _, n in ingredient_counts], dtype=np.int64))
+        with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        if os.path.exists(out_dir):
+            shutil.rmtree(out_dir)
+        os.replace(tmp_dir, out_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return manifest
+
+def load_manifest(engine_dir: str = ENGINE_DIR) -> Dict[str, Any]:
+    path = os.path.join(engine_dir, MANIFEST)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No exported engine at {engine_dir}; run python -m tools.export_engine first")
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != ENGINE_VERSION:
+        raise ValueError(
+            f"Engine at {engine_dir} has version {manifest.get('version')}, "
+            f"expected {ENGINE_VERSION}; re-export it"
+        )
+    return manifest
+
+def load_ingredient_counts(engine_dir: str = ENGINE_DIR) -> List[Tuple[str, int]]:
+    names = StringTable.load(engine_dir, "ingredient_names")
+    counts = load_array(engine_dir, "ingredient_counts")
+    return list(zip(names, counts.tolist()))
@@ -0,0 +1,161 @@
+import os
+import re
+import difflib
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from core.scoring import recipe_scorer
+
+# Minimum difflib similarity (0..1) of the normalized forms for a fuzzy match
+FUZZY_THRESHOLD = float(os.environ.get("ENTITY_FUZZY_THRESHOLD", "0.85"))
+RESOLVER_CACHE_SIZE = int(os.environ.get("ENTITY_RESOLVER_CACHE_SIZE", "10000"))
+# Candidates sharing the most trigrams that are compared with difflib
+FUZZY_CANDIDATES = 20
+
+# Entity types users refer to by name; a type's labels are "<type>_<value>"
+ENTITY_TYPES = ("ingredient", "diet_type", "meal_type", "health_attribute", "cuisine_region")
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("oes", "ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def normalize(text: str) -> str:
+    """
+    Casefolded, accent-free form of a name with punctuation collapsed to single
+    spaces and every word in (rough) singular, e.g. "Jalapeño-Peppers" -> "jalapeno pepper".
+    """
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(_singular(w) for w in _NON_ALNUM.sub(" ", text).split())
+
+def _trigrams(key: str) -> List[str]:
+    padded = f"  {key} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+class Resolution(NamedTuple):
+    label: str    # KG entity label, e.g. "ingredient_tomato"
+    value: str    # label without the type prefix
+    method: str   # "exact", "casefold", "normalized" or "fuzzy"
+    score: float  # 1.0 except for fuzzy matches
+
+class _TypeIndex:
+    """
+    Lookup tables for the values of one entity type.
+    """
+
+    def __init__(self, values: Iterable[str]):
+        self.values: List[str] = []
+        self.exact: Dict[str, int] = {}
+        self.casefolded: Dict[str, int] = {}
+        self.normalized: Dict[str, int] = {}
+        self.keys: List[str] = []
+        self.postings: Dict[str, List[int]] = {}
+        for value in values:
+            i = len(self.values)
+            self.values.append(value)
+            self.exact[value] = i
+            # First value wins when several collapse to the same key
+            self.casefolded.setdefault(value.casefold(), i)
+            key = normalize(value)
+            self.normalized.setdefault(key, i)
+            self.keys.append(key)
+            for gram in set(_trigrams(key)):
+                self.postings.setdefault(gram, []).append(i)
+
+    def fuzzy(self, key: str, threshold: float) -> Optional[Tuple[int, float]]:
+        grams = set(_trigrams(key))
+        shared = Counter(i for gram in grams for i in self.postings.get(gram, ()))
+        best, best_score = None, threshold
+        for i, _ in shared.most_common(FUZZY_CANDIDATES):
+            score = difflib.SequenceMatcher(None, key, self.keys[i]).ratio()
+            if score >= best_score:
+                best, best_score = i, score
+        return None if best is None else (best, best_score)
+
+class EntityResolver:
+    """
+    Maps free-text names to KG entity labels per entity type, trying an exact match,
+    then casefolded, normalized (accents, punctuation, plurals) and finally fuzzy
+    (trigram candidates ranked by edit similarity). Resolutions are kept in an LRU.
+    """
+
+    def __init__(self, entity_to_id: Mapping[str, int], fuzzy_threshold: float = FUZZY_THRESHOLD):
+        self.fuzzy_threshold = fuzzy_threshold
+        self._indexes = {
+            entity_type: _TypeIndex(self._values(entity_to_id, f"{entity_type}_"))
+            for entity_type in ENTITY_TYPES
+        }
+        self.resolve = lru_cache(maxsize=RESOLVER_CACHE_SIZE)(self._resolve)
+
+    @staticmethod
+    def _values(entity_to_id: Mapping[str, int], prefix: str) -> List[str]:
+        # Memory-mapped label indexes are sorted and can skip straight to the prefix
+        with_prefix = getattr(entity_to_id, "with_prefix", None)
+        labels = with_prefix(prefix) if with_prefix else (l for l in entity_to_id if l.startswith(prefix))
+        return [label[len(prefix):] for label in labels]
+
+    def _match(self, index: _TypeIndex, text: str):
+        if text in index.exact:
+            return index.exact[text], "exact", 1.0
+        folded = text.casefold()
+        if folded in index.casefolded:
+            return index.casefolded[folded], "casefold", 1.0
+        key = normalize(text)
+        if key in index.normalized:
+            return index.normalized[key], "normalized", 1.0
+        if len(key) >= 3:
+            found = index.fuzzy(key, self.fuzzy_threshold)
+            if found is not None:
+                return found[0], "fuzzy", found[1]
+        return None
+
+    def _resolve(self, entity_type: str, text: str) -> Optional[Resolution]:
+        """
+        The entity of `entity_type` that `text` refers to, or None if there is none.
+        """
+        if entity_type not in self._indexes:
+            raise ValueError(f"Unknown entity type: {entity_type}. Choose from {ENTITY_TYPES}")
+        index = self._indexes[entity_type]
+        match = self._match(index, text.strip())
+        if match is None:
+            return None
+        i, method, score = match
+        value = index.values[i]
+        return Resolution(f"{entity_type}_{value}", value, method, score)
+
+    def suggestions(self, entity_type: str, text: str, n: int = 3) -> List[str]:
+        """
+        Closest known values, for error messages.
+        """
+        index = self._indexes[entity_type]
+        keys = difflib.get_close_matches(normalize(text), index.keys, n=n, cutoff=0.6)
+        return [index.values[index.normalized[k]] for k in keys]
+
+    def stats(self) -> Dict[str, object]:
+        info = self.resolve.cache_info()
+        return {
+            "entities": {t: len(index.values) for t, index in self._indexes.items()},
+            "cache": {"hits": info.hits, "misses": info.misses, "size": info.currsize, "capacity": info.maxsize},
+        }
+
+class UnknownEntityError(ValueError):
+    """
+    Raised when request values do not resolve to any entity of the knowledge graph.
+    """
+
+    def __init__(self, unknown: List[Dict[str, object]]):
+        self.unknown = unknown
+        names = ", ".join(f"{u['type']} '{u['value']}'" for u in unknown)
+        super().__init__(f"Unknown entities in knowledge graph: {names}")
+
+# Built once at import over the labels of the loaded scorer
+entity_resolver = EntityResolver(recipe_scorer.entity_to_id)
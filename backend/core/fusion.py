@@ -0,0 +1,90 @@
+import numpy as np
+import torch
+from typing import Callable, Dict, Optional, Sequence, Union
+
+# Score matrices are (criteria x recipes). NaN marks a recipe that is absent from a
+# criterion's candidate set (e.g. not returned by an approximate index).
+ScoreMatrix = Union[torch.Tensor, np.ndarray]
+
+RRF_K = 60
+
+def min_max_normalize(scores: torch.Tensor) -> torch.Tensor:
+    """
+    Min-max normalizes each criterion row to [0, 1], ignoring missing (NaN) entries.
+    Constant rows map to 0.0, as sklearn's MinMaxScaler does.
+    """
+    if scores.numel() == 0:
+        return scores
+    missing = torch.isnan(scores)
+    lo = torch.where(missing, torch.full_like(scores, float("inf")), scores).min(dim=-1, keepdim=True).values
+    hi = torch.where(missing, torch.full_like(scores, float("-inf")), scores).max(dim=-1, keepdim=True).values
+    span = hi - lo
+    span = torch.where(span > 0, span, torch.ones_like(span))
+    return (scores - lo) / span
+
+def _rank(scores: torch.Tensor) -> torch.Tensor:
+    """
+    0-based descending rank of every recipe within each criterion row (missing entries last).
+    """
+    filled = torch.nan_to_num(scores, nan=float("-inf"))
+    order = torch.argsort(filled, dim=-1, descending=True)
+    ranks = torch.empty_like(order)
+    positions = torch.arange(order.shape[-1], device=order.device).expand_as(order)
+    ranks.scatter_(-1, order, positions)
+    return ranks
+
+def _sum(normalized: torch.Tensor, raw: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+    return torch.nan_to_num(normalized, nan=0.0).sum(dim=0)
+
+def _weighted_sum(normalized: torch.Tensor, raw: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+    return (torch.nan_to_num(normalized, nan=0.0) * weights[:, None]).sum(dim=0)
+
+def _reciprocal_rank(normalized: torch.Tensor, raw: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+    contributions = weights[:, None] / (RRF_K + _rank(raw) + 1).to(raw.dtype)
+    contributions = torch.where(torch.isnan(raw), torch.zeros_like(contributions), contributions)
+    return contributions.sum(dim=0)
+
+def _min(normalized: torch.Tensor, raw: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+    return torch.nan_to_num(normalized, nan=0.0).min(dim=0).values
+
+# Fusion strategies selectable per request; each maps
+# (normalized, raw, weights) -> one fused score per recipe.
+FUSION_STRATEGIES: Dict[str, Callable[[torch.Tensor, torch.Tensor, torch.Tensor], torch.Tensor]] = {
+    "sum": _sum,
+    "weighted_sum": _weighted_sum,
+    "rrf": _reciprocal_rank,
+    "min": _min,
+}
+
+def fuse_scores(
+    scores: ScoreMatrix,
+    strategy: str = "sum",
+    weights: Optional[Sequence[float]] = None,
+    flexible: bool = False,
+) -> torch.Tensor:
+    """
+    Fuses a (criteria x recipes) score matrix into one score per recipe in a single pass.
+
+    flexible=False keeps inner-join semantics: recipes missing from any criterion are
+    excluded (fused score -inf). flexible=True keeps outer-join semantics: missing
+    entries contribute zero and only recipes absent from every criterion are excluded.
+    """
+    if strategy not in FUSION_STRATEGIES:
+        raise ValueError(f"Unknown fusion strategy: {strategy}. Choose from {sorted(FUSION_STRATEGIES)}")
+
+    raw = torch.as_tensor(scores, dtype=torch.float32)
+    if raw.ndim == 1:
+        raw = raw.unsqueeze(0)
+
+    if weights is None:
+        w = torch.ones(raw.shape[0], dtype=raw.dtype, device=raw.device)
+    else:
+        w = torch.as_tensor(weights, dtype=raw.dtype, device=raw.device)
+        if w.shape != (raw.shape[0],):
+            raise ValueError(f"Expected {raw.shape[0]} weights, got {tuple(w.shape)}")
+
+    fused = FUSION_STRATEGIES[strategy](min_max_normalize(raw), raw, w)
+
+    present = ~torch.isnan(raw)
+    keep = present.any(dim=0) if flexible else present.all(dim=0)
+    return torch.where(keep, fused, torch.full_like(fused, float("-inf")))
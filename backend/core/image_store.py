@@ -0,0 +1,241 @@
+import io
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import asyncio
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+import requests
+
+from core.cache import STATE_DIR
+
+# Generated dish images, downloaded once and served from /images
+IMAGE_STORE_DIR = os.environ.get("IMAGE_STORE_DIR", os.path.join(STATE_DIR, "images"))
+# Originals and thumbnails together; least recently served files are evicted beyond it.
+# 0 disables the store (clients get the remote URLs)
+IMAGE_STORE_MAX_BYTES = int(os.environ.get("IMAGE_STORE_MAX_BYTES", str(2 * 1024 ** 3)))
+# Prefix of the image URLs handed to clients, e.g. "https://api.example.com"; relative if empty
+IMAGE_BASE_URL = os.environ.get("IMAGE_BASE_URL", "").rstrip("/")
+# Widths of the WebP thumbnails served under /images/thumbnails/<width>/
+IMAGE_THUMBNAIL_WIDTHS = tuple(
+    int(w) for w in os.environ.get("IMAGE_THUMBNAIL_WIDTHS", "256,512").split(",") if w.strip()
+)
+IMAGE_THUMBNAIL_QUALITY = 80
+# Larger downloads are not stored (the remote URL is returned instead)
+IMAGE_MAX_DOWNLOAD_BYTES = 20 * 1024 ** 2
+IMAGE_ROUTE = "/images"
+
+CONTENT_TYPES = {"png": "image/png", "jpg": "image/jpeg", "webp": "image/webp", "gif": "image/gif"}
+EXTENSIONS = {content_type: ext for ext, content_type in CONTENT_TYPES.items()}
+# "<sha256 of the content>.<ext>" (thumbnails "<sha256>_w<width>.webp"); anything else
+# is never looked up on disk
+FILE_NAME = re.compile(r"^[0-9a-f]{64}(_w[0-9]+)?\.(png|jpg|webp|gif)$")
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Casefolded prompt with whitespace collapsed, so trivially different prompts share an image.
+    """
+    return _WHITESPACE.sub(" ", prompt.casefold()).strip()
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+
+class ImageStore:
+    """
+    Content-addressed image files (named by the SHA-256 of their bytes, so identical
+    renders are stored once) with a SQLite index mapping normalized prompts to files
+    and tracking sizes and last access for LRU eviction under a byte budget.
+    Thumbnails are WebP files made on first request and evicted like originals.
+    """
+
+    def __init__(self, directory: str = IMAGE_STORE_DIR, max_bytes: int = IMAGE_STORE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(directory, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS prompts (key TEXT PRIMARY KEY, name TEXT NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "name TEXT PRIMARY KEY, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS files_accessed ON files (accessed)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite"), timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name[:2], name)
+
+    @staticmethod
+    def url(name: str) -> str:
+        return f"{IMAGE_BASE_URL}{IMAGE_ROUTE}/{name}"
+
+    def _write(self, name: str, content: bytes) -> None:
+        path = self.path(name)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        self._conn().execute(
+            "INSERT OR REPLACE INTO files (name, size, accessed) VALUES (?, ?, ?)",
+            (name, len(content), time.time()),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def lookup(self, prompt: str) -> Optional[str]:
+        """
+        URL of the stored image rendered for `prompt`, or None.
+        """
+        if not self.enabled:
+            return None
+        row = self._conn().execute("SELECT name FROM prompts WHERE key = ?", (prompt_key(prompt),)).fetchone()
+        if row is None or self.open(row[0]) is None:
+            return None
+        print(f"[DEBUG] Image store hit for prompt: {row[0]}")
+        return self.url(row[0])
+
+    def add(self, prompt: str, content: bytes, content_type: str) -> str:
+        """
+        Stores the image rendered for `prompt` and returns its URL.
+        """
+        ext = EXTENSIONS.get(content_type.split(";")[0].strip().lower())
+        if ext is None:
+            raise ValueError(f"Unsupported image content type: {content_type}")
+        name = f"{hashlib.sha256(content).hexdigest()}.{ext}"
+        self._write(name, content)
+        self._conn().execute("INSERT OR REPLACE INTO prompts (key, name) VALUES (?, ?)", (prompt_key(prompt), name))
+        self.evict()
+        if not os.path.exists(self.path(name)):
+            raise ValueError(f"Image of {len(content)} bytes does not fit in the store budget")
+        return self.url(name)
+
+    def open(self, name: str) -> Optional[str]:
+        """
+        Path of a stored file (marking it as recently used), or None.
+        """
+        if not FILE_NAME.match(name):
+            return None
+        path = self.path(name)
+        updated = self._conn().execute("UPDATE files SET accessed = ? WHERE name = ?", (time.time(), name)).rowcount
+        if not updated or not os.path.exists(path):
+            return None
+        return path
+
+    def thumbnail(self, name: str, width: int) -> Optional[str]:
+        """
+        Path of the WebP thumbnail of a stored image, made on first use. The original's
+        path if Pillow is not installed, None if the original is not stored.
+        """
+        original = self.open(name)
+        if original is None:
+            return None
+        variant = f"{name.split('.')[0]}_w{width}.webp"
+        path = self.path(variant)
+        if self.open(variant) is not None:
+            return path
+        try:
+            from PIL import Image
+        except ImportError:
+            print("[DEBUG] Pillow is not installed, serving the original instead of a thumbnail")
+            return original
+        with Image.open(original) as image:
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            if image.width > width:
+                image.thumbnail((width, width * image.height // image.width))
+            buffer = io.BytesIO()
+            image.save(buffer, "WEBP", quality=IMAGE_THUMBNAIL_QUALITY)
+        self._write(variant, buffer.getvalue())
+        self.evict()
+        return path
+
+    def evict(self) -> int:
+        """
+        Deletes least recently used files until the store fits in max_bytes.
+        """
+        conn = self._conn()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM files").fetchone()[0]
+        evicted = 0
+        while total > self.max_bytes:
+            rows = conn.execute("SELECT name, size FROM files ORDER BY accessed LIMIT 100").fetchall()
+            if not rows:
+                break
+            for name, size in rows:
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM files WHERE name = ?", (name,))
+                conn.execute("DELETE FROM prompts WHERE name = ?", (name,))
+                try:
+                    os.remove(self.path(name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted += 1
+        if evicted:
+            print(f"[DEBUG] Evicted {evicted} images from the image store")
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        files, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files").fetchone()
+        prompts = conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0]
+        return {"files": files, "bytes": size, "max_bytes": self.max_bytes, "prompts": prompts}
+
+    def _store_response(self, prompt: str, remote_url: str, status_code: int, headers: Any, content: bytes) -> str:
+        if not self.enabled:
+            return remote_url
+        content_type = headers.get("content-type", "")
+        if status_code != 200 or len(content) > IMAGE_MAX_DOWNLOAD_BYTES:
+            print(f"[DEBUG] Not storing image {remote_url} (status {status_code}, {len(content)} bytes)")
+            return remote_url
+        try:
+            return self.add(prompt, content, content_type)
+        except ValueError as e:
+            print(f"[DEBUG] Not storing image {remote_url}: {e}")
+            return remote_url
+
+    def store_remote(self, prompt: str, remote_url: str, timeout: float) -> str:
+        """
+        Downloads the image at `remote_url` into the store and returns its local URL,
+        or `remote_url` itself if the download fails.
+        """
+        try:
+            response = requests.get(remote_url, timeout=timeout)
+        except requests.RequestException as e:
+            print(f"[DEBUG] Image download failed ({e}), returning the remote URL")
+            return remote_url
+        return self._store_response(prompt, remote_url, response.status_code, response.headers, response.content)
+
+    async def store_remote_async(self, prompt: str, remote_url: str, client: httpx.AsyncClient) -> str:
+        """
+        Non-blocking store_remote over the given pooled client.
+        """
+        try:
+            response = await client.get(remote_url)
+        except httpx.HTTPError as e:
+            print(f"[DEBUG] Image download failed ({e}), returning the remote URL")
+            return remote_url
+        return await asyncio.to_thread(
+            self._store_response, prompt, remote_url, response.status_code, response.headers, response.content
+        )
+
+image_store = ImageStore()
@@ -0,0 +1,69 @@
+import bisect
+import hashlib
+import json
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+from core.data_loading import ingredient_counts
+
+SEARCH_MODES = ("prefix", "substring")
+
+class IngredientIndex:
+    """
+    The ingredient vocabulary, most frequent first, with case-insensitive autocomplete.
+    Prefix queries binary-search a sorted array of casefolded names; substring queries
+    scan one joined string. Results keep the frequency order.
+    """
+
+    def __init__(self, counts: Sequence[Tuple[str, int]]):
+        self.names = [name for name, _ in counts]
+        self.counts = [count for _, count in counts]
+        self._keys = [name.casefold() for name in self.names]
+        order = sorted(range(len(self._keys)), key=self._keys.__getitem__)
+        self._sorted_keys = [self._keys[i] for i in order]
+        self._sorted_ranks = order
+        # "\n" never occurs in a name, so a match can not span two of them
+        self._joined = "\n".join(self._keys)
+        self._starts = [0]
+        for key in self._keys[:-1]:
+            self._starts.append(self._starts[-1] + len(key) + 1)
+        payload = json.dumps(list(zip(self.names, self.counts)), ensure_ascii=False)
+        self.etag = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+        self.search = lru_cache(maxsize=4096)(self._search)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _prefix_ranks(self, key: str) -> List[int]:
+        lo = bisect.bisect_left(self._sorted_keys, key)
+        hi = bisect.bisect_right(self._sorted_keys, key + "\U0010ffff", lo)
+        return sorted(self._sorted_ranks[lo:hi])
+
+    def _substring_ranks(self, key: str) -> List[int]:
+        ranks, pos = [], self._joined.find(key)
+        while pos != -1:
+            rank = bisect.bisect_right(self._starts, pos) - 1
+            ranks.append(rank)
+            # continue after this name
+            next_start = self._starts[rank + 1] if rank + 1 < len(self._starts) else len(self._joined)
+            pos = self._joined.find(key, next_start)
+        return ranks
+
+    def _search(self, query: str, mode: str = "prefix") -> Tuple[str, ...]:
+        """
+        Names matching `query`, most frequent first. "substring" lists the prefix
+        matches first, then names containing the query elsewhere.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}. Choose from {SEARCH_MODES}")
+        key = query.strip().casefold()
+        if not key:
+            return tuple(self.names)
+        ranks = self._prefix_ranks(key)
+        if mode == "substring":
+            prefixed = set(ranks)
+            ranks += [r for r in self._substring_ranks(key) if r not in prefixed]
+        return tuple(self.names[r] for r in ranks)
+
+# Built once at import from the counts computed at load
+ingredient_index = IngredientIndex(ingredient_counts)
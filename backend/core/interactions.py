@@ -0,0 +1,71 @@
+import torch
+from typing import Any, Callable, Dict, Optional
+
+# Plain-torch versions of the PyKEEN interaction functions the recommender supports,
+# so an exported engine can be scored without importing pykeen. They take the same
+# broadcastable (h, r, t) representations as PyKEEN's Interaction modules.
+
+def to_complex(x: torch.Tensor) -> torch.Tensor:
+    """
+    Complex view of a representation; real tensors store (re, im) pairs in the last dim.
+    """
+    if x.is_complex():
+        return x
+    return torch.view_as_complex(x.reshape(*x.shape[:-1], -1, 2).contiguous())
+
+def _negative_norm(x: torch.Tensor, p: float, power_norm: bool) -> torch.Tensor:
+    if power_norm:
+        return -(x.abs() ** p).sum(dim=-1)
+    return -torch.linalg.vector_norm(x, ord=p, dim=-1)
+
+def transe(h: torch.Tensor, r: torch.Tensor, t: torch.Tensor, p: float = 1, power_norm: bool = False) -> torch.Tensor:
+    return _negative_norm(h + r - t, p=p, power_norm=power_norm)
+
+def distmult(h: torch.Tensor, r: torch.Tensor, t: torch.Tensor) -> torch.Tensor:
+    return (h * r * t).sum(dim=-1)
+
+def complex_(h: torch.Tensor, r: torch.Tensor, t: torch.Tensor) -> torch.Tensor:
+    h, r, t = to_complex(h), to_complex(r), to_complex(t)
+    return torch.real((h * r * torch.conj(t)).sum(dim=-1))
+
+def rotate(h: torch.Tensor, r: torch.Tensor, t: torch.Tensor) -> torch.Tensor:
+    h, r, t = to_complex(h), to_complex(r), to_complex(t)
+    # |h * r - t| = |h - conj(r) * t|; rotating the (few) tails is cheaper than the heads
+    return -torch.linalg.vector_norm(h - t * torch.conj(r), ord=2, dim=-1)
+
+# Interaction class name -> (function, names of its hyperparameters)
+NATIVE_INTERACTIONS: Dict[str, tuple] = {
+    "TransEInteraction": (transe, ("p", "power_norm")),
+    "DistMultInteraction": (distmult, ()),
+    "ComplExInteraction": (complex_, ()),
+    "RotatEInteraction": (rotate, ()),
+}
+
+class NativeInteraction:
+    """
+    Callable with the Interaction module signature, interaction(h=..., r=..., t=...).
+    """
+
+    def __init__(self, name: str, kwargs: Optional[Dict[str, Any]] = None):
+        if name not in NATIVE_INTERACTIONS:
+            raise ValueError(f"No native implementation for interaction: {name}")
+        self.name = name
+        self.kwargs = kwargs or {}
+        self._func: Callable[..., torch.Tensor] = NATIVE_INTERACTIONS[name][0]
+
+    def __call__(self, h: torch.Tensor, r: torch.Tensor, t: torch.Tensor) -> torch.Tensor:
+        return self._func(h, r, t, **self.kwargs)
+
+def interaction_config(interaction) -> Optional[Dict[str, Any]]:
+    """
+    {"name", "kwargs"} describing a PyKEEN interaction module for NativeInteraction,
+    or None if it has no native implementation.
+    """
+    name = type(interaction).__name__
+    if name not in NATIVE_INTERACTIONS:
+        return None
+    kwargs = {}
+    for param in NATIVE_INTERACTIONS[name][1]:
+        value = getattr(interaction, param)
+        kwargs[param] = value.item() if isinstance(value, torch.Tensor) else value
+    return {"name": name, "kwargs": kwargs}
@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from core.cache import STATE_DIR
+
+# Jobs are shared by every worker process on the host and survive restarts
+JOBS_DB_PATH = os.environ.get("JOBS_DB_PATH", os.path.join(STATE_DIR, "jobs.sqlite"))
+# Jobs executed concurrently by each worker process
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+# Delay before retry n is JOB_RETRY_BACKOFF * 2 ** (n - 1) seconds
+JOB_RETRY_BACKOFF = float(os.environ.get("JOB_RETRY_BACKOFF", "2.0"))
+# A running job whose worker has not finished it within this time (e.g. because the
+# process was restarted) is picked up again
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "900"))
+# Finished jobs are deleted after this many seconds
+JOB_TTL = float(os.environ.get("JOB_TTL", str(7 * 24 * 3600)))
+# How often idle workers look for jobs submitted by other processes or due for retry
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1.0"))
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+
+class JobStore:
+    """
+    Jobs in a single SQLite file (WAL mode). A job is claimed with a conditional
+    UPDATE, so several processes can poll the same store without running a job twice.
+    """
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, request TEXT NOT NULL, "
+                "result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+                "created REAL NOT NULL, updated REAL NOT NULL, not_before REAL NOT NULL, lease_expires REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, not_before)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def create(self, kind: str, request: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (id, kind, status, request, created, updated, not_before) "
+            "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(request), now, now, now),
+        )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def claim(self, lease_seconds: float = JOB_LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        """
+        Marks the oldest runnable job (queued and due, or running with an expired
+        lease) as running and returns it, or None if there is none.
+        """
+        conn = self._conn()
+        runnable = (
+            "(status = 'queued' AND not_before <= :now) OR (status = 'running' AND lease_expires < :now)"
+        )
+        while True:
+            now = time.time()
+            row = conn.execute(
+                f"SELECT id FROM jobs WHERE {runnable} ORDER BY created LIMIT 1", {"now": now}
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = conn.execute(
+                f"UPDATE jobs SET status = 'running', attempts = attempts + 1, updated = :now, "
+                f"lease_expires = :lease WHERE id = :id AND ({runnable})",
+                {"now": now, "lease": now + lease_seconds, "id": row["id"]},
+            ).rowcount
+            # Another process claimed it in between: try the next one
+            if claimed:
+                return self.get(row["id"])
+
+    def succeed(self, job_id: str, result: str) -> None:
+        self._conn().execute(
+            "UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, updated = ?, lease_expires = NULL "
+            "WHERE id = ?",
+            (result, time.time(), job_id),
+        )
+
+    def retry(self, job_id: str, error: str, delay: float) -> None:
+        now = time.time()
+        self._conn().execute(
+            "UPDATE jobs SET status = 'queued', error = ?, updated = ?, not_before = ?, lease_expires = NULL "
+            "WHERE id = ?",
+            (error, now, now + delay, job_id),
+        )
+
+    def release(self, job_id: str) -> None:
+        """
+        Puts a running job back in the queue at once, without counting the interrupted attempt.
+        """
+        now = time.time()
+        self._conn().execute(
+            "UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0), updated = ?, not_before = ?, "
+            "lease_expires = NULL WHERE id = ? AND status = 'running'",
+            (now, now, job_id),
+        )
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._conn().execute(
+            "UPDATE jobs SET status = 'failed', error = ?, updated = ?, lease_expires = NULL WHERE id = ?",
+            (error, time.time(), job_id),
+        )
+
+    def prune(self, ttl: float = JOB_TTL) -> int:
+        return self._conn().execute(
+            "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated < ?", (time.time() - ttl,)
+        ).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update({status: n for status, n in rows})
+        return counts
+
+Handler = Callable[[Dict[str, Any]], Awaitable[str]]
+
+class JobQueue:
+    """
+    Pool of asyncio workers that execute the jobs of a JobStore with the handler
+    registered for their kind. A failed attempt is retried with exponential backoff
+    up to `max_attempts` times; ValueError (a bad request) fails the job at once.
+    Handlers return the job result as a JSON string. Store calls block on SQLite
+    (up to its busy timeout when another process holds the lock), so the workers
+    make them in worker threads, off the event loop.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int = JOB_WORKERS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        backoff: float = JOB_RETRY_BACKOFF,
+        poll_interval: float = JOB_POLL_INTERVAL,
+    ):
+        self.store = store
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+        self.handlers: Dict[str, Handler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Jobs claimed by this process's workers and not finished yet
+        self._claimed: Set[str] = set()
+
+    def register(self, kind: str, handler: Handler) -> None:
+        self.handlers[kind] = handler
+
+    def submit(self, kind: str, request: Dict[str, Any]) -> str:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}. Available: {sorted(self.handlers)}")
+        job_id = self.store.create(kind, request)
+        if self._wakeup is not None:
+            # Submissions may come from threadpool threads; asyncio.Event is not thread-safe
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return job_id
+
+    async def start(self) -> None:
+        """
+        Starts the workers in the running event loop.
+        """
+        pruned = await asyncio.to_thread(self.store.prune)
+        if pruned:
+            print(f"[DEBUG] Pruned {pruned} expired jobs")
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """
+        Cancels the workers and puts the jobs they were running back in the queue, so
+        another worker picks them up without waiting for the lease to expire. Jobs of a
+        process that dies without stopping are picked up once their lease expires.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job_id in self._claimed:
+            await asyncio.to_thread(self.store.release, job_id)
+        if self._claimed:
+            print(f"[DEBUG] Requeued {len(self._claimed)} interrupted jobs")
+        self._claimed.clear()
+
+    async def _worker(self) -> None:
+        while True:
+            job = await asyncio.to_thread(self.store.claim)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._claimed.add(job["id"])
+            await self._run(job)
+            self._claimed.discard(job["id"])
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id, attempt = job["id"], job["attempts"]
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            await asyncio.to_thread(self.store.fail, job_id, f"Unknown job kind: {job['kind']}")
+            return
+        if attempt > self.max_attempts:
+            # Reclaimed after its worker died on the last attempt
+            await asyncio.to_thread(self.store.fail, job_id, job["error"] or "Worker stopped during the last attempt")
+            return
+        print(f"[DEBUG] Running job {job_id} ({job['kind']}), attempt {attempt}/{self.max_attempts}")
+        try:
+            result = await handler(json.loads(job["request"]))
+        except asyncio.CancelledError:
+            raise
+        except ValueError as e:
+            await asyncio.to_thread(self.store.fail, job_id, str(e))
+            return
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempt >= self.max_attempts:
+                print(f"[DEBUG] Job {job_id} failed after {attempt} attempts: {error}")
+                await asyncio.to_thread(self.store.fail, job_id, error)
+            else:
+                delay = self.backoff * 2 ** (attempt - 1)
+                print(f"[DEBUG] Job {job_id} attempt {attempt} failed ({error}), retrying in {delay:.1f}s")
+                await asyncio.to_thread(self.store.retry, job_id, error, delay)
+            return
+        await asyncio.to_thread(self.store.succeed, job_id, result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": len(self._tasks), "jobs": self.store.counts()}
+
+def job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The public representation of a stored job, with the result parsed.
+    """
+    return {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "created_at": job["created"],
+        "updated_at": job["updated"],
+        "result": json.loads(job["result"]) if job["result"] is not None else None,
+        "error": job["error"],
+    }
+
+job_queue = JobQueue(JobStore())
@@ -0,0 +1,135 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+from core.llm_session import strip_code_fences
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+def _complete_scalar(token: str) -> Optional[str]:
+    """
+    `token` if it is a whole JSON number or literal, else None (e.g. "12." or "tru").
+    """
+    try:
+        json.loads(token)
+        return token
+    except ValueError:
+        return None
+
+def repair_json(text: str) -> Optional[str]:
+    """
+    Rewrites a malformed LLM JSON document into valid JSON, fixing the usual defects
+    in a single pass without another model call:
+      - code fences and prose before the first "{" / "[" or after the document
+      - trailing commas before "}" / "]"
+      - output truncated mid-document (an unterminated string is closed, a dangling
+        key, colon or partial number is dropped or completed with null, and every
+        open object/array is closed)
+      - mismatched closing brackets
+    Returns None if no JSON object or array starts anywhere in `text`.
+    """
+    text = strip_code_fences(text)
+    start = next((i for i, ch in enumerate(text) if ch in _CLOSERS), None)
+    if start is None:
+        return None
+
+    out: List[str] = []
+    # Per open container: its opening bracket and, for objects, whether a value is
+    # expected next (after ":") or a key
+    stack: List[Tuple[str, List[bool]]] = []
+    pending_comma = False
+    i = start
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if ch == '"':
+            # Copy the whole string, closing it if the text ends inside it
+            j = i + 1
+            while j < n and text[j] != '"':
+                j += 2 if text[j] == "\\" else 1
+            literal = text[i:min(j, n)]
+            if literal.endswith("\\") and not literal.endswith("\\\\"):
+                literal = literal[:-1]
+            if pending_comma:
+                out.append(",")
+                pending_comma = False
+            out.append(literal + '"')
+            i = j + 1
+            if stack and stack[-1][0] == "{":
+                stack[-1][1][0] = not stack[-1][1][0]
+            continue
+        if ch in _CLOSERS:
+            if pending_comma:
+                out.append(",")
+                pending_comma = False
+            out.append(ch)
+            stack.append((ch, [False]))
+        elif ch in "}]":
+            pending_comma = False
+            if not stack:
+                break
+            opener, state = stack[-1]
+            if opener == "{" and state[0]:
+                # A key without a value
+                out.append(": null")
+            out.append(_CLOSERS[opener])
+            stack.pop()
+            if stack and stack[-1][0] == "{":
+                stack[-1][1][0] = False
+            if not stack:
+                break
+        elif ch == ",":
+            if stack and stack[-1][0] == "{" and stack[-1][1][0]:
+                out.append(": null")
+                stack[-1][1][0] = False
+            pending_comma = True
+        elif ch == ":":
+            out.append(":")
+        elif not ch.isspace():
+            # A number or literal: copy it whole
+            j = i
+            while j < n and text[j] not in ',:]}"{[' and not text[j].isspace():
+                j += 1
+            token = text[i:j]
+            if j == n:
+                token = _complete_scalar(token) or "null"
+            if pending_comma:
+                out.append(",")
+                pending_comma = False
+            out.append(token)
+            if stack and stack[-1][0] == "{":
+                stack[-1][1][0] = False
+            i = j
+            continue
+        i += 1
+
+    # Truncated: finish the open containers innermost first
+    while stack:
+        opener, state = stack.pop()
+        tail = "".join(out).rstrip()
+        if tail.endswith(":"):
+            out.append(" null")
+        elif opener == "{" and state[0]:
+            out.append(": null")
+        out.append(_CLOSERS[opener])
+        if stack and stack[-1][0] == "{":
+            stack[-1][1][0] = False
+    return "".join(out)
+
+def loads_tolerant(text: str) -> Tuple[Optional[Any], bool]:
+    """
+    Parses an LLM JSON response as (value, repaired): json.loads after fence stripping
+    first (raw control characters such as newlines are accepted inside strings),
+    repair_json if that fails, (None, False) if neither works.
+    """
+    stripped = strip_code_fences(text)
+    try:
+        return json.loads(stripped, strict=False), False
+    except ValueError:
+        pass
+    repaired = repair_json(stripped)
+    if repaired is None:
+        return None, False
+    try:
+        return json.loads(repaired, strict=False), True
+    except ValueError:
+        return None, False
@@ -1,8 +1,11 @@
+import os
 import re
+import ast
 import pickle
 import numpy as np
+import pandas as pd
 import networkx as nx
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Iterator, Optional
 
 UNKNOWN_PLACEHOLDER = "unknown"
 
@@ -32,6 +35,68 @@ def map_health_attribute(element: str) -> str:
     else:
         return "HasHealthAttribute"
 
+# Graph nodes are (type, value) tuples. They are written to the triples CSV as their
+# Python repr, e.g. "('recipe', 123)", and read back as the label "recipe_123".
+# serialize_node and canonicalize_labels are the only two places that know this format.
+_NODE_PATTERN = re.compile(
+    r"""^\('([^'\\]*)', (?:'([^'\\]*)'|"([^"\\]*)"|(-?(?:0|[1-9][0-9]*)))\)$"""
+)
+
+def serialize_node(node: Tuple[str, Any]) -> str:
+    """
+    Serialized form of a graph node as stored in the triples CSV.
+    """
+    return str(node)
+
+def _to_canonical(s: str) -> Optional[str]:
+    m = _NODE_PATTERN.match(s)
+    if m:
+        # group 1 is the type, the last matched group is the (unquoted) value
+        return f"{m[1]}_{m[m.lastindex]}"
+    # Slow path for the rare labels the pattern does not cover (escapes, floats, ...)
+    try:
+        t = ast.literal_eval(s)
+        return f"{t[0]}_{t[1]}"
+    except Exception:
+        return None
+
+def canonicalize_labels(labels: pd.Series) -> Tuple[pd.Series, int]:
+    """
+    Converts serialized nodes such as "('recipe', 123)" or "('ingredient', 'salt')" into
+    canonical labels ("recipe_123", "ingredient_salt") for a whole column at once.
+
+    The column is factorized first, so each distinct node is parsed once no matter how
+    many triples mention it. Rows that cannot be parsed are kept unchanged and counted.
+    Returns (labels, number_of_malformed_rows).
+    """
+    codes, uniques = pd.factorize(labels.astype(str))
+    parsed = [_to_canonical(u) for u in uniques]
+    bad = np.array([p is None for p in parsed], dtype=bool)
+    canonical = np.array(
+        [u if p is None else p for u, p in zip(uniques, parsed)], dtype=object
+    )
+    malformed = int(bad[codes].sum()) if bad.any() else 0
+    return pd.Series(canonical[codes], index=labels.index), malformed
+
+# Recipe columns -> (relation, node type[, delimiter]); shared by both graph builders
+ATTRIBUTE_MAPPINGS = {
+    "Cooking_Method": ("usesCookingMethod", "cooking_method"),
+    "servings_bin": ("hasServingsBin", "servings_bin"),
+    "cook_time": ("hasCookTime", "cook_time"),
+    "CuisineRegion": ("hasCuisineRegion", "cuisine_region"),
+}
+
+LIST_ATTRIBUTES = {
+    "Diet_Types": ("hasDietType", "diet_type", ","),
+    "meal_type": ("isForMealType", "meal_type", ","),
+}
+
+HEALTH_COLUMN = "Healthy_Type"
+HEALTH_DELIMITER = ","
+INGREDIENT_COLUMN = "BestUsdaIngredientName"
+INGREDIENT_RELATION = "containsIngredient"
+INGREDIENT_DELIMITER = ";"
+
 def split_and_clean(value: str, delimiter: str) -> List[str]:
     """
     Splits a string by delimiter and strips whitespace, returning non-empty parts.
@@ -45,21 +110,12 @@ def create_graph_and_triples(recipes: Dict[Any, Dict[str, Any]]) -> Tuple[nx.DiG
     G = nx.DiGraph()
     triples = []
     
-    attribute_mappings = {
-        "Cooking_Method": ("usesCookingMethod", "cooking_method"),
-        "servings_bin": ("hasServingsBin", "servings_bin"),
-        "cook_time": ("hasCookTime", "cook_time"),
-        "CuisineRegion": ("hasCuisineRegion", "cuisine_region"),
-    }
-    
-    list_attributes = {
-        "Diet_Types": ("hasDietType", "diet_type", ","),
-        "meal_type": ("isForMealType", "meal_type", ","),
-    }
+    attribute_mappings = ATTRIBUTE_MAPPINGS
+    list_attributes = LIST_ATTRIBUTES
     
-    ingredient_relation = "containsIngredient"
+    ingredient_relation = INGREDIENT_RELATION
     ingredient_node_type = "ingredient"
-    ingredient_delimiter = ";"
+    ingredient_delimiter = INGREDIENT_DELIMITER
     
     for recipe_id, details in recipes.items():
         recipe_node = ("recipe", recipe_id)
@@ -74,7 +130,7 @@ def create_graph_and_triples(recipes: Dict[Any, Dict[str, Any]]) -> Tuple[nx.DiG
                 if not G.has_node(node_id):
                     G.add_node(node_id, type=node_type, label=element_clean)
                 G.add_edge(recipe_node, node_id, relation=relation)
-                triples.append((str(recipe_node), relation, str(node_id)))
+                triples.append((serialize_node(recipe_node), relation, serialize_node(node_id)))
         
         # Healthy_Type
         healthy = details.get("Healthy_Type")
@@ -87,7 +143,7 @@ def create_graph_and_triples(recipes: Dict[Any, Dict[str, Any]]) -> Tuple[nx.DiG
                     if not G.has_node(node_id):
                         G.add_node(node_id, type="health_attribute", label=element)
                     G.add_edge(recipe_node, node_id, relation=relation)
-                    triples.append((str(recipe_node), relation, str(node_id)))
+                    triples.append((serialize_node(recipe_node), relation, serialize_node(node_id)))
         
         # Multi-value attributes
         for col, (relation, node_type, delimiter) in list_attributes.items():
@@ -100,7 +156,7 @@ def create_graph_and_triples(recipes: Dict[Any, Dict[str, Any]]) -> Tuple[nx.DiG
                         if not G.has_node(node_id):
                             G.add_node(node_id, type=node_type, label=element)
                         G.add_edge(recipe_node, node_id, relation=relation)
-                        triples.append((str(recipe_node), relation, str(node_id)))
+                        triples.append((serialize_node(recipe_node), relation, serialize_node(node_id)))
         
         # Ingredients
         best_usda = details.get("BestUsdaIngredientName")
@@ -112,16 +168,167 @@ def create_graph_and_triples(recipes: Dict[Any, Dict[str, Any]]) -> Tuple[nx.DiG
                     if not G.has_node(node_id):
                         G.add_node(node_id, type=ingredient_node_type, label=ingredient)
                     G.add_edge(recipe_node, node_id, relation=ingredient_relation)
-                    triples.append((str(recipe_node), ingredient_relation, str(node_id)))
+                    triples.append((serialize_node(recipe_node), ingredient_relation, serialize_node(node_id)))
                     
     triples_array = np.array(triples, dtype=str)
     return G, triples_array
 
+def _column_values(col: pd.Series, delimiter: Optional[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Cleans a recipe column exactly like create_graph_and_triples (str(), skip "unknown"
+    and blank values, split on `delimiter`, strip), but touches each distinct cell once.
+    Returns (row positions, value codes, distinct values) with one entry per edge.
+    """
+    cell_codes, cells = pd.factorize(col.astype(object), use_na_sentinel=False)
+    vocab: Dict[str, int] = {}
+    per_cell: List[List[int]] = []
+    for cell in cells:
+        text = str(cell)
+        values: List[str] = []
+        if cell and cell != UNKNOWN_PLACEHOLDER and text.strip():
+            values = split_and_clean(text, delimiter) if delimiter else [text.strip()]
+        per_cell.append([vocab.setdefault(v, len(vocab)) for v in values])
+
+    # Ragged gather: expand every row into the value codes of its cell
+    cell_len = np.array([len(v) for v in per_cell], dtype=np.int64)
+    cell_start = np.cumsum(cell_len) - cell_len
+    flat = np.fromiter((c for v in per_cell for c in v), dtype=np.int64, count=int(cell_len.sum()))
+    row_len = cell_len[cell_codes]
+    out_start = np.cumsum(row_len) - row_len
+    idx = np.arange(int(row_len.sum())) - np.repeat(out_start - cell_start[cell_codes], row_len)
+    rows = np.repeat(np.arange(len(col)), row_len)
+    return rows, flat[idx], np.array(list(vocab), dtype=object)
+
+def recipe_edges(df: pd.DataFrame) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, str, np.ndarray]]:
+    """
+    Column-wise equivalent of the per-recipe loop in create_graph_and_triples.
+    Yields one block per attribute as (row positions, relation per distinct value,
+    value codes, node type, distinct values); row i of block k is the edge
+    df.iloc[rows[i]] --relations[codes[i]]--> (node_type, values[codes[i]]).
+    """
+    for col, (relation, node_type) in ATTRIBUTE_MAPPINGS.items():
+        rows, codes, values = _column_values(df[col], None)
+        yield rows, np.full(len(values), relation, dtype=object), codes, node_type, values
+
+    rows, codes, values = _column_values(df[HEALTH_COLUMN], HEALTH_DELIMITER)
+    relations = np.array([map_health_attribute(v) for v in values], dtype=object)
+    yield rows, relations, codes, "health_attribute", values
+
+    for col, (relation, node_type, delimiter) in LIST_ATTRIBUTES.items():
+        rows, codes, values = _column_values(df[col], delimiter)
+        yield rows, np.full(len(values), relation, dtype=object), codes, node_type, values
+
+    rows, codes, values = _column_values(df[INGREDIENT_COLUMN], INGREDIENT_DELIMITER)
+    # Ingredient nodes are lower-cased, so distinct raw values may collapse
+    lowered, lower_codes = np.unique(np.array([v.lower() for v in values], dtype=object), return_inverse=True)
+    yield rows, np.full(len(lowered), INGREDIENT_RELATION, dtype=object), lower_codes[codes], "ingredient", lowered
+
+class LabelVocabulary:
+    """
+    Incrementally assigns integer ids to labels in first-seen order.
+    """
+
+    def __init__(self):
+        self._index = pd.Index([], dtype=object)
+
+    def encode(self, labels: np.ndarray) -> np.ndarray:
+        ids = self._index.get_indexer(labels)
+        unseen = ids < 0
+        if unseen.any():
+            new_labels = pd.unique(labels[unseen])
+            self._index = self._index.append(pd.Index(new_labels, dtype=object))
+            ids[unseen] = self._index.get_indexer(labels[unseen])
+        return ids.astype(np.int64)
+
+    def finalize(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (labels sorted alphabetically, old id -> sorted id). Sorted ids are the
+        ones TriplesFactory.from_labeled_triples would assign.
+        """
+        labels = np.asarray(self._index, dtype=str)
+        order = np.argsort(labels, kind="stable")
+        remap = np.empty_like(order)
+        remap[order] = np.arange(len(order))
+        return labels[order], remap
+
+def build_triples_columnar(
+    df: pd.DataFrame,
+    chunk_size: int = 200_000,
+    output_dir: Optional[str] = None,
+    build_graph: bool = False,
+) -> Tuple[Optional[np.ndarray], np.ndarray, np.ndarray, Optional[nx.DiGraph]]:
+    """
+    Builds integer-encoded (head, relation, tail) triples straight from DataFrame columns,
+    processing `chunk_size` recipes at a time.
+
+    Labels are the canonical ones ("recipe_123", "ingredient_salt") and ids follow the
+    sorted label order used by TriplesFactory.from_labeled_triples, so the result can be
+    passed to TriplesFactory(mapped_triples, entity_to_id, relation_to_id) directly.
+    Duplicate RecipeIds keep their last row, as with load_recipes_from_dataframe.
+
+    If `output_dir` is given, each chunk is written there as triples_XXXXX.npy (plus
+    entity_labels.npy / relation_labels.npy) and only the vocabularies are kept in
+    memory; the returned triples array is then None. The networkx graph is only built
+    when `build_graph` is set.
+
+    Returns (mapped_triples, entity_labels, relation_labels, graph).
+    """
+    df = df.drop_duplicates(subset="RecipeId", keep="last")
+    entities, relations = LabelVocabulary(), LabelVocabulary()
+    G = nx.DiGraph() if build_graph else None
+    parts: List[Any] = []
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    for n, start in enumerate(range(0, len(df), chunk_size)):
+        chunk_df = df.iloc[start:start + chunk_size]
+        # str() of the id, like the dict-based builder ("recipe_123")
+        recipe_values = np.array([str(v) for v in chunk_df["RecipeId"].astype(object)], dtype=object)
+
+        blocks = []
+        for rows, rels, codes, node_type, values in recipe_edges(chunk_df):
+            # Only recipes with an edge become entities, as in from_labeled_triples
+            head_ids = entities.encode("recipe_" + recipe_values[rows])
+            tail_ids = entities.encode(node_type + "_" + values)
+            relation_ids = relations.encode(rels)
+            blocks.append(np.stack([head_ids, relation_ids[codes], tail_ids[codes]], axis=1))
+            if G is not None:
+                G.add_edges_from(
+                    (("recipe", recipe_values[r]), (node_type, values[c]), {"relation": rels[c]})
+                    for r, c in zip(rows, codes)
+                )
+        chunk = np.concatenate(blocks)
+
+        if output_dir:
+            path = os.path.join(output_dir, f"triples_{n:05d}.npy")
+            np.save(path, chunk)
+            parts.append(path)
+        else:
+            parts.append(chunk)
+
+    entity_labels, entity_remap = entities.finalize()
+    relation_labels, relation_remap = relations.finalize()
+
+    def remap(chunk: np.ndarray) -> np.ndarray:
+        return np.stack([
+            entity_remap[chunk[:, 0]], relation_remap[chunk[:, 1]], entity_remap[chunk[:, 2]]
+        ], axis=1)
+
+    if output_dir:
+        for path in parts:
+            np.save(path, remap(np.load(path)))
+        np.save(os.path.join(output_dir, "entity_labels.npy"), entity_labels)
+        np.save(os.path.join(output_dir, "relation_labels.npy"), relation_labels)
+        return None, entity_labels, relation_labels, G
+
+    mapped = remap(np.concatenate(parts)) if parts else np.empty((0, 3), dtype=np.int64)
+    return mapped, entity_labels, relation_labels, G
+
 def save_triples(triples_array: np.ndarray, file_path: str) -> None:
     """
     Saves the triples to a CSV file.
     """
-    import pandas as pd
     df = pd.DataFrame(triples_array, columns=["Head", "Relation", "Tail"])
     df.to_csv(file_path, index=False)
 
@@ -1,21 +1,82 @@
 import json
-from core.llm_session import chat_session
-from core.recommender import map_user_input_to_criteria, get_matching_recipes, fetch_recipe_info
+import time
+import asyncio
+from typing import Any, AsyncIterator, Optional, Tuple
+from core.llm_session import llm_client
+from core.async_utils import run_stage, stream_stage, LLM_TIMEOUT
+from core.recommender import map_user_input_to_criteria, get_matching_recipes, fetch_recipe_snippets
+from core.prompt_compaction import format_examples, estimate_tokens, prompt_stats
+from core.response_cache import response_cache, request_key, EXAMPLE_FIELDS
+from core.streaming import IncrementalJSONParser, recipe_events
+from core.recipe_validation import (
+    validate_recipe_json,
+    validate_recipe_json_async,
+    ValidatedRecipe,
+    RECIPE_RESPONSE_SCHEMA,
+    CACHEABLE_OUTCOMES,
+)
 
-def format_recipe_example(recipe: dict) -> str:
-    """
-    Format a recipe dictionary to display certain keys as an example for the LLM prompt.
-    """
-    keys = [
-        "Name", "Description", "RecipeCategory", "Keywords", "RecipeInstructions",
-        "cook_time", "Healthy_Type", "Diet_Types", "meal_type", "ScrapedIngredients",
-        "CuisineRegion", "Cooking_Method", "servings_bin"
+# Shown in the prompt when the LLM is not constrained by a response schema (LLM_JSON_MODE=off)
+RECIPE_JSON_EXAMPLE = json.dumps({
+    "recipes": [
+        {
+            "id": "",
+            "title": "Example Recipe Title",
+            "description": "A brief creative description incorporating.",
+            "cookingTime": 45,
+            "servings": 4,
+            "calories": 500,
+            "difficulty": "Medium",
+            "categories": ["Example", "Inspiration"],
+            "cookingMethod": "baking",
+            "ingredients": [
+                {
+                    "name": "Ingredient 1",
+                    "amount": "1",
+                    "unit": "cup",
+                    "notes": "",
+                    "category": "Category",
+                    "amountInGrams": 100
+                }
+            ],
+            "steps": [
+                {
+                    "title": "Step 1",
+                    "description": "Do something.",
+                    "duration": 10
+                }
+            ],
+            "nutritionInfo": {
+                "calories": 500,
+                "protein": 20,
+                "carbohydrates": 50,
+                "fat": 10,
+                "saturatedFat": 2,
+                "transFat": 0,
+                "cholesterol": 0,
+                "sodium": 300,
+                "fiber": 5,
+                "sugars": 8,
+                "vitaminD": 0,
+                "calcium": 100,
+                "iron": 5,
+                "potassium": 400,
+                "fatDailyValue": 15,
+                "saturatedFatDailyValue": 10,
+                "cholesterolDailyValue": 0,
+                "sodiumDailyValue": 13,
+                "carbohydratesDailyValue": 20,
+                "fiberDailyValue": 25,
+                "proteinDailyValue": 30,
+                "vitaminDDailyValue": 0,
+                "calciumDailyValue": 10,
+                "ironDailyValue": 15,
+                "potassiumDailyValue": 12,
+                "servingSize": "1 serving"
+            }
+        }
     ]
-    output_lines = []
-    for key in keys:
-        value = recipe.get(key, "Not provided")
-        output_lines.append(f"{key}: {value}")
-    return "\n".join(output_lines)
+}, separators=(",", ":"))
 
 def format_user_criteria(criteria: dict) -> str:
     lines = []
@@ -59,12 +120,9 @@ def format_user_criteria(criteria: dict) -> str:
 
     return "\n".join(lines)
 
-
-
-def generate_recipe_llm(user_criteria: dict) -> str:
+def build_recipe_prompt(user_criteria: dict) -> str:
     """
-    Generate a new recipe using the LLM based on user criteria + 5 example recipes for inspiration.
-    Returns a JSON string containing { "recipes": [ {...}, ... ] }.
+    Retrieve 5 example recipes via the KGE model and build the recipe-generation prompt.
     """
     criteria = map_user_input_to_criteria(
         cooking_method=user_criteria.get("cooking_method", ""),
@@ -74,25 +132,24 @@ def generate_recipe_llm(user_criteria: dict) -> str:
         cook_time=user_criteria.get("cook_time", ""),
         health_types=user_criteria.get("health_types", []),
         cuisine_region=user_criteria.get("cuisine_region", ""),
-        ingredients=user_criteria.get("ingredients", [])
+        ingredients=user_criteria.get("ingredients", []),
+        # Unknown values still reach the LLM prompt; they just don't filter the examples
+        strict=False,
     )
 
     # Retrieve up to 5 sample recipe IDs using the KGE model
-    example_recipe_ids = get_matching_recipes(criteria=criteria, top_k=5, flexible=False)
+    example_recipe_ids = response_cache.cached(
+        "examples",
+        request_key(user_criteria, EXAMPLE_FIELDS),
+        lambda: get_matching_recipes(criteria=criteria, top_k=5, flexible=False),
+    )
     
-    # Fetch detailed info for the sample recipes
-    example_recipes = []
-    for rid in example_recipe_ids:
-        recipe_info = fetch_recipe_info(rid)
-        if recipe_info:
-            example_recipes.append(recipe_info)
-
-    # Format the example recipes for the prompt
-    formatted_examples = ""
-    for idx, recipe in enumerate(example_recipes, start=1):
-        formatted_examples += f"Example Recipe {idx}:\n{format_recipe_example(recipe)}\n{'-'*40}\n"
+    # Compact example fields were precomputed at load time; fit them into the token budget
+    formatted_examples, trimmed = format_examples(fetch_recipe_snippets(example_recipe_ids))
 
     formatted_criteria = format_user_criteria(user_criteria)
+    # In JSON mode the response schema already fixes the shape
+    json_example = "" if RECIPE_RESPONSE_SCHEMA is not None else f"Example JSON:\n{RECIPE_JSON_EXAMPLE}\n"
 
     # Construct final LLM prompt
     prompt = f"""
@@ -121,114 +178,144 @@ to an array containing exactly one recipe object with these keys (and no extra k
 - "steps": An array of instruction objects
 - "nutritionInfo": An object containing nutritional details
 
-Example JSON:
-{{
-  "recipes": [
-    {{
-      "id": "",
-      "title": "Example Recipe Title",
-      "description": "A brief creative description incorporating.",
-      "cookingTime": 45,
-      "servings": 4,
-      "calories": 500,
-      "difficulty": "Medium",
-      "categories": ["Example", "Inspiration"],
-      "cookingMethod": "baking",
-      "ingredients": [
-        {{
-          "name": "Ingredient 1",
-          "amount": "1",
-          "unit": "cup",
-          "notes": "",
-          "category": "Category",
-          "amountInGrams": 100
-        }}
-      ],
-      "steps": [
-        {{
-          "title": "Step 1",
-          "description": "Do something.",
-          "duration": 10
-        }}
-      ],
-      "nutritionInfo": {{
-        "calories": 500,
-        "protein": 20,
-        "carbohydrates": 50,
-        "fat": 10,
-        "saturatedFat": 2,
-        "transFat": 0,
-        "cholesterol": 0,
-        "sodium": 300,
-        "fiber": 5,
-        "sugars": 8,
-        "vitaminD": 0,
-        "calcium": 100,
-        "iron": 5,
-        "potassium": 400,
-        "fatDailyValue": 15,
-        "saturatedFatDailyValue": 10,
-        "cholesterolDailyValue": 0,
-        "sodiumDailyValue": 13,
-        "carbohydratesDailyValue": 20,
-        "fiberDailyValue": 25,
-        "proteinDailyValue": 30,
-        "vitaminDDailyValue": 0,
-        "calciumDailyValue": 10,
-        "ironDailyValue": 15,
-        "potassiumDailyValue": 12,
-        "servingSize": "1 serving"
-      }}
-    }}
-  ]
-}}
-Now, please generate the recipe.
+{json_example}Now, please generate the recipe.
 """
+    example_tokens = estimate_tokens(formatted_examples)
+    prompt_tokens = estimate_tokens(prompt)
+    prompt_stats.record(prompt_tokens, example_tokens, trimmed)
+    print(f"[DEBUG] Recipe prompt: ~{prompt_tokens} tokens (examples ~{example_tokens}{', trimmed' if trimmed else ''})")
+    return prompt
+
+# Returned when the LLM answers with no usable recipe; never cached
+FALLBACK_RECIPE_JSON = json.dumps({
+    "recipes": [
+        {
+            "id": "",
+            "title": "No Recipe Generated",
+            "description": "The language model did not return a recipe. Please try again.",
+            "imageUrl": "",
+            "cookingTime": 0,
+            "servings": 0,
+            "calories": 0,
+            "difficulty": "",
+            "categories": [],
+            "cookingMethod": "",
+            "ingredients": [],
+            "steps": [],
+            "rating": 0.0,
+            "reviews": 0,
+            "userId": "",
+            "userName": "",
+            "createdAt": "",
+            "nutritionInfo": {}
+        }
+    ]
+})
+
+def _log_response(raw_text: str) -> None:
+    print("Gemini response text:", repr(raw_text))
+
+def _finish_recipe(key: str, result: ValidatedRecipe) -> str:
+    """
+    The validated recipe JSON (FALLBACK_RECIPE_JSON if there is none), cached
+    unless it had to be degraded.
+    """
+    if result.text is None:
+        return FALLBACK_RECIPE_JSON
+    if result.outcome in CACHEABLE_OUTCOMES:
+        response_cache.set("recipe_json", key, result.text)
+    return result.text
+
+def _cached_recipe(key: str) -> Optional[str]:
+    cached = response_cache.get("recipe_json", key)
+    if cached is not None:
+        print("[DEBUG] Response cache hit for stage 'recipe_json'")
+    return cached
+
+async def _reask_async(prompt: str, response_schema: Any) -> str:
+    return await run_stage("recipe_reask", llm_client.generate_async(prompt, response_schema), LLM_TIMEOUT)
+
+def _log_prompt(prompt: str) -> None:
     print("---- Prompt Sent to Gemini LLM ----")
     print(prompt)
     print("---- End of Prompt ----\n")
 
-    response = chat_session.send_message(prompt)
-    raw_text = response.text.strip()
-    print("Gemini response text:", repr(raw_text))
+def generate_recipe_llm(user_criteria: dict) -> str:
+    """
+    Generate a new recipe using the LLM based on user criteria + 5 example recipes for inspiration.
+    Returns a JSON string containing { "recipes": [ {...}, ... ] }, validated against
+    models.schemas.RecipeResponse (see core.recipe_validation).
+    Generated recipes are cached per canonicalized request (see core.response_cache).
+    """
+    key = request_key(user_criteria)
+    cached = _cached_recipe(key)
+    if cached is not None:
+        return cached
+    prompt = build_recipe_prompt(user_criteria)
+    _log_prompt(prompt)
+    start = time.perf_counter()
+    response_text = llm_client.generate(prompt, RECIPE_RESPONSE_SCHEMA)
+    generation_ms = (time.perf_counter() - start) * 1000
+    _log_response(response_text)
+    return _finish_recipe(key, validate_recipe_json(response_text, llm_client.generate, generation_ms))
 
-    # Remove leading/trailing code fences if any
-    if raw_text.startswith("```"):
-        lines = raw_text.splitlines()
-        if lines[0].startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].startswith("```"):
-            lines = lines[:-1]
-        json_text = "\n".join(lines).strip()
-    else:
-        json_text = raw_text
+async def generate_recipe_llm_async(user_criteria: dict) -> str:
+    """
+    Non-blocking generate_recipe_llm: KGE retrieval runs in a worker thread and the
+    Gemini call is awaited with the LLM stage timeout.
+    """
+    key = request_key(user_criteria)
+    cached = _cached_recipe(key)
+    if cached is not None:
+        return cached
+    prompt = await asyncio.to_thread(build_recipe_prompt, user_criteria)
+    _log_prompt(prompt)
+    start = time.perf_counter()
+    response_text = await run_stage(
+        "recipe_llm", llm_client.generate_async(prompt, RECIPE_RESPONSE_SCHEMA), LLM_TIMEOUT
+    )
+    generation_ms = (time.perf_counter() - start) * 1000
+    _log_response(response_text)
+    result = await validate_recipe_json_async(response_text, _reask_async, generation_ms)
+    return _finish_recipe(key, result)
 
-    if not json_text:
-        # fallback JSON if LLM returns nothing
-        fallback = {
-            "recipes": [
-                {
-                    "id": "",
-                    "title": "No Recipe Generated",
-                    "description": "The language model did not return a recipe. Please try again.",
-                    "imageUrl": "",
-                    "cookingTime": 0,
-                    "servings": 0,
-                    "calories": 0,
-                    "difficulty": "",
-                    "categories": [],
-                    "cookingMethod": "",
-                    "ingredients": [],
-                    "steps": [],
-                    "rating": 0.0,
-                    "reviews": 0,
-                    "userId": "",
-                    "userName": "",
-                    "createdAt": "",
-                    "nutritionInfo": {}
-                }
-            ]
-        }
-        return json.dumps(fallback)
-    
-    return json_text
+async def generate_recipe_llm_stream(user_criteria: dict) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Streaming generate_recipe_llm_async, as (event, data) pairs: a "stage" event once
+    the examples are retrieved, the raw LLM output as "token" events, every recipe
+    field and ingredient/step as soon as it is complete ("field"/"item", see
+    core.streaming.recipe_events) and finally ("result", recipe JSON string).
+    The result is the validated recipe, so it can differ from the streamed fields
+    when the output needed repair. A cached recipe is replayed as field events
+    without tokens.
+    """
+    key = request_key(user_criteria)
+    parser = IncrementalJSONParser(max_depth=4)
+    cached = _cached_recipe(key)
+    if cached is not None:
+        yield "stage", {"stage": "recipe_cached"}
+        for path, value in parser.feed(cached):
+            for event in recipe_events(path, value):
+                yield event
+        yield "result", cached
+        return
+
+    prompt = await asyncio.to_thread(build_recipe_prompt, user_criteria)
+    yield "stage", {"stage": "examples_retrieved", "prompt_tokens": estimate_tokens(prompt)}
+    _log_prompt(prompt)
+    start = time.perf_counter()
+    chunks = []
+    chunk_stream = llm_client.stream_async(prompt, RECIPE_RESPONSE_SCHEMA)
+    async for chunk in stream_stage("recipe_llm", chunk_stream, LLM_TIMEOUT):
+        chunks.append(chunk)
+        yield "token", {"text": chunk}
+        for path, value in parser.feed(chunk):
+            for event in recipe_events(path, value):
+                yield event
+    generation_ms = (time.perf_counter() - start) * 1000
+
+    response_text = "".join(chunks)
+    _log_response(response_text)
+    result = await validate_recipe_json_async(response_text, _reask_async, generation_ms)
+    yield "stage", {"stage": "recipe_drafted", "validation": result.outcome}
+    yield "result", _finish_recipe(key, result)
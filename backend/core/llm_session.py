@@ -1,8 +1,16 @@
 import os
-import google.generativeai as genai
+import json
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Callable, Dict, Optional
 
-# Configure Gemini LLM session
-genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+# Which LLM backend serves generation: "gemini" (default) or "stub" for tests and benchmarks
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "gemini")
+# Maximum number of LLM calls in flight per worker; extra calls wait for a free slot
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+
+MODEL_NAME = "gemini-2.0-flash-thinking-exp-01-21"
 
 generation_config = {
     "temperature": 0.65,
@@ -12,8 +20,271 @@ generation_config = {
     "response_mime_type": "text/plain",
 }
 
-# Create a conversation-enabled model
-chat_session = genai.GenerativeModel(
-    model_name="gemini-2.0-flash-thinking-exp-01-21",
-    generation_config=generation_config,
-).start_chat(history=[])
+class LLMBackend(ABC):
+    """
+    A stateless text generator: every call sees only the prompt it is given. With a
+    `response_schema` (a pydantic model class) the response must be JSON of that
+    shape; backends without a structured-output mode may ignore it. Subclasses
+    implement generate; the async and streaming variants default to it.
+    """
+
+    @abstractmethod
+    def generate(self, prompt: str, response_schema: Optional[Any] = None) -> str:
+        ...
+
+    async def generate_async(self, prompt: str, response_schema: Optional[Any] = None) -> str:
+        return await asyncio.to_thread(self.generate, prompt, response_schema)
+
+    async def stream_async(self, prompt: str, response_schema: Optional[Any] = None) -> AsyncIterator[str]:
+        """
+        Yields the response in chunks as they are generated. Backends without a
+        streaming API yield the whole response at once.
+        """
+        yield await self.generate_async(prompt, response_schema)
+
+class GeminiBackend(LLMBackend):
+    """
+    Single-turn generate_content calls against Gemini. No chat history is kept, so the
+    prompt size of a request does not depend on earlier requests.
+    """
+
+    def __init__(self, model_name: str = MODEL_NAME, config: Optional[dict] = None):
+        import google.generativeai as genai
+
+        # GEMINI_API_ENDPOINT / GEMINI_TRANSPORT point the client at another server
+        # (e.g. a local fake LLM for tests and benchmarks).
+        client_options = {}
+        if os.environ.get("GEMINI_API_ENDPOINT"):
+            client_options["api_endpoint"] = os.environ["GEMINI_API_ENDPOINT"]
+        genai.configure(
+            api_key=os.environ["GEMINI_API_KEY"],
+            transport=os.environ.get("GEMINI_TRANSPORT") or None,
+            client_options=client_options or None,
+        )
+        # The library keeps one process-wide sync and async transport per worker;
+        # the model object itself only holds the name and generation config.
+        self.config = config or generation_config
+        self.model = genai.GenerativeModel(
+            model_name=model_name,
+            generation_config=self.config,
+        )
+
+    def _config(self, response_schema: Optional[Any]) -> Optional[dict]:
+        # Gemini's JSON mode constrains decoding to the schema
+        if response_schema is None:
+            return None
+        return {**self.config, "response_mime_type": "application/json", "response_schema": response_schema}
+
+    @staticmethod
+    def _log_usage(response: Any) -> None:
+        # Exact token counts, next to the estimates logged when prompts are built
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            print(
+                f"[DEBUG] Gemini usage: {usage.prompt_token_count} prompt tokens, "
+                f"{usage.candidates_token_count} response tokens"
+            )
+
+    def generate(self, prompt: str, response_schema: Optional[Any] = None) -> str:
+        response = self.model.generate_content(prompt, generation_config=self._config(response_schema))
+        self._log_usage(response)
+        return response.text
+
+    async def generate_async(self, prompt: str, response_schema: Optional[Any] = None) -> str:
+        response = await self.model.generate_content_async(prompt, generation_config=self._config(response_schema))
+        self._log_usage(response)
+        return response.text
+
+    async def stream_async(self, prompt: str, response_schema: Optional[Any] = None) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(
+            prompt, generation_config=self._config(response_schema), stream=True
+        )
+        async for chunk in response:
+            yield chunk.text
+        self._log_usage(response)
+
+STUB_RESPONSE = json.dumps({
+    "recipes": [
+        {
+            "id": "",
+            "title": "Stub Recipe",
+            "description": "A recipe returned by the stub LLM backend.",
+            "imageUrl": "",
+            "cookingTime": 30,
+            "servings": 2,
+            "calories": 400,
+            "difficulty": "Easy",
+            "categories": ["Main Course"],
+            "cookingMethod": "Baking",
+            "ingredients": [
+                {
+                    "name": "Potatoes",
+                    "amount": "500",
+                    "unit": "g",
+                    "notes": "peeled",
+                    "category": "Vegetables",
+                    "amountInGrams": 500
+                },
+                {
+                    "name": "Olive oil",
+                    "amount": "2",
+                    "unit": "tbsp",
+                    "notes": "",
+                    "category": "Oils",
+                    "amountInGrams": 27
+                }
+            ],
+            "steps": [
+                {"title": "Prepare", "description": "Cut the potatoes and toss them in the oil.", "duration": 5},
+                {"title": "Bake", "description": "Bake at 200C until golden.", "duration": 25}
+            ],
+            "nutritionInfo": {
+                "calories": 400, "protein": 8.0, "carbohydrates": 60.0, "fat": 14.0,
+                "saturatedFat": 2.0, "transFat": 0.0, "cholesterol": 0.0, "sodium": 20.0,
+                "fiber": 6.0, "sugars": 2.0, "vitaminD": 0.0, "calcium": 30.0,
+                "iron": 2.0, "potassium": 1100.0, "fatDailyValue": 18.0,
+                "saturatedFatDailyValue": 10.0, "cholesterolDailyValue": 0.0, "sodiumDailyValue": 1.0,
+                "carbohydratesDailyValue": 22.0, "fiberDailyValue": 21.0, "proteinDailyValue": 16.0,
+                "vitaminDDailyValue": 0.0, "calciumDailyValue": 2.0, "ironDailyValue": 11.0,
+                "potassiumDailyValue": 23.0, "servingSize": "1 plate (300g)"
+            }
+        }
+    ]
+})
+
+class StubBackend(LLMBackend):
+    """
+    Offline backend for tests and benchmarks: answers every prompt with `response`
+    (or response_fn(prompt)) after `latency` seconds, without any network access.
+    Streaming spreads the latency evenly over chunks of `chunk_chars` characters,
+    like a model emitting tokens at a constant rate.
+    """
+
+    def __init__(
+        self,
+        response: str = STUB_RESPONSE,
+        latency: Optional[float] = None,
+        response_fn: Optional[Callable[[str], str]] = None,
+        chunk_chars: Optional[int] = None,
+    ):
+        self.response = response
+        self.latency = float(os.environ.get("LLM_STUB_LATENCY", "0")) if latency is None else latency
+        self.response_fn = response_fn
+        self.chunk_chars = int(os.environ.get("LLM_STUB_CHUNK_CHARS", "16")) if chunk_chars is None else chunk_chars
+        self.calls = 0
+
+    def _answer(self, prompt: str) -> str:
+        self.calls += 1
+        return self.response_fn(prompt) if self.response_fn else self.response
+
+    def generate(self, prompt: str, response_schema: Optional[Any] = None) -> str:
+        if self.latency:
+            threading.Event().wait(self.latency)
+        return self._answer(prompt)
+
+    async def generate_async(self, prompt: str, response_schema: Optional[Any] = None) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._answer(prompt)
+
+    async def stream_async(self, prompt: str, response_schema: Optional[Any] = None) -> AsyncIterator[str]:
+        text = self._answer(prompt)
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or [""]
+        for chunk in chunks:
+            if self.latency:
+                await asyncio.sleep(self.latency / len(chunks))
+            yield chunk
+
+LLM_BACKENDS: Dict[str, Callable[[], LLMBackend]] = {
+    "gemini": GeminiBackend,
+    "stub": StubBackend,
+}
+
+def register_backend(name: str, factory: Callable[[], LLMBackend]) -> None:
+    LLM_BACKENDS[name] = factory
+
+def create_backend(name: str) -> LLMBackend:
+    if name not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {name}. Available: {sorted(LLM_BACKENDS)}")
+    return LLM_BACKENDS[name]()
+
+class LLMClient:
+    """
+    Entry point for every LLM call of the app. Wraps a backend with a concurrency limit
+    (applied separately to sync and async callers), so bursts queue here instead of
+    piling up connections to the provider.
+    """
+
+    def __init__(self, backend: LLMBackend, max_concurrency: int = LLM_MAX_CONCURRENCY):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self._sync_slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _enter(self) -> None:
+        with self._lock:
+            self._in_flight += 1
+
+    def _exit(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def generate(self, prompt: str, response_schema: Optional[Any] = None) -> str:
+        with self._sync_slots:
+            self._enter()
+            try:
+                return self.backend.generate(prompt, response_schema)
+            finally:
+                self._exit()
+
+    async def generate_async(self, prompt: str, response_schema: Optional[Any] = None) -> str:
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        async with self._async_slots:
+            self._enter()
+            try:
+                return await self.backend.generate_async(prompt, response_schema)
+            finally:
+                self._exit()
+
+    async def stream_async(self, prompt: str, response_schema: Optional[Any] = None) -> AsyncIterator[str]:
+        """
+        Streams the response chunks; the concurrency slot is held until the stream ends.
+        """
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        async with self._async_slots:
+            self._enter()
+            try:
+                async for chunk in self.backend.stream_async(prompt, response_schema):
+                    yield chunk
+            finally:
+                self._exit()
+
+def set_backend(backend: LLMBackend) -> None:
+    """
+    Swaps the backend of the shared client, e.g. llm_client stubbed out in a benchmark.
+    """
+    llm_client.backend = backend
+
+llm_client = LLMClient(create_backend(LLM_BACKEND))
+
+def strip_code_fences(text: str) -> str:
+    """
+    Removes a leading ```/```json line and a trailing ``` line from an LLM response.
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        lines = text.splitlines()
+        if lines[0].startswith("```"):
+            lines = lines[1:]
+        if lines and lines[-1].startswith("```"):
+            lines = lines[:-1]
+        text = "\n".join(lines).strip()
+    return text
@@ -1,5 +1,5 @@
 import os
-import ast
+import warnings
 import torch
 import pandas as pd
 import numpy as np
@@ -7,23 +7,14 @@ from pykeen.models import Model
 from pykeen.triples import TriplesFactory
 from typing import Any
 
+from core.cache import load_or_build
+from core.kg_utils import canonicalize_labels
+
 CORE_DIR = os.path.dirname(os.path.abspath(__file__))
 BASE_DIR = os.path.abspath(os.path.join(CORE_DIR, ".."))
 MODEL_PATH = os.path.join(BASE_DIR, "embedding", "trained_model.pkl")
 TRIPLES_PATH = os.path.join(BASE_DIR, "data", "triples_new_without_ct_ss.csv")
 
-def tuple_to_canonical(s: str) -> str:
-    """
-    Convert a string representation of a tuple (e.g., "('recipe', 123)")
-    into a canonical form "recipe_123".
-    """
-    try:
-        t = ast.literal_eval(s)
-        return f"{t[0]}_{t[1]}"
-    except Exception as e:
-        print(f"Error converting tuple: {str(e)} => {s}")
-        return s
-
 def load_kge_model() -> Any:
     """
     Loads the pre-trained PyKEEN model from disk.
@@ -32,20 +23,59 @@ def load_kge_model() -> Any:
         raise FileNotFoundError(f"Model file not found: {MODEL_PATH}")
     return torch.load(MODEL_PATH, map_location=torch.device("cpu"), weights_only=False)
 
+TRIPLES_CACHE = "triples"
+
+def _build_triples_factory() -> TriplesFactory:
+    df = pd.read_csv(TRIPLES_PATH)
+    heads, bad_heads = canonicalize_labels(df["Head"])
+    tails, bad_tails = canonicalize_labels(df["Tail"])
+    if bad_heads or bad_tails:
+        print(f"[DEBUG] {bad_heads} malformed heads and {bad_tails} malformed tails kept as-is in {TRIPLES_PATH}")
+    triples = np.stack([
+        heads.to_numpy(dtype=str),
+        df["Relation"].astype(str).str.strip().to_numpy(dtype=str),
+        tails.to_numpy(dtype=str),
+    ], axis=1)
+    return TriplesFactory.from_labeled_triples(
+        triples=triples,
+        create_inverse_triples=False
+    )
+
+def _save_triples_factory(tf: TriplesFactory, cache_dir: str) -> None:
+    # Labels are stored ordered by id so the id maps round-trip exactly
+    entity_labels = sorted(tf.entity_to_id, key=tf.entity_to_id.get)
+    relation_labels = sorted(tf.relation_to_id, key=tf.relation_to_id.get)
+    np.save(os.path.join(cache_dir, "mapped_triples.npy"), tf.mapped_triples.numpy())
+    np.save(os.path.join(cache_dir, "entity_labels.npy"), np.array(entity_labels, dtype=str))
+    np.save(os.path.join(cache_dir, "relation_labels.npy"), np.array(relation_labels, dtype=str))
+
+def _load_triples_factory(cache_dir: str) -> TriplesFactory:
+    mapped = np.load(os.path.join(cache_dir, "mapped_triples.npy"), mmap_mode="r")
+    entity_labels = np.load(os.path.join(cache_dir, "entity_labels.npy"))
+    relation_labels = np.load(os.path.join(cache_dir, "relation_labels.npy"))
+    with warnings.catch_warnings():
+        # The memory map is read-only; the factory never writes to it
+        warnings.simplefilter("ignore", UserWarning)
+        mapped_triples = torch.from_numpy(mapped)
+    return TriplesFactory(
+        mapped_triples=mapped_triples,
+        entity_to_id={label: i for i, label in enumerate(entity_labels.tolist())},
+        relation_to_id={label: i for i, label in enumerate(relation_labels.tolist())},
+        create_inverse_triples=False,
+    )
+
 def get_triples_factory() -> TriplesFactory:
     """
     Loads the triple data from CSV and returns a TriplesFactory for the KGE model.
+    The canonicalized, id-encoded triples are kept in a binary cache that is rebuilt
+    automatically when the CSV changes.
     """
-    df = pd.read_csv(TRIPLES_PATH)
-    triples = []
-    for h, r, t in df[["Head", "Relation", "Tail"]].values:
-        ch = tuple_to_canonical(h)
-        cr = r.strip()
-        ct = tuple_to_canonical(t)
-        triples.append((ch, cr, ct))
-    return TriplesFactory.from_labeled_triples(
-        triples=np.array(triples, dtype=str),
-        create_inverse_triples=False
+    return load_or_build(
+        TRIPLES_CACHE,
+        sources=[TRIPLES_PATH],
+        build=_build_triples_factory,
+        save=_save_triples_factory,
+        load=_load_triples_factory,
     )
 
 # Load the model and triples factory once at import
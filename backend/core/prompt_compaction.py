@@ -0,0 +1,161 @@
+import os
+import re
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Estimated tokens the example recipes may take in a generation prompt
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "1200"))
+# Characters kept of a long example field (description, instructions, ingredients, keywords)
+PROMPT_FIELD_CHARS = int(os.environ.get("PROMPT_FIELD_CHARS", "240"))
+# Items kept of a list-valued example field
+PROMPT_LIST_ITEMS = int(os.environ.get("PROMPT_LIST_ITEMS", "8"))
+# Characters kept of any other example field
+SHORT_FIELD_CHARS = 80
+# Rough Gemini tokenizer ratio for English text; only used for budgeting and reporting
+CHARS_PER_TOKEN = 4
+
+# Recipe columns shown to the LLM, in prompt order
+EXAMPLE_KEYS = (
+    "Name", "Description", "RecipeCategory", "Keywords", "RecipeInstructions",
+    "cook_time", "Healthy_Type", "Diet_Types", "meal_type", "ScrapedIngredients",
+    "CuisineRegion", "Cooking_Method", "servings_bin",
+)
+# Free-text columns that are truncated further when the budget is exceeded
+LONG_KEYS = ("Description", "Keywords", "RecipeInstructions", "ScrapedIngredients")
+# Everything prompt_snippet depends on; precomputed snippets built with other settings are stale
+SNIPPET_SETTINGS = {
+    "keys": EXAMPLE_KEYS,
+    "long_keys": LONG_KEYS,
+    "field_chars": PROMPT_FIELD_CHARS,
+    "list_items": PROMPT_LIST_ITEMS,
+    "short_field_chars": SHORT_FIELD_CHARS,
+}
+
+# Values the dataset uses for "nothing"
+_EMPTY = {"", "nan", "none", "na", "null", "character(0)", "[]", "c()"}
+# Quoted items of an R vector (c("a", "b")) or a Python list literal (['a', 'b'])
+_LIST_ITEM = re.compile(r'"((?:[^"\\]|\\.)*)"|\'((?:[^\'\\]|\\.)*)\'')
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _truncate(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0].rstrip(" ,;.")
+    return cut + "..."
+
+def _list_items(value: Any) -> Optional[List[str]]:
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value]
+    text = str(value).strip()
+    if text.startswith(("c(", "[")):
+        items = [a or b for a, b in _LIST_ITEM.findall(text)]
+        if items:
+            return items
+    return None
+
+def compact_field(key: str, value: Any) -> Optional[str]:
+    """
+    One example field as a single short line, or None if the recipe has no value:
+    whitespace collapsed, list columns reduced to their first PROMPT_LIST_ITEMS
+    distinct items and long text cut at a word boundary.
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    items = _list_items(value)
+    if items is not None:
+        distinct = list(dict.fromkeys(" ".join(item.split()) for item in items if item.strip()))
+        text = "; ".join(distinct[:PROMPT_LIST_ITEMS])
+        if len(distinct) > PROMPT_LIST_ITEMS:
+            text += f" (+{len(distinct) - PROMPT_LIST_ITEMS} more)"
+    else:
+        text = " ".join(str(value).split())
+    if text.casefold() in _EMPTY:
+        return None
+    return _truncate(text, PROMPT_FIELD_CHARS if key in LONG_KEYS else SHORT_FIELD_CHARS)
+
+def prompt_snippet(row: Dict[str, Any]) -> Dict[str, str]:
+    """
+    The compact example fields of a recipe row, computed once when the recipes are loaded.
+    """
+    snippet = {}
+    for key in EXAMPLE_KEYS:
+        text = compact_field(key, row.get(key))
+        if text is not None:
+            snippet[key] = text
+    return snippet
+
+def _render(snippets: Sequence[Dict[str, str]], long_chars: Optional[int]) -> str:
+    # Attributes all examples agree on are listed once
+    shared = [
+        key for key in EXAMPLE_KEYS
+        if len(snippets) > 1 and key in snippets[0] and all(s.get(key) == snippets[0][key] for s in snippets)
+    ]
+    blocks = []
+    if shared:
+        blocks.append("Shared by all examples:\n" + "\n".join(f"{key}: {snippets[0][key]}" for key in shared))
+    for idx, snippet in enumerate(snippets, start=1):
+        lines = [f"Example Recipe {idx}:"]
+        for key, text in snippet.items():
+            if key in shared:
+                continue
+            if key in LONG_KEYS and long_chars is not None:
+                if long_chars == 0:
+                    continue
+                text = _truncate(text, long_chars)
+            lines.append(f"{key}: {text}")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+def format_examples(snippets: Sequence[Dict[str, str]], budget: int = PROMPT_TOKEN_BUDGET) -> Tuple[str, bool]:
+    """
+    The example recipes section of a generation prompt within `budget` estimated
+    tokens, and whether it had to be trimmed to fit. Long fields are shortened step
+    by step, then left out, then examples are dropped from the end (the first,
+    best-ranked one is always kept).
+    """
+    kept = list(snippets)
+    while True:
+        for long_chars in (None, PROMPT_FIELD_CHARS // 2, PROMPT_FIELD_CHARS // 4, 0):
+            text = _render(kept, long_chars)
+            if estimate_tokens(text) <= budget or (long_chars == 0 and len(kept) <= 1):
+                return text, long_chars is not None or len(kept) < len(snippets)
+        kept.pop()
+
+class PromptStats:
+    """
+    Estimated prompt tokens of recent generation requests.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.prompt_tokens: deque = deque(maxlen=window)
+        self.example_tokens: deque = deque(maxlen=window)
+        self.requests = 0
+        self.trimmed = 0
+
+    def record(self, prompt_tokens: int, example_tokens: int, trimmed: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.trimmed += int(trimmed)
+            self.prompt_tokens.append(prompt_tokens)
+            self.example_tokens.append(example_tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            prompt = sorted(self.prompt_tokens)
+            examples = list(self.example_tokens)
+            return {
+                "budget": PROMPT_TOKEN_BUDGET,
+                "requests": self.requests,
+                "trimmed": self.trimmed,
+                "prompt_tokens_mean": round(sum(prompt) / len(prompt), 1) if prompt else 0.0,
+                "prompt_tokens_p50": prompt[len(prompt) // 2] if prompt else 0,
+                "prompt_tokens_max": prompt[-1] if prompt else 0,
+                "example_tokens_mean": round(sum(examples) / len(examples), 1) if examples else 0.0,
+            }
+
+prompt_stats = PromptStats()
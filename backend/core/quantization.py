@@ -0,0 +1,84 @@
+import os
+import torch
+from typing import List, Optional, Sequence, Union
+
+# Storage precision of the recipe head embeddings the scorer reads for every request:
+# "float32" (exact), "float16" (half the memory) or "int8" (per-row scale, a quarter).
+# Pick one with python -m tools.evaluate_quantization. Applies when the pickled model is
+# loaded (KGE_ENGINE=pickle); memory-mapped engines are quantized by tools.export_engine.
+EMBEDDING_PRECISION = os.environ.get("KGE_EMBEDDING_PRECISION", "float32")
+PRECISIONS = ("float32", "float16", "int8")
+# Recipe rows dequantized per step when scoring, bounding the float32 working copy
+DEQUANT_BLOCK_ROWS = int(os.environ.get("KGE_DEQUANT_BLOCK_ROWS", "16384"))
+
+Index = Union[slice, torch.Tensor]
+
+class QuantizedMatrix:
+    """
+    Row-wise quantized copy of an embedding matrix (rows x ...). Complex embeddings
+    are stored as interleaved (re, im) reals. int8 rows keep one float32 scale each,
+    max |x| / 127, so every row uses the full int8 range.
+    """
+
+    def __init__(self, data: torch.Tensor, scale: Optional[torch.Tensor], shape: torch.Size, is_complex: bool):
+        self.data = data
+        self.scale = scale
+        self.shape = shape  # per-row shape of the original, in real numbers
+        self.is_complex = is_complex
+
+    @classmethod
+    def quantize(cls, x: torch.Tensor, precision: str) -> "QuantizedMatrix":
+        if precision not in ("float16", "int8"):
+            raise ValueError(f"Unsupported quantization precision: {precision}")
+        is_complex = x.is_complex()
+        real = torch.view_as_real(x) if is_complex else x
+        flat = real.detach().float().reshape(len(real), -1)
+        if precision == "float16":
+            return cls(flat.half(), None, real.shape[1:], is_complex)
+        scale = flat.abs().amax(dim=1, keepdim=True) / 127
+        scale = torch.where(scale > 0, scale, torch.ones_like(scale))
+        data = torch.round(flat / scale).clamp_(-127, 127).to(torch.int8)
+        return cls(data, scale, real.shape[1:], is_complex)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def nbytes(self) -> int:
+        scale_bytes = self.scale.numel() * self.scale.element_size() if self.scale is not None else 0
+        return self.data.numel() * self.data.element_size() + scale_bytes
+
+    def dequantize(self, rows: Optional[Index] = None) -> torch.Tensor:
+        """
+        float32 (or complex64) copy of the selected rows, all rows by default.
+        """
+        rows = slice(None) if rows is None else rows
+        x = self.data[rows].float()
+        if self.scale is not None:
+            x = x * self.scale[rows]
+        x = x.reshape(len(x), *self.shape)
+        return torch.view_as_complex(x.contiguous()) if self.is_complex else x
+
+QuantizedRepresentation = Union[QuantizedMatrix, List[QuantizedMatrix]]
+
+def quantize_representation(
+    rep: Union[torch.Tensor, Sequence[torch.Tensor]], precision: str
+) -> QuantizedRepresentation:
+    if isinstance(rep, torch.Tensor):
+        return QuantizedMatrix.quantize(rep, precision)
+    return [QuantizedMatrix.quantize(r, precision) for r in rep]
+
+def dequantize_representation(rep: QuantizedRepresentation, rows: Optional[Index] = None):
+    if isinstance(rep, QuantizedMatrix):
+        return rep.dequantize(rows)
+    return [r.dequantize(rows) for r in rep]
+
+def representation_nbytes(rep) -> int:
+    """
+    Bytes held by a (possibly quantized) representation.
+    """
+    if isinstance(rep, QuantizedMatrix):
+        return rep.nbytes
+    if isinstance(rep, torch.Tensor):
+        return rep.numel() * rep.element_size()
+    return sum(representation_nbytes(r) for r in rep)
@@ -0,0 +1,333 @@
+import os
+import re
+import json
+import time
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Type, Union, get_args, get_origin
+
+from pydantic import BaseModel, ValidationError, create_model
+
+from models.schemas import Ingredient, RecipeInfo, RecipeResponse
+from core.json_repair import loads_tolerant
+
+# "schema" makes the LLM decode against the generation schema (Gemini JSON mode);
+# "off" leaves the response free-form and only validates it afterwards
+LLM_JSON_MODE = os.environ.get("LLM_JSON_MODE", "schema")
+# Ask the LLM again for just the fields that are still invalid after local repair
+RECIPE_REASK = os.environ.get("RECIPE_REASK", "1") == "1"
+# Recipe JSON shown to the LLM when re-asking, at most
+REASK_CONTEXT_CHARS = 4000
+
+# Fields of RecipeResponse the server fills in; the LLM is not asked for them
+SERVER_RECIPE_FIELDS = ("rating", "reviews", "userId", "userName", "createdAt")
+SERVER_INGREDIENT_FIELDS = ("id",)
+
+# How a response was made valid, from cheapest to most degraded
+OUTCOMES = ("valid", "repaired", "reasked", "defaulted", "failed")
+# Degraded recipes are returned but not cached, so the next request tries again
+CACHEABLE_OUTCOMES = ("valid", "repaired", "reasked")
+
+def _without(model: Type[BaseModel], exclude: Tuple[str, ...], name: str, **overrides: Any) -> Type[BaseModel]:
+    fields = {
+        field: (overrides.get(field, info.annotation), info)
+        for field, info in model.model_fields.items()
+        if field not in exclude
+    }
+    return create_model(name, **fields)
+
+# What the LLM generates: RecipeResponse without the server-filled fields
+GeneratedIngredient = _without(Ingredient, SERVER_INGREDIENT_FIELDS, "GeneratedIngredient")
+GeneratedRecipe = _without(
+    RecipeInfo, SERVER_RECIPE_FIELDS, "GeneratedRecipe", ingredients=List[GeneratedIngredient]
+)
+GeneratedRecipeResponse = create_model("GeneratedRecipeResponse", recipes=(List[GeneratedRecipe], ...))
+
+# Passed to the LLM as response_schema for recipe generation
+RECIPE_RESPONSE_SCHEMA = GeneratedRecipeResponse if LLM_JSON_MODE == "schema" else None
+
+@lru_cache(maxsize=256)
+def _fields_model(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    Schema of a re-ask answer: only the given GeneratedRecipe fields.
+    """
+    info = GeneratedRecipe.model_fields
+    return create_model("RecipeFields", **{f: (info[f].annotation, info[f]) for f in fields})
+
+class ValidatedRecipe(NamedTuple):
+    text: Optional[str]  # RecipeResponse JSON, None if the response held no JSON at all
+    outcome: str         # one of OUTCOMES
+
+class RepairStats:
+    """
+    Outcome counters of the validation stage, with the time spent repairing and an
+    estimate of the regeneration time saved: for every response that was fixed
+    instead of regenerated, the duration of the original generation minus the re-ask.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {outcome: 0 for outcome in OUTCOMES}
+        self.repair_ms = 0.0
+        self.reask_ms = 0.0
+        self.saved_ms = 0.0
+
+    def record(self, outcome: str, repair_ms: float, reask_ms: float, generation_ms: float) -> None:
+        with self._lock:
+            self.counts[outcome] += 1
+            self.repair_ms += repair_ms
+            self.reask_ms += reask_ms
+            if outcome in ("repaired", "reasked", "defaulted"):
+                self.saved_ms += max(0.0, generation_ms - reask_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(self.counts.values())
+            fixed = sum(self.counts[o] for o in ("repaired", "reasked", "defaulted"))
+            return {
+                "json_mode": LLM_JSON_MODE,
+                "outcomes": dict(self.counts),
+                "repair_rate": fixed / total if total else 0.0,
+                "repair_ms": round(self.repair_ms, 1),
+                "reask_ms": round(self.reask_ms, 1),
+                "saved_regeneration_ms": round(self.saved_ms, 1),
+            }
+
+repair_stats = RepairStats()
+
+def _complete(data: Dict[str, Any]) -> None:
+    """
+    Fills the server-side fields of every recipe in place.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    for recipe in data.get("recipes") or []:
+        if not isinstance(recipe, dict):
+            continue
+        recipe.setdefault("rating", 0.0)
+        recipe.setdefault("reviews", 0)
+        recipe.setdefault("userId", "")
+        recipe.setdefault("userName", "")
+        recipe.setdefault("createdAt", now)
+        for i, ingredient in enumerate(recipe.get("ingredients") or []):
+            if isinstance(ingredient, dict):
+                ingredient.setdefault("id", str(i + 1))
+
+def _errors(data: Any) -> List[Dict[str, Any]]:
+    try:
+        RecipeResponse.model_validate(data)
+        return []
+    except ValidationError as e:
+        return e.errors()
+
+def _parent(data: Any, loc: Tuple[Union[str, int], ...]) -> Any:
+    for key in loc[:-1]:
+        data = data[key]
+    return data
+
+_LEADING_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+def _coerce(data: Any, errors: List[Dict[str, Any]]) -> bool:
+    """
+    Fixes values of the wrong scalar type in place: numbers where strings are
+    expected, "45 minutes" or 3.5 where integers are expected. True if anything changed.
+    """
+    changed = False
+    for error in errors:
+        kind, value, loc = error["type"], error.get("input"), error["loc"]
+        fixed = None
+        if kind == "string_type" and isinstance(value, (int, float)) and not isinstance(value, bool):
+            fixed = str(value)
+        elif kind in ("int_from_float", "int_parsing", "float_parsing") and value is not None:
+            match = _LEADING_NUMBER.search(str(value))
+            if match:
+                number = float(match.group())
+                fixed = round(number) if kind != "float_parsing" else number
+        if fixed is not None:
+            try:
+                _parent(data, loc)[loc[-1]] = fixed
+                changed = True
+            except (KeyError, IndexError, TypeError):
+                pass
+    return changed
+
+def _drop_invalid_items(data: Any, errors: List[Dict[str, Any]], last_only: bool) -> bool:
+    """
+    Removes list items (ingredients, steps, ...) that fail validation; with
+    `last_only`, only the final item of a list, which is what truncation leaves behind.
+    """
+    doomed: Dict[Tuple[Union[str, int], ...], set] = {}
+    for error in errors:
+        loc = error["loc"]
+        # ("recipes", r, field, i, ...): an item of a list field of recipe r
+        if len(loc) >= 4 and isinstance(loc[3], int):
+            doomed.setdefault(loc[:3], set()).add(loc[3])
+    changed = False
+    for path, indexes in doomed.items():
+        try:
+            items = _parent(data, path + (0,))
+        except (KeyError, IndexError, TypeError):
+            continue
+        if not isinstance(items, list):
+            continue
+        if last_only:
+            indexes = {i for i in indexes if i == len(items) - 1}
+        for i in sorted(indexes, reverse=True):
+            del items[i]
+            changed = True
+    return changed
+
+def _broken_fields(errors: List[Dict[str, Any]]) -> Dict[int, List[str]]:
+    """
+    Invalid or missing generated fields per recipe index.
+    """
+    broken: Dict[int, List[str]] = {}
+    for error in errors:
+        loc = error["loc"]
+        if len(loc) >= 3 and loc[0] == "recipes" and isinstance(loc[1], int):
+            field = loc[2]
+            if field in GeneratedRecipe.model_fields and field not in broken.setdefault(loc[1], []):
+                broken[loc[1]].append(field)
+    return broken
+
+def _blank(annotation: Any) -> Any:
+    """
+    Zero value of a field type, used for fields that could not be repaired.
+    """
+    origin = get_origin(annotation)
+    if origin is Union:
+        return None if type(None) in get_args(annotation) else _blank(get_args(annotation)[0])
+    if origin in (list, List):
+        return []
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return {
+            name: _blank(info.annotation)
+            for name, info in annotation.model_fields.items()
+            if info.is_required()
+        }
+    return {str: "", int: 0, float: 0.0, bool: False}.get(annotation)
+
+class _Draft:
+    """
+    A response between the validation steps.
+    """
+
+    def __init__(self, raw_text: str):
+        self.errors: List[Dict[str, Any]] = []
+        self.data, repaired = loads_tolerant(raw_text)
+        self.outcome = "repaired" if repaired else "valid"
+        if isinstance(self.data, list):
+            self.data = {"recipes": self.data}
+        if not isinstance(self.data, dict) or not isinstance(self.data.get("recipes"), list):
+            self.data = None
+            self.outcome = "failed"
+            return
+        _complete(self.data)
+        self.errors = _errors(self.data)
+        # Cheap local fixes first: scalar coercion, then the items a truncation cut off
+        if self.errors and _coerce(self.data, self.errors):
+            self.outcome = "repaired"
+            self.errors = _errors(self.data)
+        if self.errors and _drop_invalid_items(self.data, self.errors, last_only=True):
+            self.outcome = "repaired"
+            self.errors = _errors(self.data)
+
+    def reask_prompts(self) -> List[Tuple[int, Tuple[str, ...], str]]:
+        """
+        (recipe index, fields, prompt) for every recipe with broken fields.
+        """
+        prompts = []
+        for index, fields in _broken_fields(self.errors).items():
+            recipe = {k: v for k, v in self.data["recipes"][index].items() if k not in fields}
+            context = json.dumps(recipe, ensure_ascii=False)[:REASK_CONTEXT_CHARS]
+            prompt = f"""
+The recipe below was generated as JSON, but its fields {", ".join(fields)} are missing or invalid.
+
+Recipe (without those fields):
+{context}
+
+Output a single JSON object with exactly these keys: {", ".join(f'"{f}"' for f in fields)}.
+The values must be consistent with the recipe and have the same format as in a full recipe
+(e.g. "ingredients" is an array of objects with name, amount, unit, notes, category and
+amountInGrams; "steps" is an array of objects with title, description and duration).
+Output only the JSON.
+"""
+            prompts.append((index, tuple(fields), prompt))
+        return prompts
+
+    def apply_reask(self, index: int, fields: Tuple[str, ...], reply: str) -> None:
+        value, _ = loads_tolerant(reply)
+        if isinstance(value, dict):
+            recipe = self.data["recipes"][index]
+            recipe.update({f: value[f] for f in fields if f in value})
+            _complete(self.data)
+
+    def finish(self, reasked: bool) -> ValidatedRecipe:
+        if self.data is None:
+            return ValidatedRecipe(None, "failed")
+        if reasked:
+            self.errors = _errors(self.data)
+            if self.errors and _coerce(self.data, self.errors):
+                self.errors = _errors(self.data)
+            if not self.errors:
+                self.outcome = "reasked"
+        if self.errors:
+            # Last resort: drop every invalid item, then blank what is still broken
+            if _drop_invalid_items(self.data, self.errors, last_only=False):
+                self.errors = _errors(self.data)
+            for index, fields in _broken_fields(self.errors).items():
+                for field in fields:
+                    self.data["recipes"][index][field] = _blank(GeneratedRecipe.model_fields[field].annotation)
+            self.errors = _errors(self.data)
+            if self.errors:
+                print(f"[DEBUG] Recipe still invalid after repair: {self.errors[:3]}")
+                return ValidatedRecipe(None, "failed")
+            self.outcome = "defaulted"
+        return ValidatedRecipe(RecipeResponse.model_validate(self.data).model_dump_json(), self.outcome)
+
+def _record(result: ValidatedRecipe, started: float, reask_ms: float, generation_ms: float) -> ValidatedRecipe:
+    repair_ms = (time.perf_counter() - started) * 1000 - reask_ms
+    repair_stats.record(result.outcome, repair_ms, reask_ms, generation_ms)
+    if result.outcome != "valid":
+        print(f"[DEBUG] Recipe JSON {result.outcome} (repair {repair_ms:.1f} ms, re-ask {reask_ms:.1f} ms)")
+    return result
+
+def validate_recipe_json(raw_text: str, generate: Any = None, generation_ms: float = 0.0) -> ValidatedRecipe:
+    """
+    Parses, repairs and validates a generated recipe against models.schemas.RecipeResponse.
+    Defects are fixed locally where possible (fences, trailing commas, truncation,
+    scalar types); fields that stay invalid are asked for again with
+    `generate(prompt, response_schema)` (if given and RECIPE_REASK is on), and blanked
+    as a last resort. `generation_ms` is the duration of the original generation.
+    """
+    started = time.perf_counter()
+    draft = _Draft(raw_text)
+    reask_ms, reasked = 0.0, False
+    if draft.data is not None and draft.errors and generate is not None and RECIPE_REASK:
+        for index, fields, prompt in draft.reask_prompts():
+            reask_start = time.perf_counter()
+            try:
+                draft.apply_reask(index, fields, generate(prompt, _fields_model(fields)))
+            except Exception as e:
+                print(f"[DEBUG] Re-ask for {fields} failed: {e}")
+            reask_ms += (time.perf_counter() - reask_start) * 1000
+            reasked = True
+    return _record(draft.finish(reasked), started, reask_ms, generation_ms)
+
+async def validate_recipe_json_async(raw_text: str, generate_async: Any = None, generation_ms: float = 0.0) -> ValidatedRecipe:
+    """
+    validate_recipe_json with an awaitable re-ask `generate_async(prompt, response_schema)`.
+    """
+    started = time.perf_counter()
+    draft = _Draft(raw_text)
+    reask_ms, reasked = 0.0, False
+    if draft.data is not None and draft.errors and generate_async is not None and RECIPE_REASK:
+        for index, fields, prompt in draft.reask_prompts():
+            reask_start = time.perf_counter()
+            try:
+                draft.apply_reask(index, fields, await generate_async(prompt, _fields_model(fields)))
+            except Exception as e:
+                print(f"[DEBUG] Re-ask for {fields} failed: {e}")
+            reask_ms += (time.perf_counter() - reask_start) * 1000
+            reasked = True
+    return _record(draft.finish(reasked), started, reask_ms, generation_ms)
@@ -1,65 +1,158 @@
 import json
-from core.llm_session import chat_session
-from core.llm_generator import generate_recipe_llm
-from core.vlm_generator import generate_vlm_prompt, call_vlm_api
+import time
+import asyncio
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from core.llm_generator import generate_recipe_llm, generate_recipe_llm_stream
+from core.vlm_generator import (
+    generate_vlm_prompt,
+    call_vlm_api,
+    generate_vlm_prompt_async,
+    call_vlm_api_async,
+    build_template_vlm_prompt,
+    template_vlm_prompt,
+    VLM_PROMPT_MODE,
+    VLM_PROMPT_MODES,
+    TEMPLATE_PROMPT_FIELDS,
+)
+from core.async_utils import StageTimings
 
-def generate_recipe_with_visual(user_criteria: dict) -> str:
+def assemble_final_output(recipe_json: str, image_url: str) -> str:
+    """
+    The final JSON with keys "title", "description", "recipe" and "image_url", built
+    from the recipe itself. The image URL is also set as the recipe's "imageUrl".
+    """
+    try:
+        recipe = json.loads(recipe_json)
+    except ValueError:
+        print("[DEBUG] Recipe JSON does not parse, returning it as a string")
+        recipe = recipe_json
+    first: Dict[str, Any] = {}
+    if isinstance(recipe, dict) and recipe.get("recipes") and isinstance(recipe["recipes"][0], dict):
+        first = recipe["recipes"][0]
+        first["imageUrl"] = image_url
+    final_output = json.dumps({
+        "title": first.get("title", ""),
+        "description": first.get("description", ""),
+        "recipe": recipe,
+        "image_url": image_url,
+    })
+    print(f"[DEBUG] Final output: {final_output}")
+    return final_output
+
+def _check_prompt_mode(mode: str) -> None:
+    if mode not in VLM_PROMPT_MODES:
+        raise ValueError(f"Unknown image prompt mode: {mode}. Choose from {VLM_PROMPT_MODES}")
+
+def generate_recipe_with_visual(user_criteria: dict, prompt_mode: str = VLM_PROMPT_MODE) -> str:
     """
     Full pipeline:
     1) Generate a recipe JSON with the LLM (which includes "recipes": [ {...} ])
-    2) Generate an image prompt from that recipe JSON
+    2) Generate an image prompt from that recipe JSON, with the LLM or from a template
     3) Call the VLM API to get the final image URL
-    4) Ask the LLM to produce a final JSON with these keys:
+    4) Return a final JSON string with these keys:
        - "title"
        - "description"
        - "recipe"
        - "image_url"
-    5) Return that final JSON string
     """
+    _check_prompt_mode(prompt_mode)
     print("[DEBUG] Generating recipe JSON with LLM...")
     recipe_json = generate_recipe_llm(user_criteria)
     print(f"[DEBUG] Recipe JSON: {recipe_json}")
-    
+
     # Convert recipe JSON into an image-generation prompt
     print("[DEBUG] Generating VLM prompt from recipe JSON...")
-    vlm_prompt = generate_vlm_prompt(recipe_json)
-    
+    if prompt_mode == "template":
+        vlm_prompt = template_vlm_prompt(recipe_json)
+    else:
+        vlm_prompt = generate_vlm_prompt(recipe_json)
+
     # Call the VLM API to get the image
     print("[DEBUG] Generating image via VLM API...")
     image_url = call_vlm_api(vlm_prompt)
 
-    # Final step: produce a last JSON output summarizing everything
-    final_prompt = f"""
-You are a creative culinary storyteller. Below is a recipe in JSON format along with a generated image URL representing the dish.
+    return assemble_final_output(recipe_json, image_url)
 
-Recipe JSON:
-{recipe_json}
+async def _image_url_async(vlm_prompt: str, timings: StageTimings) -> str:
+    print("[DEBUG] Generating image via VLM API...")
+    with timings.measure("image"):
+        return await call_vlm_api_async(vlm_prompt)
 
-Generated Image URL: {image_url}
+async def generate_recipe_with_visual_stream(
+    user_criteria: dict,
+    timings: Optional[StageTimings] = None,
+    prompt_mode: str = VLM_PROMPT_MODE,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    The visual pipeline as (event, data) pairs: the events of generate_recipe_llm_stream,
+    its result as a "recipe" event, "stage" events as the image prompt and the image
+    URL become available, the per-stage "timings" and finally ("result", final JSON string).
 
-Please produce a final presentation strictly in JSON format with the following keys:
-- "title": The dish's creative title.
-- "description": A captivating description that incorporates the image URL.
-- "recipe": The original recipe JSON.
-- "image_url": The URL of the generated image.
+    With the "template" prompt mode the image request starts as soon as the recipe
+    fields the template needs have been streamed, while the LLM is still writing the
+    steps and nutrition info.
+    """
+    _check_prompt_mode(prompt_mode)
+    timings = StageTimings() if timings is None else timings
+    fields: Dict[str, Any] = {}
+    image_task: Optional[asyncio.Task] = None
+    recipe_json = None
+    since = time.perf_counter()
+    try:
+        async for event, data in generate_recipe_llm_stream(user_criteria):
+            if event == "stage" and data["stage"] in ("examples_retrieved", "recipe_cached"):
+                timings.record("examples", since)
+                since = time.perf_counter()
+            elif event == "field" and data["recipe"] == 0:
+                fields[data["name"]] = data["value"]
+                if (
+                    prompt_mode == "template"
+                    and image_task is None
+                    and all(f in fields for f in TEMPLATE_PROMPT_FIELDS)
+                ):
+                    with timings.measure("image_prompt"):
+                        vlm_prompt = build_template_vlm_prompt(fields)
+                    image_task = asyncio.create_task(_image_url_async(vlm_prompt, timings))
+                    yield "stage", {"stage": "image_prompt_ready"}
+            if event == "result":
+                timings.record("recipe_llm", since)
+                recipe_json = data
+                yield "recipe", data
+            else:
+                yield event, data
 
-Output only the final JSON.
-"""
-    print("[DEBUG] Sending final prompt to Gemini LLM for output generation...")
-    print(f"[DEBUG] Final prompt:\n{final_prompt}")
+        if image_task is None:
+            with timings.measure("image_prompt"):
+                if prompt_mode == "template":
+                    # The streamed fields were incomplete; fall back to the finished recipe
+                    vlm_prompt = template_vlm_prompt(recipe_json)
+                else:
+                    vlm_prompt = await generate_vlm_prompt_async(recipe_json)
+            yield "stage", {"stage": "image_prompt_ready"}
+            image_task = asyncio.create_task(_image_url_async(vlm_prompt, timings))
+        image_url = await image_task
+        yield "stage", {"stage": "image_url_ready", "image_url": image_url}
 
-    final_response = chat_session.send_message(final_prompt)
-    final_text = final_response.text.strip()
-    print(f"[DEBUG] Raw final LLM response: {final_text}")
+        final_output = assemble_final_output(recipe_json, image_url)
+        yield "timings", timings.finish()
+        yield "result", final_output
+    finally:
+        if image_task is not None and not image_task.done():
+            image_task.cancel()
 
-    # Strip code fences if any
-    if final_text.startswith("```"):
-        lines = final_text.splitlines()
-        if lines[0].startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].startswith("```"):
-            lines = lines[:-1]
-        final_text = "\n".join(lines).strip()
-    
-    print(f"[DEBUG] Final output: {final_text}")
-    return final_text
+async def generate_recipe_with_visual_async(
+    user_criteria: dict,
+    timings: Optional[StageTimings] = None,
+    prompt_mode: str = VLM_PROMPT_MODE,
+) -> str:
+    """
+    Same pipeline as generate_recipe_with_visual, with every remote call awaited under
+    its stage timeout so the worker keeps serving other requests meanwhile. Runs
+    generate_recipe_with_visual_stream to completion, so the template prompt mode
+    overlaps the image request with the end of the recipe generation here as well.
+    """
+    final_output = None
+    async for event, data in generate_recipe_with_visual_stream(user_criteria, timings, prompt_mode):
+        if event == "result":
+            final_output = data
+    return final_output
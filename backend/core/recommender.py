@@ -1,15 +1,24 @@
 # recommender.py
 
-from typing import List, Dict, Any, Tuple
-from pykeen.predict import predict_target
-import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
+from typing import List, Dict, Any, Tuple, Optional
+import torch
 
-from core.model import model, triples_factory
-from core.data_loading import recipes_df
+from core.scoring import recipe_scorer
+from core.score_cache import score_cache, SCORE_CHUNK_CRITERIA
+from core.fusion import fuse_scores
+from core.ann import recipe_index
+from core.constraint_index import constraint_index
+from core.data_loading import recipe_store
 from core.kg_utils import map_health_attribute
+from core.entity_resolver import entity_resolver, UnknownEntityError
+from core.batching import MicroBatchScheduler, MICRO_BATCHING
 
 DEBUG = True
+RETRIEVAL_MODES = ("exact", "ann")
+# "soft" ranks the whole catalog by KGE score; "strict" only ranks recipes that are
+# linked to every requested entity in the graph (filter-then-rank)
+CONSTRAINT_MODES = ("soft", "strict")
+
 def map_user_input_to_criteria(
     cooking_method: str,
     servings_bin: str,   # still received for prompt purposes
@@ -19,119 +28,247 @@ def map_user_input_to_criteria(
     health_types: List[str],
     cuisine_region: str,
     ingredients: List[str],
+    strict: bool = True,
 ) -> List[Tuple[str, str]]:
     """
     Maps user input to criteria tuples for the KG lookup.
     Note: 'servings_bin' and 'cook_time' are deliberately excluded
     from the KG matching because they are not available in the knowledge graph.
     They will, however, be included in the LLM prompt.
+
+    Values are resolved to KG entity labels with the entity resolver, so case,
+    plural and spelling variants still match. Values that resolve to nothing raise
+    an UnknownEntityError listing all of them, or are skipped if `strict` is False.
     """
     criteria = []
+    unknown = []
+
+    def resolve(entity_type: str, value: str) -> Optional[str]:
+        value = value.strip()
+        if not value:
+            return None
+        resolution = entity_resolver.resolve(entity_type, value)
+        if resolution is None:
+            unknown.append({
+                "type": entity_type,
+                "value": value,
+                "suggestions": entity_resolver.suggestions(entity_type, value),
+            })
+            return None
+        if DEBUG and resolution.method != "exact":
+            print(f"[DEBUG] Resolved {entity_type} '{value}' to '{resolution.value}' ({resolution.method})")
+        return resolution.label
 
     # Map diet types (e.g., "Standard" => "diet_type_Standard")
     for dt in diet_types:
-        dt_clean = dt.strip()
-        tail = f"diet_type_{dt_clean}"
-        criteria.append((tail, "hasDietType"))
+        tail = resolve("diet_type", dt)
+        if tail:
+            criteria.append((tail, "hasDietType"))
 
     # Map meal types (e.g., "dinner" => "meal_type_dinner")
     for mt in meal_type:
-        mt_clean = mt.strip()
-        tail = f"meal_type_{mt_clean}"
-        criteria.append((tail, "isForMealType"))
+        tail = resolve("meal_type", mt)
+        if tail:
+            criteria.append((tail, "isForMealType"))
 
     # Map health types (e.g., "High Calorie" => "health_attribute_High Calorie")
     for ht in health_types:
-        ht_clean = ht.strip()
-        relation = map_health_attribute(ht_clean)
-        tail = f"health_attribute_{ht_clean}"
-        criteria.append((tail, relation))
+        tail = resolve("health_attribute", ht)
+        if tail:
+            relation = map_health_attribute(tail[len("health_attribute_"):])
+            criteria.append((tail, relation))
 
     # Map cuisine region (e.g., "Southeast Asia" => "cuisine_region_Southeast Asia")
     if cuisine_region:
-        cr = cuisine_region.strip()
-        tail = f"cuisine_region_{cr}"
-        criteria.append((tail, "hasCuisineRegion"))
+        tail = resolve("cuisine_region", cuisine_region)
+        if tail:
+            criteria.append((tail, "hasCuisineRegion"))
 
-    # Map ingredients (e.g., "Tomato" => "ingredient_Tomato")
+    # Map ingredients (e.g., "Tomatoes" => "ingredient_tomato")
     for ing in ingredients:
-        ing_clean = ing.strip()
-        tail = f"ingredient_{ing_clean}"
-        criteria.append((tail, "containsIngredient"))
+        tail = resolve("ingredient", ing)
+        if tail:
+            criteria.append((tail, "containsIngredient"))
 
+    if unknown:
+        if strict:
+            raise UnknownEntityError(unknown)
+        if DEBUG:
+            print(f"[DEBUG] Skipping unknown entities: {[u['value'] for u in unknown]}")
     return criteria
 
-
-
-
-def _normalize_scores(df: pd.DataFrame) -> pd.DataFrame:
+def _ann_candidates(
+    criteria: List[Tuple[str, str]], top_k: int, nprobe: Optional[int] = None
+) -> Optional[torch.Tensor]:
+    if recipe_index is None:
+        if DEBUG:
+            print("[DEBUG] No ANN index available for this model, using exact retrieval")
+        return None
+    candidates = recipe_index.candidates(criteria, nprobe=nprobe, min_candidates=top_k)
     if DEBUG:
-        print(f"[DEBUG] Normalizing scores for dataframe with shape: {df.shape}")
+        if candidates is None:
+            print("[DEBUG] ANN returned fewer than top_k candidates, using exact retrieval")
+        else:
+            print(f"[DEBUG] ANN retrieved {len(candidates)} of {recipe_scorer.num_recipes} recipes")
+    return candidates
 
-    if df.empty:
-        df["normalized_score"] = 0.0
-        if DEBUG:
-            print("[DEBUG] DataFrame is empty. Set normalized_score to 0.0")
-        return df
+def _constraint_candidates(criteria: List[Tuple[str, str]]) -> torch.Tensor:
+    """
+    Positions of the recipes linked to every criterion entity, from the inverted index.
+    """
+    tail_ids, _ = recipe_scorer.lookup(criteria)
+    candidates = constraint_index.candidates(tail_ids.tolist())
+    if DEBUG:
+        print(f"[DEBUG] Hard constraints kept {len(candidates)} of {recipe_scorer.num_recipes} recipes")
+    return torch.as_tensor(candidates, dtype=torch.long)
 
-    scaler = MinMaxScaler()
-    df["normalized_score"] = scaler.fit_transform(df[["score"]])
-    return df
+def _check_modes(retrieval: str, constraints: str) -> None:
+    if retrieval not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {retrieval}. Choose from {RETRIEVAL_MODES}")
+    if constraints not in CONSTRAINT_MODES:
+        raise ValueError(f"Unknown constraints mode: {constraints}. Choose from {CONSTRAINT_MODES}")
 
 def get_matching_recipes(
     criteria: List[Tuple[str, str]],
     top_k: int,
-    flexible: bool = False
+    flexible: bool = False,
+    fusion: str = "sum",
+    weights: Optional[List[float]] = None,
+    retrieval: str = "exact",
+    nprobe: Optional[int] = None,
+    constraints: str = "soft",
 ) -> List[str]:
     if DEBUG:
-        print(f"[DEBUG] Getting matching recipes for criteria: {criteria} with top_k: {top_k} and flexible: {flexible}")
+        print(f"[DEBUG] Getting matching recipes for criteria: {criteria} with top_k: {top_k}, flexible: {flexible}, fusion: {fusion}, retrieval: {retrieval} and constraints: {constraints}")
     if not criteria:
         return []
+    _check_modes(retrieval, constraints)
 
-    all_preds = []
-    for tail, relation in criteria:
-        if DEBUG:
-            print(f"[DEBUG] Predicting for tail: {tail}, relation: {relation}")
-        preds = predict_target(
-            model=model,
-            relation=relation,
-            tail=tail,
-            triples_factory=triples_factory
-        ).df
-        preds = _normalize_scores(preds)
-        preds["weighted_score"] = preds["normalized_score"]  # no weighting
-        preds = preds[["head_label", "weighted_score"]]
-        all_preds.append(preds)
-
-    # Merge results
-    merged = all_preds[0]
-    for other in all_preds[1:]:
-        how_type = "outer" if flexible else "inner"
-        merged = merged.merge(other, on="head_label", how=how_type, suffixes=("", "_y"))
-        merged["weighted_score"] = merged["weighted_score"].fillna(0) + merged["weighted_score_y"].fillna(0)
-        merged.drop(columns=["weighted_score_y"], inplace=True)
-
-    # Filter to recipe_***
-    merged = merged[merged["head_label"].str.startswith("recipe_")]
-    merged.sort_values(by="weighted_score", ascending=False, inplace=True)
-    merged = merged.head(top_k)
-
-    # Convert "recipe_123" -> "123"
-    def parse_recipe_id(node_str: str) -> str:
-        return node_str.split("recipe_", 1)[1]
-
-    ids = merged["head_label"].apply(parse_recipe_id).to_list()
+    # "strict" restricts scoring to the recipes satisfying every criterion; that set is
+    # usually small, so the ANN index is not consulted. "ann" narrows the recipes to
+    # score with the IVF index; the candidates are still scored exactly, and "exact"
+    # (or a missing index) scores the whole catalog.
+    if constraints == "strict":
+        candidates = _constraint_candidates(criteria)
+        if len(candidates) == 0:
+            return []
+    else:
+        candidates = _ann_candidates(criteria, top_k, nprobe) if retrieval == "ann" else None
+
+    # Exact retrieval reuses cached per-criterion vectors (also for constraint candidates
+    # when all of them are cached); other candidates are scored directly
+    if candidates is None:
+        scores = score_cache.scores(criteria)
+    elif constraints == "strict" and all(tuple(c) in score_cache for c in criteria):
+        scores = score_cache.scores(criteria)[:, candidates]
+    else:
+        scores = recipe_scorer.score(criteria, candidates=candidates)
+    fused = fuse_scores(scores, strategy=fusion, weights=weights, flexible=flexible)
+
+    ids = recipe_scorer.top_k(fused, top_k, candidates=candidates)
     if DEBUG:
         print(f"[DEBUG] Final top {top_k} recipe IDs: {ids}")
     return ids
 
+def get_matching_recipes_batch(
+    queries: List[Dict[str, Any]],
+    chunk_size: int = SCORE_CHUNK_CRITERIA,
+) -> List[Dict[str, Any]]:
+    """
+    Batched get_matching_recipes for many independent queries, each a dict with
+    "criteria" and optionally "top_k", "flexible", "fusion", "weights" and "constraints".
+    (tail, relation) criteria shared between queries are scored only once (or taken
+    from the score vector cache), and every query is then fused on its own rows.
+    Returns one {"recipe_ids": [...], "error": None | str} per query, in order; a bad
+    query gets an error without failing the rest of the batch. Batch scoring is
+    always exact.
+    """
+    results: List[Dict[str, Any]] = [{"recipe_ids": [], "error": None} for _ in queries]
+
+    # Column of every distinct criterion in the shared score matrix
+    unique: Dict[Tuple[str, str], int] = {}
+    rows: List[Optional[List[int]]] = []
+    candidates: List[Optional[torch.Tensor]] = []
+    for i, query in enumerate(queries):
+        try:
+            _check_modes("exact", query.get("constraints", "soft"))
+            recipe_scorer.lookup(query["criteria"])
+            strict = query.get("constraints", "soft") == "strict" and len(query["criteria"]) > 0
+            candidates.append(_constraint_candidates(query["criteria"]) if strict else None)
+        except ValueError as e:
+            results[i]["error"] = str(e)
+            rows.append(None)
+            candidates.append(None)
+            continue
+        rows.append([unique.setdefault(tuple(c), len(unique)) for c in query["criteria"]])
+
+    if DEBUG:
+        total = sum(len(r) for r in rows if r)
+        print(f"[DEBUG] Batch of {len(queries)} queries: {total} criteria, {len(unique)} unique")
+    if not unique:
+        return results
+
+    scores = score_cache.scores(list(unique), chunk_size=chunk_size)
+
+    for i, (query, query_rows, query_candidates) in enumerate(zip(queries, rows, candidates)):
+        if not query_rows:
+            continue
+        query_scores = scores[query_rows]
+        if query_candidates is not None:
+            if len(query_candidates) == 0:
+                continue
+            query_scores = query_scores[:, query_candidates]
+        try:
+            fused = fuse_scores(
+                query_scores,
+                strategy=query.get("fusion", "sum"),
+                weights=query.get("weights"),
+                flexible=query.get("flexible", False),
+            )
+            results[i]["recipe_ids"] = recipe_scorer.top_k(
+                fused, query.get("top_k", 5), candidates=query_candidates
+            )
+        except ValueError as e:
+            results[i]["error"] = str(e)
+    return results
+
+# Coalesces concurrent single requests into get_matching_recipes_batch calls
+recommend_scheduler = MicroBatchScheduler(get_matching_recipes_batch, name="recommend-batcher")
+
+def get_matching_recipes_coalesced(
+    criteria: List[Tuple[str, str]],
+    top_k: int,
+    fusion: str = "sum",
+    retrieval: str = "exact",
+    constraints: str = "soft",
+) -> List[str]:
+    """
+    get_matching_recipes for request handlers: exact queries are merged with other
+    requests arriving at the same time and scored in one batch. ANN queries, and all
+    queries when RECOMMEND_MICRO_BATCHING is off, are scored directly.
+    """
+    if not MICRO_BATCHING or retrieval != "exact" or not criteria:
+        return get_matching_recipes(
+            criteria=criteria, top_k=top_k, fusion=fusion, retrieval=retrieval, constraints=constraints
+        )
+    result = recommend_scheduler.submit(
+        {"criteria": criteria, "top_k": top_k, "fusion": fusion, "constraints": constraints}
+    )
+    if result["error"]:
+        raise ValueError(result["error"])
+    return result["recipe_ids"]
+
 def fetch_recipe_info(recipe_id: str) -> Dict[str, Any]:
-    try:
-        rid_int = int(recipe_id)
-    except ValueError:
-        return None
+    return recipe_store.get(recipe_id)
 
-    row = recipes_df[recipes_df["RecipeId"] == rid_int]
-    if row.empty:
-        return None
-    return row.iloc[0].to_dict()
+def fetch_recipes_info(recipe_ids: List[str]) -> List[Dict[str, Any]]:
+    """
+    Batched fetch_recipe_info: rows for the given IDs in order, skipping unknown IDs.
+    """
+    return recipe_store.fetch_many(recipe_ids)
+
+def fetch_recipe_snippets(recipe_ids: List[str]) -> List[Dict[str, str]]:
+    """
+    Compact LLM prompt fields of the given recipes (see core.prompt_compaction), precomputed at load time.
+    """
+    return recipe_store.snippets(recipe_ids)
@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.cache import CACHE_DIR
+
+# Comma-separated cache levels, fastest first: "memory", "sqlite". Empty disables caching.
+RESPONSE_CACHE_BACKENDS = os.environ.get("RESPONSE_CACHE_BACKENDS", "memory,sqlite")
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", str(24 * 3600)))
+RESPONSE_CACHE_MEMORY_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MEMORY_ENTRIES", "1024"))
+RESPONSE_CACHE_DISK_ENTRIES = int(os.environ.get("RESPONSE_CACHE_DISK_ENTRIES", "100000"))
+# Shared by every gunicorn worker on the host
+RESPONSE_CACHE_PATH = os.environ.get(
+    "RESPONSE_CACHE_PATH", os.path.join(CACHE_DIR, "responses.sqlite")
+)
+
+# Request fields that influence the KGE example retrieval of the generation pipeline
+EXAMPLE_FIELDS = ("diet_types", "meal_type", "health_types", "cuisine_region", "ingredients")
+# Request fields that do not influence generation at all
+IGNORED_FIELDS = ("top_k", "fusion", "retrieval", "constraints")
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip().casefold()
+    if isinstance(value, (list, tuple, set)):
+        return sorted({_normalize(v) for v in value if v not in (None, "")})
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+def canonical_request(request: Dict[str, Any], fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+    """
+    Order- and case-insensitive form of a request: list values are sorted and
+    de-duplicated, strings stripped and casefolded, empty values dropped.
+    Only `fields` are kept if given, otherwise everything except IGNORED_FIELDS.
+    """
+    keys = fields if fields is not None else [k for k in request if k not in IGNORED_FIELDS]
+    canonical = {}
+    for k in sorted(keys):
+        v = _normalize(request.get(k))
+        if v not in (None, "", []):
+            canonical[k] = v
+    return canonical
+
+def cache_key(*parts: Any) -> str:
+    """
+    Stable hash of JSON-serializable parts.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def request_key(request: Dict[str, Any], fields: Optional[Tuple[str, ...]] = None) -> str:
+    return cache_key(canonical_request(request, fields))
+
+class MemoryCacheBackend:
+    """
+    In-process LRU with per-entry expiry.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, expires: float) -> None:
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteCacheBackend:
+    """
+    On-disk LRU with per-entry expiry in a single SQLite file (WAL mode), so every
+    worker process on the host reads and fills the same cache.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, max_entries: int = RESPONSE_CACHE_DISK_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self._conn()
+        row = conn.execute("SELECT value, expires FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires = row
+        now = time.time()
+        if expires < now:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key: str, value: str, expires: float) -> None:
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+            (key, value, expires, now),
+        )
+        conn.execute("DELETE FROM responses WHERE expires < ?", (now,))
+        conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM responses")
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+class ResponseCache:
+    """
+    Multi-level cache for the stages of the generation pipeline. Lookups go through the
+    levels in order and a hit in a slower level is copied into the faster ones; writes
+    go to every level. Values are stored as JSON. Hit/miss counters are kept per stage
+    and level for this process.
+    """
+
+    def __init__(self, levels: List[Any], ttl: float = RESPONSE_CACHE_TTL):
+        self.levels = levels
+        self.ttl = ttl
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.levels)
+
+    def _count(self, stage: str, outcome: str) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(stage, {"misses": 0})
+            counters[outcome] = counters.get(outcome, 0) + 1
+
+    def _key(self, stage: str, key: str) -> str:
+        return f"{stage}:{key}"
+
+    def get(self, stage: str, key: str) -> Optional[Any]:
+        full_key = self._key(stage, key)
+        for i, level in enumerate(self.levels):
+            try:
+                raw = level.get(full_key)
+            except Exception as e:
+                print(f"[DEBUG] Response cache level '{level.name}' failed on get: {e}")
+                continue
+            if raw is None:
+                continue
+            self._count(stage, f"hits_{level.name}")
+            expires = time.time() + self.ttl
+            for faster in self.levels[:i]:
+                faster.set(full_key, raw, expires)
+            return json.loads(raw)
+        if self.levels:
+            self._count(stage, "misses")
+        return None
+
+    def set(self, stage: str, key: str, value: Any) -> None:
+        raw = json.dumps(value)
+        expires = time.time() + self.ttl
+        for level in self.levels:
+            try:
+                level.set(self._key(stage, key), raw, expires)
+            except Exception as e:
+                # A cache that cannot be written must never fail the request
+                print(f"[DEBUG] Response cache level '{level.name}' failed on set: {e}")
+
+    def cached(
+        self,
+        stage: str,
+        key: str,
+        compute: Callable[[], Any],
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        """
+        Returns the cached value of (stage, key), computing and storing it on a miss.
+        """
+        value = self.get(stage, key)
+        if value is not None:
+            print(f"[DEBUG] Response cache hit for stage '{stage}'")
+            return value
+        value = compute()
+        if cacheable(value):
+            self.set(stage, key, value)
+        return value
+
+    async def cached_async(
+        self,
+        stage: str,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        """
+        Async cached(): `compute` is a coroutine function, awaited only on a miss.
+        """
+        value = self.get(stage, key)
+        if value is not None:
+            print(f"[DEBUG] Response cache hit for stage '{stage}'")
+            return value
+        value = await compute()
+        if cacheable(value):
+            self.set(stage, key, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {stage: dict(counters) for stage, counters in self._counters.items()}
+        sizes = {}
+        for level in self.levels:
+            try:
+                sizes[level.name] = len(level)
+            except Exception:
+                sizes[level.name] = None
+        return {"ttl": self.ttl, "entries": sizes, "stages": stages}
+
+    def clear(self) -> None:
+        for level in self.levels:
+            level.clear()
+        with self._lock:
+            self._counters.clear()
+
+def create_response_cache(spec: str = RESPONSE_CACHE_BACKENDS) -> ResponseCache:
+    levels = []
+    for name in (s.strip() for s in spec.split(",")):
+        if not name:
+            continue
+        if name == "memory":
+            levels.append(MemoryCacheBackend())
+        elif name == "sqlite":
+            try:
+                levels.append(SQLiteCacheBackend())
+            except Exception as e:
+                print(f"[DEBUG] Disk response cache unavailable ({e}), continuing without it")
+        else:
+            raise ValueError(f"Unknown response cache backend: {name}")
+    return ResponseCache(levels)
+
+response_cache = create_response_cache()
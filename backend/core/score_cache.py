@@ -0,0 +1,166 @@
+import os
+import time
+import threading
+import torch
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from core.scoring import RecipeScorer, recipe_scorer
+from core.fusion import min_max_normalize
+from core.kg_utils import map_health_attribute
+from core.data_loading import get_unique_ingredients
+from core.entity_resolver import entity_resolver
+
+# Memory budget for cached score vectors, per worker. 0 disables the cache.
+SCORE_CACHE_MB = float(os.environ.get("SCORE_CACHE_MB", "256"))
+# float32 matches uncached rankings up to float rounding; float16 halves the memory
+SCORE_CACHE_DTYPE = os.environ.get("SCORE_CACHE_DTYPE", "float32")
+SCORE_CACHE_WARMUP = os.environ.get("SCORE_CACHE_WARMUP", "1") not in ("0", "false", "off")
+# Most frequent ingredients precomputed at startup, after the attribute entities
+SCORE_CACHE_WARMUP_INGREDIENTS = int(os.environ.get("SCORE_CACHE_WARMUP_INGREDIENTS", "500"))
+# Criteria scored per forward pass on a miss; bounds the (criteria, recipes, dim) intermediate
+SCORE_CHUNK_CRITERIA = 16
+
+DTYPES = {"float32": torch.float32, "float16": torch.float16}
+
+# Attribute entity prefixes precomputed at warmup, with the relation that links recipes to them.
+# Health attributes are resolved per entity with map_health_attribute.
+WARMUP_PREFIXES = {
+    "diet_type_": "hasDietType",
+    "meal_type_": "isForMealType",
+    "cuisine_region_": "hasCuisineRegion",
+    "health_attribute_": None,
+}
+
+Criterion = Tuple[str, str]
+
+class ScoreVectorCache:
+    """
+    LRU cache of min-max normalized recipe score vectors keyed by (tail, relation).
+    Every fusion strategy either re-normalizes rows or ranks them, so fusing cached
+    normalized rows ranks recipes like fusing raw scores (up to float rounding).
+    The cache holds as many vectors as fit into `budget_mb`.
+    """
+
+    def __init__(self, scorer: RecipeScorer, budget_mb: float = SCORE_CACHE_MB, dtype: str = SCORE_CACHE_DTYPE):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported score cache dtype: {dtype}. Choose from {sorted(DTYPES)}")
+        self.scorer = scorer
+        self.dtype = DTYPES[dtype]
+        vector_bytes = max(1, scorer.num_recipes * torch.tensor([], dtype=self.dtype).element_size())
+        self.capacity = int(budget_mb * 1024 * 1024) // vector_bytes
+        self._entries: "OrderedDict[Criterion, torch.Tensor]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, criterion: Criterion) -> bool:
+        return criterion in self._entries
+
+    def _compute(self, criteria: List[Criterion], chunk_size: int) -> Dict[Criterion, torch.Tensor]:
+        computed = {}
+        for start in range(0, len(criteria), chunk_size):
+            chunk = criteria[start:start + chunk_size]
+            rows = min_max_normalize(self.scorer.score(chunk)).to(self.dtype)
+            computed.update(zip(chunk, rows))
+        return computed
+
+    def _insert(self, computed: Dict[Criterion, torch.Tensor]) -> None:
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            for criterion, row in computed.items():
+                # clone: a row is a view that would otherwise keep its whole chunk alive
+                self._entries[criterion] = row.clone()
+                self._entries.move_to_end(criterion)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def scores(self, criteria: List[Criterion], chunk_size: int = SCORE_CHUNK_CRITERIA) -> torch.Tensor:
+        """
+        Returns the (len(criteria), num_recipes) float32 matrix of normalized scores,
+        scoring only the criteria that are not cached yet.
+        """
+        criteria = [tuple(c) for c in criteria]
+        found: Dict[Criterion, torch.Tensor] = {}
+        with self._lock:
+            for criterion in criteria:
+                row = self._entries.get(criterion)
+                if row is not None:
+                    self._entries.move_to_end(criterion)
+                    found[criterion] = row
+            self.hits += sum(1 for c in criteria if c in found)
+            self.misses += sum(1 for c in criteria if c not in found)
+
+        missing = list(dict.fromkeys(c for c in criteria if c not in found))
+        if missing:
+            computed = self._compute(missing, chunk_size)
+            self._insert(computed)
+            found.update(computed)
+        return torch.stack([found[c] for c in criteria]).float()
+
+    def warmup(self, criteria: List[Criterion], chunk_size: int = SCORE_CHUNK_CRITERIA) -> int:
+        """
+        Precomputes vectors for `criteria` in order until the cache is full.
+        Returns the number of vectors added.
+        """
+        todo = [c for c in dict.fromkeys(tuple(c) for c in criteria) if c not in self._entries]
+        todo = todo[:max(0, self.capacity - len(self._entries))]
+        for start in range(0, len(todo), chunk_size):
+            self._insert(self._compute(todo[start:start + chunk_size], chunk_size))
+        return len(todo)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "entries": len(self._entries),
+            "capacity": self.capacity,
+            "dtype": str(self.dtype).replace("torch.", ""),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+def warmup_criteria(scorer: RecipeScorer, ingredients: Optional[List[str]] = None) -> List[Criterion]:
+    """
+    Every diet type, meal type, cuisine region and health attribute entity of the graph,
+    followed by the given ingredients (most frequent first), as (tail, relation) criteria.
+    Ingredient names are resolved to their KG labels like request values are (the graph
+    lower-cases ingredient nodes, the ingredient vocabulary keeps the dataset's casing).
+    """
+    criteria = []
+    for label in sorted(scorer.entity_to_id):
+        for prefix, relation in WARMUP_PREFIXES.items():
+            if label.startswith(prefix):
+                relation = relation or map_health_attribute(label[len(prefix):])
+                if relation in scorer.relation_to_id:
+                    criteria.append((label, relation))
+    if "containsIngredient" not in scorer.relation_to_id:
+        return criteria
+    for ingredient in ingredients or []:
+        resolved = entity_resolver.resolve("ingredient", ingredient)
+        if resolved is not None and resolved.label in scorer.entity_to_id:
+            criteria.append((resolved.label, "containsIngredient"))
+    return criteria
+
+def warm_up_score_cache(cache: ScoreVectorCache, top_ingredients: int = SCORE_CACHE_WARMUP_INGREDIENTS) -> None:
+    start = time.perf_counter()
+    names = get_unique_ingredients()[:top_ingredients]
+    criteria = warmup_criteria(cache.scorer, names)
+    ingredients = {c for c in criteria if c[1] == "containsIngredient"}
+    added = cache.warmup(criteria)
+    print(
+        f"[DEBUG] Score cache warmup: {added} of {len(criteria)} vectors precomputed "
+        f"({len(ingredients)} of {len(names)} top ingredients, capacity {cache.capacity}) "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    if len(ingredients) < len(names):
+        print(
+            f"[DEBUG] Score cache warmup: {len(names) - len(ingredients)} top ingredients "
+            f"did not resolve to distinct KG entities"
+        )
+    if len(cache) >= cache.capacity:
+        print("[DEBUG] Score cache warmup stopped at capacity; raise SCORE_CACHE_MB to warm every criterion")
+
+score_cache = ScoreVectorCache(recipe_scorer)
@@ -0,0 +1,306 @@
+import os
+import numpy as np
+import torch
+from typing import TYPE_CHECKING, List, Mapping, Optional, Tuple, Sequence, Union
+
+from core.interactions import NativeInteraction
+from core.quantization import (
+    DEQUANT_BLOCK_ROWS,
+    EMBEDDING_PRECISION,
+    PRECISIONS,
+    dequantize_representation,
+    quantize_representation,
+    representation_nbytes,
+)
+
+from core.engine_store import (
+    ENGINE_DIR,
+    ENGINE_MODE,
+    ENGINE_MODES,
+    MappedLabelIndex,
+    as_tensor,
+    load_array,
+    load_manifest,
+    load_quantized_representation,
+    load_recipe_representation,
+    load_representation,
+)
+
+if TYPE_CHECKING:
+    from pykeen.triples import TriplesFactory
+
+RECIPE_PREFIX = "recipe_"
+
+Representation = Union[torch.Tensor, Sequence[torch.Tensor]]
+
+def _unwrap(xs: List[torch.Tensor]) -> Representation:
+    """
+    PyKEEN convention: a single representation is passed as a tensor, several as a list.
+    """
+    return xs[0] if len(xs) == 1 else xs
+
+def _index(x: Representation, indices: torch.Tensor) -> Representation:
+    if isinstance(x, torch.Tensor):
+        return x[indices]
+    return [xi[indices] for xi in x]
+
+def _unsqueeze(x: Representation, dim: int) -> Representation:
+    if isinstance(x, torch.Tensor):
+        return x.unsqueeze(dim)
+    return [xi.unsqueeze(dim) for xi in x]
+
+class RecipeScorer:
+    """
+    Scores every recipe entity as the head of many (relation, tail) criteria in a single
+    batched forward pass. Representations are materialized once at construction so that
+    a request only has to index the cached tensors and run the interaction function.
+    With a float16/int8 `precision`, only a quantized copy of the recipe head vectors is
+    kept and scoring dequantizes it block by block.
+    """
+
+    entity_to_id: Mapping[str, int]
+    relation_to_id: Mapping[str, int]
+
+    def __init__(self, kge_model, factory: "TriplesFactory", precision: str = EMBEDDING_PRECISION):
+        # Imported here so that serving from an exported engine never loads pykeen
+        from pykeen.models import ERModel
+
+        self.model = kge_model
+        self.entity_to_id = factory.entity_to_id
+        self.relation_to_id = factory.relation_to_id
+
+        recipe_labels = sorted(
+            label for label in self.entity_to_id if label.startswith(RECIPE_PREFIX)
+        )
+        self.recipe_entity_ids = torch.as_tensor(
+            [self.entity_to_id[label] for label in recipe_labels], dtype=torch.long
+        )
+        # "recipe_123" -> "123", aligned with the columns of the score matrix
+        self.recipe_ids = np.array([label[len(RECIPE_PREFIX):] for label in recipe_labels])
+
+        # Models trained with inverse triples score heads through the inverse relation,
+        # so we keep PyKEEN's own predict_h for them instead of the cached fast path.
+        self._fast_path = isinstance(kge_model, ERModel) and not kge_model.use_inverse_triples
+        if self._fast_path:
+            self.interaction = kge_model.interaction
+            self.predict_with_sigmoid = kge_model.predict_with_sigmoid
+            self._materialize()
+        self._quantize(precision)
+
+    @classmethod
+    def from_engine(cls, engine_dir: str = ENGINE_DIR, precision: Optional[str] = None) -> "RecipeScorer":
+        """
+        Builds a fast-path scorer from an engine exported with tools/export_engine.py,
+        without unpickling the model. All arrays are read-only memory maps, so forked
+        workers share their pages instead of holding private copies. Natively supported
+        interactions are scored with plain torch, so pykeen is not imported.
+        Recipe vectors keep the precision they were exported with (`precision` None).
+        Quantizing a float32 export to another `precision` here gives every process a
+        private copy; that is only meant for evaluating precisions before an export.
+        """
+        manifest = load_manifest(engine_dir)
+        scorer = cls.__new__(cls)
+        scorer.model = None
+        scorer.entity_to_id = MappedLabelIndex.load(engine_dir, "entity_labels")
+        scorer.relation_to_id = MappedLabelIndex.load(engine_dir, "relation_labels")
+        scorer.recipe_entity_ids = as_tensor(load_array(engine_dir, "recipe_entity_ids"))
+        scorer.recipe_ids = load_array(engine_dir, "recipe_ids")
+        scorer._fast_path = True
+        if manifest["interaction_kwargs"] is not None:
+            scorer.interaction = NativeInteraction(manifest["interaction"], manifest["interaction_kwargs"])
+        else:
+            scorer.interaction = torch.load(
+                os.path.join(engine_dir, "interaction.pt"), map_location="cpu", weights_only=False
+            )
+        scorer.predict_with_sigmoid = manifest["predict_with_sigmoid"]
+        counts = manifest["representations"]
+        scorer._entity_t = load_representation(engine_dir, "entity_t", counts["entity_t"])
+        scorer._relation = load_representation(engine_dir, "relation", counts["relation"])
+        exported = manifest.get("recipe_precision", "float32")
+        if exported != "float32":
+            if precision not in (None, exported):
+                raise ValueError(
+                    f"Engine at {engine_dir} stores {exported} recipe vectors; re-export it with --precision {precision}"
+                )
+            scorer.precision = exported
+            scorer._recipe_h = None
+            scorer._recipe_q = load_quantized_representation(engine_dir, "recipe_q", manifest["recipe_quantized"])
+            return scorer
+        scorer._recipe_h = load_recipe_representation(engine_dir, manifest)
+        scorer._quantize(precision or "float32")
+        return scorer
+
+    @torch.inference_mode()
+    def _materialize(self) -> None:
+        m = self.model
+        entity_reps = m.entity_representations
+        self._recipe_h = _unwrap([
+            entity_reps[i](indices=self.recipe_entity_ids).detach()
+            for i in m.interaction.head_indices
+        ])
+        self._entity_t = _unwrap([
+            entity_reps[i](indices=None).detach() for i in m.interaction.tail_indices
+        ])
+        self._relation = _unwrap([
+            rep(indices=None).detach() for rep in m.relation_representations
+        ])
+
+    def _quantize(self, precision: str) -> None:
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown embedding precision: {precision}. Choose from {PRECISIONS}")
+        self.precision = precision
+        self._recipe_q = None
+        if precision == "float32" or not self._fast_path:
+            return
+        self._recipe_q = quantize_representation(self._recipe_h, precision)
+        self._recipe_h = None
+
+    @property
+    def num_recipes(self) -> int:
+        return len(self.recipe_ids)
+
+    @property
+    def interaction_name(self) -> Optional[str]:
+        """
+        Class name of the interaction function when the cached fast path is active, else None.
+        """
+        if not self._fast_path:
+            return None
+        if isinstance(self.interaction, NativeInteraction):
+            return self.interaction.name
+        return type(self.interaction).__name__
+
+    @property
+    def recipe_representations(self) -> Representation:
+        """
+        float32 recipe head representations; a full dequantized copy for quantized scorers.
+        """
+        if self._recipe_q is not None:
+            return dequantize_representation(self._recipe_q)
+        return self._recipe_h
+
+    @property
+    def recipe_nbytes(self) -> int:
+        """
+        Bytes of the recipe head vectors as stored for scoring.
+        """
+        return representation_nbytes(self._recipe_q if self._recipe_q is not None else self._recipe_h)
+
+    @property
+    def tail_representations(self) -> Representation:
+        return self._entity_t
+
+    @property
+    def relation_representations(self) -> Representation:
+        return self._relation
+
+    def criterion_representations(
+        self, criteria: List[Tuple[str, str]]
+    ) -> Tuple[Representation, Representation]:
+        """
+        Returns the cached (relation, tail) representations for each criterion.
+        """
+        tail_ids, relation_ids = self.lookup(criteria)
+        return _index(self._relation, relation_ids), _index(self._entity_t, tail_ids)
+
+    def lookup(self, criteria: List[Tuple[str, str]]) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Maps (tail_label, relation_label) pairs to (tail_ids, relation_ids) tensors.
+        """
+        tails, relations = [], []
+        for tail, relation in criteria:
+            if tail not in self.entity_to_id:
+                raise ValueError(f"Unknown entity in knowledge graph: {tail}")
+            if relation not in self.relation_to_id:
+                raise ValueError(f"Unknown relation in knowledge graph: {relation}")
+            tails.append(self.entity_to_id[tail])
+            relations.append(self.relation_to_id[relation])
+        return (
+            torch.as_tensor(tails, dtype=torch.long),
+            torch.as_tensor(relations, dtype=torch.long),
+        )
+
+    @torch.inference_mode()
+    def score(
+        self,
+        criteria: List[Tuple[str, str]],
+        candidates: Optional[torch.Tensor] = None,
+    ) -> torch.Tensor:
+        """
+        Returns raw KGE scores of shape (len(criteria), num_recipes), identical to what
+        predict_target reports for the recipe heads. If `candidates` (column positions
+        into recipe_ids) is given, only those recipes are scored.
+        """
+        tail_ids, relation_ids = self.lookup(criteria)
+        if not self._fast_path:
+            heads = self.recipe_entity_ids if candidates is None else self.recipe_entity_ids[candidates]
+            rt_batch = torch.stack([relation_ids, tail_ids], dim=1)
+            return self.model.predict_h(rt_batch, heads=heads)
+
+        # (1, R, d) x (C, 1, d) x (C, 1, d) -> (C, R)
+        r = _unsqueeze(_index(self._relation, relation_ids), 1)
+        t = _unsqueeze(_index(self._entity_t, tail_ids), 1)
+        if self._recipe_q is None:
+            h = self._recipe_h if candidates is None else _index(self._recipe_h, candidates)
+            scores = self.interaction(h=_unsqueeze(h, 0), r=r, t=t)
+        else:
+            scores = self._score_quantized(r, t, candidates)
+        if self.predict_with_sigmoid:
+            scores = torch.sigmoid(scores)
+        return scores
+
+    def _score_quantized(
+        self, r: Representation, t: Representation, candidates: Optional[torch.Tensor]
+    ) -> torch.Tensor:
+        num_rows = self.num_recipes if candidates is None else len(candidates)
+        blocks = []
+        for start in range(0, num_rows, DEQUANT_BLOCK_ROWS):
+            stop = min(start + DEQUANT_BLOCK_ROWS, num_rows)
+            rows = slice(start, stop) if candidates is None else candidates[start:stop]
+            h = dequantize_representation(self._recipe_q, rows)
+            blocks.append(self.interaction(h=_unsqueeze(h, 0), r=r, t=t))
+        if not blocks:
+            return torch.empty(len(r) if isinstance(r, torch.Tensor) else len(r[0]), 0)
+        return torch.cat(blocks, dim=1)
+
+    def top_k(
+        self,
+        fused: torch.Tensor,
+        k: int,
+        candidates: Optional[torch.Tensor] = None,
+    ) -> List[str]:
+        """
+        Returns the recipe ids of the k highest entries of a fused score vector, which is
+        indexed like recipe_ids or, if given, like `candidates`.
+        Entries fused to -inf (excluded recipes) are never returned.
+        """
+        k = min(k, fused.shape[-1])
+        if k <= 0:
+            return []
+        top = torch.topk(fused, k=k)
+        indices = top.indices[torch.isfinite(top.values)]
+        if candidates is not None:
+            indices = candidates[indices]
+        return self.recipe_ids[indices.cpu().numpy()].tolist()
+
+def load_recipe_scorer(mode: str = ENGINE_MODE) -> RecipeScorer:
+    if mode not in ENGINE_MODES:
+        raise ValueError(f"Unknown KGE_ENGINE mode: {mode}. Choose from {ENGINE_MODES}")
+    if mode == "mmap":
+        print(f"[DEBUG] Loading scoring engine from memory-mapped export {ENGINE_DIR}")
+        scorer = RecipeScorer.from_engine(ENGINE_DIR)
+        if scorer.precision != EMBEDDING_PRECISION:
+            # Quantizing at load time would give every worker a private copy
+            print(
+                f"[DEBUG] KGE_EMBEDDING_PRECISION={EMBEDDING_PRECISION} ignored: the engine was exported "
+                f"with {scorer.precision} recipe vectors (python -m tools.export_engine --precision ...)"
+            )
+    else:
+        from core.model import model, triples_factory
+        scorer = RecipeScorer(model, triples_factory)
+    if scorer.precision != "float32":
+        print(f"[DEBUG] Recipe embeddings stored as {scorer.precision}")
+    return scorer
+
+# Build the scorer once at import, next to the model it wraps
+recipe_scorer = load_recipe_scorer()
@@ -0,0 +1,144 @@
+import json
+from typing import Any, AsyncIterator, Iterator, List, Optional, Tuple, Union
+
+from core.async_utils import StageTimeoutError
+
+PathItem = Union[str, int]
+Path = Tuple[PathItem, ...]
+
+def sse_event(event: str, data: Any) -> str:
+    """
+    One Server-Sent Events message with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# Events whose data is a generated JSON string, sent parsed
+JSON_STRING_EVENTS = ("recipe", "result")
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+async def sse_stream(events: AsyncIterator[Tuple[str, Any]]) -> AsyncIterator[str]:
+    """
+    Formats (event, data) pairs as SSE messages. A failure ends the stream with an
+    "error" event carrying the status code the JSON endpoint would have returned.
+    The generator is closed (cancelling the pipeline) when the client disconnects.
+    """
+    try:
+        async for event, data in events:
+            if event in JSON_STRING_EVENTS:
+                try:
+                    data = json.loads(data)
+                except ValueError as e:
+                    yield sse_event("error", {"status": 500, "detail": f"Error parsing generated {event}: {e}"})
+                    return
+            yield sse_event(event, data)
+    except StageTimeoutError as e:
+        yield sse_event("error", {"status": 504, "detail": str(e)})
+    except Exception as e:
+        yield sse_event("error", {"status": 500, "detail": str(e)})
+
+class _Container:
+    __slots__ = ("kind", "start", "key", "index", "expect_key")
+
+    def __init__(self, kind: str, start: int):
+        self.kind = kind          # "object" or "array"
+        self.start = start
+        self.key: Optional[str] = None
+        self.index = 0
+        self.expect_key = kind == "object"
+
+class IncrementalJSONParser:
+    """
+    Parses a JSON document that arrives in chunks and reports every value as soon as
+    it is complete, as (path, value) with path like ("recipes", 0, "title"). Only
+    values at most `max_depth` levels deep are decoded; deeper ones are reported as
+    part of their enclosing value. Text before the first "{" or "[" (such as a
+    ```json fence) is skipped. Malformed input stops the reporting, it never raises.
+    """
+
+    def __init__(self, max_depth: int = 3):
+        self.max_depth = max_depth
+        self.text = ""
+        self._pos = 0
+        self._stack: List[_Container] = []
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._scalar_start: Optional[int] = None
+        self.failed = False
+
+    def _path(self) -> Path:
+        path: List[PathItem] = []
+        for c in self._stack:
+            path.append(c.key if c.kind == "object" else c.index)
+        return tuple(path)
+
+    def _complete(self, start: int, end: int, events: List[Tuple[Path, Any]]) -> None:
+        path = self._path()
+        if 0 < len(path) <= self.max_depth:
+            try:
+                events.append((path, json.loads(self.text[start:end])))
+            except ValueError:
+                self.failed = True
+
+    def feed(self, chunk: str) -> List[Tuple[Path, Any]]:
+        self.text += chunk
+        events: List[Tuple[Path, Any]] = []
+        text = self.text
+        while self._pos < len(text) and not self._done and not self.failed:
+            i, ch = self._pos, text[self._pos]
+            self._pos += 1
+            if not self._started:
+                if ch in "{[":
+                    self._started = True
+                    self._stack.append(_Container("object" if ch == "{" else "array", i))
+                continue
+            top = self._stack[-1]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if top.kind == "object" and top.expect_key:
+                        top.key = json.loads(text[self._string_start:i + 1])
+                    else:
+                        self._complete(self._string_start, i + 1, events)
+                continue
+            if self._scalar_start is not None and (ch in ",}]" or ch.isspace()):
+                self._complete(self._scalar_start, i, events)
+                self._scalar_start = None
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                self._stack.append(_Container("object" if ch == "{" else "array", i))
+            elif ch in "}]":
+                closed = self._stack.pop()
+                if not self._stack:
+                    self._done = True
+                    continue
+                # The path now ends at the parent's entry holding the closed container
+                self._complete(closed.start, i + 1, events)
+            elif ch == ":":
+                top.expect_key = False
+            elif ch == ",":
+                if top.kind == "object":
+                    top.expect_key = True
+                else:
+                    top.index += 1
+            elif not ch.isspace() and self._scalar_start is None:
+                self._scalar_start = i
+        return events
+
+def recipe_events(path: Path, value: Any) -> Iterator[Tuple[str, dict]]:
+    """
+    SSE events for a completed value of a {"recipes": [{...}]} document: a "field"
+    event per top-level recipe field and an "item" event per ingredient or step.
+    """
+    if len(path) == 3 and path[0] == "recipes":
+        yield "field", {"recipe": path[1], "name": path[2], "value": value}
+    elif len(path) == 4 and path[0] == "recipes" and path[2] in ("ingredients", "steps"):
+        yield "item", {"recipe": path[1], "field": path[2], "index": path[3], "value": value}
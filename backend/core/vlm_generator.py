@@ -1,17 +1,65 @@
 import os
 import json
+import asyncio
+import httpx
 import requests
-from core.llm_session import chat_session
+from typing import Any, Callable, Dict, Optional, Tuple
+from core.llm_session import llm_client, strip_code_fences
+from core.async_utils import run_stage, LLM_TIMEOUT, VLM_TIMEOUT
+from core.response_cache import response_cache, cache_key
+from core.image_store import image_store
 
 # Recraft API integration details
-RECRAFT_API_URL = "https://external.api.recraft.ai/v1/images/generations"
+RECRAFT_API_URL = os.environ.get("RECRAFT_API_URL", "https://external.api.recraft.ai/v1/images/generations")
 RECRAFT_API_KEY = os.environ.get("RECRAFT_API_KEY")
+# Connection pool shared by all async image requests of this worker
+RECRAFT_MAX_CONNECTIONS = int(os.environ.get("RECRAFT_MAX_CONNECTIONS", "20"))
+# Image renders in flight per worker; further requests wait for a slot
+RECRAFT_MAX_CONCURRENCY = int(os.environ.get("RECRAFT_MAX_CONCURRENCY", "4"))
 
-def generate_vlm_prompt(recipe_json: str) -> str:
+# How the image prompt is written: "llm" asks the LLM, "template" fills a fixed
+# template from the recipe fields (no LLM call, and it can start before the recipe is complete)
+VLM_PROMPT_MODE = os.environ.get("VLM_PROMPT_MODE", "llm")
+VLM_PROMPT_MODES = ("llm", "template")
+# Recipe fields the template uses, in the order the recipe LLM emits them
+TEMPLATE_PROMPT_FIELDS = ("title", "description", "cookingMethod", "ingredients")
+TEMPLATE_MAX_INGREDIENTS = 8
+TEMPLATE_STYLE = (
+    "Elegant restaurant-style plating on a simple ceramic plate, soft natural side lighting, "
+    "rich appetizing colors and crisp textures, rustic wooden table in the background, "
+    "shallow depth of field with gentle bokeh and selective focus on the dish."
+)
+MAX_VLM_PROMPT_CHARS = 1000
+
+_async_client: Optional[httpx.AsyncClient] = None
+_image_slots: Optional[asyncio.Semaphore] = None
+
+def get_async_client() -> httpx.AsyncClient:
     """
-    Convert the recipe JSON into a vivid prompt for the image-generation model.
+    Lazily creates the pooled async HTTP client (it must be created inside the event loop's process).
     """
-    prompt = f"""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(VLM_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=RECRAFT_MAX_CONNECTIONS,
+                max_keepalive_connections=RECRAFT_MAX_CONNECTIONS,
+            ),
+        )
+    return _async_client
+
+async def close_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+def build_vlm_prompt_request(recipe_json: str) -> str:
+    """
+    The LLM prompt that turns a recipe JSON into an image-generation prompt.
+    """
+    return f"""
 You are a world-class food photographer and visual design expert. Based on the following recipe details in JSON,
 generate an extremely detailed and vivid image prompt for a high-quality food image. Your description should include:
 - The dish's presentation and plating style
@@ -27,32 +75,77 @@ Recipe JSON (trimmed if too long):
 
 Output only the final prompt text.
 """
-    print("[DEBUG] Sending improved prompt to LLM for VLM prompt generation...")
-    response = chat_session.send_message(prompt)
-    vlm_prompt = response.text.strip()
-    print(f"[DEBUG] Raw VLM prompt response: {vlm_prompt}")
-    
+
+def _clean_vlm_prompt(raw_text: str) -> str:
+    print(f"[DEBUG] Raw VLM prompt response: {raw_text}")
+
     # Remove code fences if present
-    if vlm_prompt.startswith("```"):
-        lines = vlm_prompt.splitlines()
-        if lines[0].startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].startswith("```"):
-            lines = lines[:-1]
-        vlm_prompt = "\n".join(lines).strip()
-    
+    vlm_prompt = strip_code_fences(raw_text)
+
     # Enforce a 1000-character limit
-    if len(vlm_prompt) > 1000:
-        vlm_prompt = vlm_prompt[:1000]
+    if len(vlm_prompt) > MAX_VLM_PROMPT_CHARS:
+        vlm_prompt = vlm_prompt[:MAX_VLM_PROMPT_CHARS]
         print("[DEBUG] Truncated VLM prompt to 1000 characters.")
-    
+
     print(f"[DEBUG] Final VLM prompt: {vlm_prompt}")
     return vlm_prompt
 
-def call_vlm_api(vlm_prompt: str) -> str:
+def generate_vlm_prompt(recipe_json: str) -> str:
     """
-    Call the Recraft (VLM) API with the prompt and return the generated image URL.
+    Convert the recipe JSON into a vivid prompt for the image-generation model.
+    """
+    def compute() -> str:
+        print("[DEBUG] Sending improved prompt to LLM for VLM prompt generation...")
+        response_text = llm_client.generate(build_vlm_prompt_request(recipe_json))
+        return _clean_vlm_prompt(response_text.strip())
+
+    return response_cache.cached("image_prompt", cache_key(recipe_json), compute, bool)
+
+async def generate_vlm_prompt_async(recipe_json: str) -> str:
+    """
+    Non-blocking generate_vlm_prompt, bounded by the LLM stage timeout.
+    """
+    async def compute() -> str:
+        print("[DEBUG] Sending improved prompt to LLM for VLM prompt generation...")
+        response_text = await run_stage(
+            "vlm_prompt", llm_client.generate_async(build_vlm_prompt_request(recipe_json)), LLM_TIMEOUT
+        )
+        return _clean_vlm_prompt(response_text.strip())
+
+    return await response_cache.cached_async("image_prompt", cache_key(recipe_json), compute, bool)
+
+def build_template_vlm_prompt(recipe: Dict[str, Any]) -> str:
+    """
+    Image prompt filled in from the TEMPLATE_PROMPT_FIELDS of one recipe object.
+    """
+    parts = [f"Professional food photograph of {recipe.get('title') or 'a freshly cooked dish'}."]
+    if recipe.get("description"):
+        parts.append(str(recipe["description"]).rstrip(".") + ".")
+    if recipe.get("cookingMethod"):
+        parts.append(f"Prepared by {recipe['cookingMethod']}.")
+    names = [
+        str(item.get("name", "")) if isinstance(item, dict) else str(item)
+        for item in recipe.get("ingredients") or []
+    ]
+    names = [n for n in names if n][:TEMPLATE_MAX_INGREDIENTS]
+    if names:
+        parts.append(f"Key ingredients visible: {', '.join(names)}.")
+    parts.append(TEMPLATE_STYLE)
+    vlm_prompt = " ".join(parts)[:MAX_VLM_PROMPT_CHARS]
+    print(f"[DEBUG] Template VLM prompt: {vlm_prompt}")
+    return vlm_prompt
+
+def template_vlm_prompt(recipe_json: str) -> str:
+    """
+    build_template_vlm_prompt for the first recipe of a {"recipes": [...]} JSON string.
     """
+    try:
+        recipes = json.loads(recipe_json).get("recipes") or [{}]
+    except (ValueError, AttributeError):
+        recipes = [{}]
+    return build_template_vlm_prompt(recipes[0] if isinstance(recipes[0], dict) else {})
+
+def _vlm_request(vlm_prompt: str) -> Tuple[Dict[str, Any], Dict[str, str]]:
     if not RECRAFT_API_KEY:
         raise EnvironmentError("RECRAFT_API_KEY is not set in environment variables.")
 
@@ -66,21 +159,65 @@ def call_vlm_api(vlm_prompt: str) -> str:
         "Authorization": f"Bearer {RECRAFT_API_KEY}",
         "Content-Type": "application/json"
     }
-    
+
     print("[DEBUG] Calling VLM API with payload:")
     print(json.dumps(payload, indent=2))
-    
-    response = requests.post(RECRAFT_API_URL, json=payload, headers=headers)
-    print(f"[DEBUG] VLM API response status code: {response.status_code}")
-    
-    if response.status_code == 200:
-        data = response.json()
+    return payload, headers
+
+def _parse_vlm_response(status_code: int, text: str, data_fn: Callable[[], Any]) -> str:
+    print(f"[DEBUG] VLM API response status code: {status_code}")
+
+    if status_code == 200:
+        data = data_fn()
         print(f"[DEBUG] VLM API response JSON: {json.dumps(data, indent=2)}")
         # Typically the generated image is in data["data"][0]["url"] or similar
         image_url = data["data"][0]["url"]
         print(f"[DEBUG] Generated Image URL: {image_url}")
         return image_url
     else:
-        error_msg = f"VLM API error: {response.text}"
+        error_msg = f"VLM API error: {text}"
         print(f"[DEBUG] {error_msg}")
         raise Exception(error_msg)
+
+def call_vlm_api(vlm_prompt: str) -> str:
+    """
+    Call the Recraft (VLM) API with the prompt and return the generated image URL.
+    The image is downloaded into the local image store and its local URL returned, so
+    a later request with the same (normalized) prompt skips the render.
+    """
+    local_url = image_store.lookup(vlm_prompt)
+    if local_url is not None:
+        return local_url
+
+    def compute() -> str:
+        payload, headers = _vlm_request(vlm_prompt)
+        response = requests.post(RECRAFT_API_URL, json=payload, headers=headers, timeout=VLM_TIMEOUT)
+        return _parse_vlm_response(response.status_code, response.text, response.json)
+
+    remote_url = response_cache.cached("image_url", cache_key(vlm_prompt), compute)
+    return image_store.store_remote(vlm_prompt, remote_url, VLM_TIMEOUT)
+
+async def call_vlm_api_async(vlm_prompt: str) -> str:
+    """
+    Non-blocking call_vlm_api over the pooled async client, bounded by the VLM stage
+    timeout and by RECRAFT_MAX_CONCURRENCY renders at a time.
+    """
+    local_url = await asyncio.to_thread(image_store.lookup, vlm_prompt)
+    if local_url is not None:
+        return local_url
+
+    async def compute() -> str:
+        global _image_slots
+        if _image_slots is None:
+            _image_slots = asyncio.Semaphore(RECRAFT_MAX_CONCURRENCY)
+        payload, headers = _vlm_request(vlm_prompt)
+        async with _image_slots:
+            response = await run_stage(
+                "image",
+                get_async_client().post(RECRAFT_API_URL, json=payload, headers=headers),
+                VLM_TIMEOUT,
+            )
+        return _parse_vlm_response(response.status_code, response.text, response.json)
+
+    remote_url = await response_cache.cached_async("image_url", cache_key(vlm_prompt), compute)
+    return await image_store.store_remote_async(vlm_prompt, remote_url, get_async_client())
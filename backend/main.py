@@ -1,7 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from routers import recommend, recipe, unique_ingredients, generate_recipe, generate_recipe_visual
+from routers import recommend, recipe, unique_ingredients, generate_recipe, generate_recipe_visual, cache_stats, jobs, images
+from core.jobs import job_queue
+from core.vlm_generator import close_async_client
+from core.score_cache import score_cache, warm_up_score_cache, SCORE_CACHE_WARMUP
 
 app = FastAPI(
     title="Food Recommendation API",
@@ -23,6 +26,23 @@ app.include_router(recipe.router)
 app.include_router(unique_ingredients.router)
 app.include_router(generate_recipe.router)
 app.include_router(generate_recipe_visual.router)
+app.include_router(cache_stats.router)
+app.include_router(jobs.router)
+app.include_router(images.router)
+
+@app.on_event("startup")
+async def startup():
+    # Precompute score vectors of the most common criteria before serving traffic
+    if SCORE_CACHE_WARMUP:
+        warm_up_score_cache(score_cache)
+    # Resume queued image-generation jobs, including those of a previous run
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await job_queue.stop()
+    # Release pooled connections of the async image-generation client
+    await close_async_client()
 
 @app.get("/")
 def root():
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 # Ingredient schema
 class Ingredient(BaseModel):
@@ -82,3 +82,19 @@ class RecommendationRequest(BaseModel):
     cuisine_region: Optional[str] = None
     ingredients: List[str] = []
     top_k: int = 5
+    # How per-criterion scores are combined. "weighted_sum" is not offered here: its
+    # weights are per mapped criterion, which API clients cannot address
+    fusion: Literal["sum", "rrf", "min"] = "sum"
+    # "exact" scores every recipe; "ann" scores only candidates from the prebuilt index
+    retrieval: Literal["exact", "ann"] = "exact"
+    # "soft" ranks every recipe by KGE score; "strict" only recipes having all requested attributes
+    constraints: Literal["soft", "strict"] = "soft"
+
+# Request model for several recommendation requests scored together
+class BatchRecommendationRequest(BaseModel):
+    requests: List[RecommendationRequest]
+
+# One result per request of a batch, in request order
+class BatchRecommendationResult(BaseModel):
+    recipe_ids: List[str] = []
+    error: Optional[str] = None
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from core.response_cache import response_cache
+
+router = APIRouter()
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    """
+    Hit/miss counters of this worker's response cache, per pipeline stage and level.
+    """
+    return response_cache.stats()
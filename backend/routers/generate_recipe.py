@@ -1,18 +1,49 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 import json
 from models.schemas import RecommendationRequest
-from core.llm_generator import generate_recipe_llm
+from core.llm_generator import generate_recipe_llm_async, generate_recipe_llm_stream
+from core.streaming import sse_stream, SSE_HEADERS
+from core.recipe_validation import repair_stats
+from core.prompt_compaction import prompt_stats
+from core.async_utils import cancel_on_disconnect, StageTimeoutError, ClientDisconnectedError
 
 router = APIRouter()
 
 @router.post("/generate_recipe")
-def generate_recipe(request: RecommendationRequest):
+async def generate_recipe(request: RecommendationRequest, http_request: Request):
     """
     Endpoint that generates a single recipe JSON (with "recipes": [...] ) via LLM.
+    Generation is cancelled if the client disconnects.
     """
-    recipe = generate_recipe_llm(request.dict())
+    try:
+        recipe = await cancel_on_disconnect(http_request, generate_recipe_llm_async(request.dict()))
+    except StageTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnectedError:
+        raise HTTPException(status_code=499, detail="Client disconnected.")
     try:
         recipe_json = json.loads(recipe)
         return recipe_json
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error parsing generated recipe: {e}")
+
+@router.post("/generate_recipe/stream")
+async def generate_recipe_stream(request: RecommendationRequest):
+    """
+    Streaming /generate_recipe as Server-Sent Events: "stage", "token", "field" and
+    "item" events while the recipe is generated, then a "result" event with the same
+    JSON /generate_recipe returns (or an "error" event).
+    """
+    return StreamingResponse(
+        sse_stream(generate_recipe_llm_stream(request.dict())), media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+@router.get("/generate_recipe/stats")
+def get_generate_recipe_stats():
+    """
+    How often generated recipes were valid as returned, repaired, completed by a
+    re-ask or degraded, the regeneration time repairs saved, and the estimated
+    prompt token counts of recent requests.
+    """
+    return {**repair_stats.stats(), "prompt": prompt_stats.stats()}
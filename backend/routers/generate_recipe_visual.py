@@ -1,21 +1,44 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 import json
 
 from models.schemas import RecommendationRequest
-from core.recipe_visual import generate_recipe_with_visual
+from core.recipe_visual import generate_recipe_with_visual_async, generate_recipe_with_visual_stream
+from core.streaming import sse_stream, SSE_HEADERS
+from core.async_utils import cancel_on_disconnect, StageTimings, StageTimeoutError, ClientDisconnectedError
 
 router = APIRouter()
 
 @router.post("/generate_recipe_visual")
-def generate_recipe_visual_endpoint(request: RecommendationRequest):
+async def generate_recipe_visual_endpoint(request: RecommendationRequest, http_request: Request):
     """
     Endpoint that runs the full LLM+VLM pipeline and returns a final JSON with:
       { "title": ..., "description": ..., "recipe": ..., "image_url": ... }
+    Generation is cancelled if the client disconnects. The per-stage latencies are
+    returned in the Server-Timing header.
     """
+    timings = StageTimings()
     try:
-        final_output = generate_recipe_with_visual(request.dict())
+        final_output = await cancel_on_disconnect(
+            http_request, generate_recipe_with_visual_async(request.dict(), timings)
+        )
         # The final output is a JSON string, so parse and return it directly.
-        return JSONResponse(content=json.loads(final_output))
+        return JSONResponse(content=json.loads(final_output), headers={"Server-Timing": timings.server_timing()})
+    except StageTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnectedError:
+        raise HTTPException(status_code=499, detail="Client disconnected.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/generate_recipe_visual/stream")
+async def generate_recipe_visual_stream(request: RecommendationRequest):
+    """
+    Streaming /generate_recipe_visual as Server-Sent Events: the recipe events of
+    /generate_recipe/stream, a "recipe" event with the drafted recipe, "stage" events
+    for the image prompt and URL, the per-stage "timings", then a "result" event with
+    the final JSON.
+    """
+    return StreamingResponse(
+        sse_stream(generate_recipe_with_visual_stream(request.dict())), media_type="text/event-stream", headers=SSE_HEADERS
+    )
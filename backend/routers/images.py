@@ -0,0 +1,49 @@
+import os
+from fastapi import APIRouter, Header, HTTPException, Response
+from fastapi.responses import FileResponse
+from typing import Optional
+
+from core.image_store import image_store, CONTENT_TYPES, IMAGE_THUMBNAIL_WIDTHS, FILE_NAME
+
+router = APIRouter()
+
+# Files are named by their content hash and never change
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def _file_response(path: str, name: str, if_none_match: Optional[str]) -> Response:
+    etag = f'"{name}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if if_none_match is not None and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=CONTENT_TYPES[path.rsplit(".", 1)[1]], headers=headers)
+
+@router.get("/images/stats")
+def get_image_store_stats():
+    """
+    Files, bytes and prompts held by the local image store.
+    """
+    return image_store.stats()
+
+@router.get("/images/thumbnails/{width}/{name}")
+def get_image_thumbnail(width: int, name: str, if_none_match: Optional[str] = Header(None)):
+    """
+    WebP thumbnail of a stored image, `width` pixels wide (one of IMAGE_THUMBNAIL_WIDTHS),
+    for list views.
+    """
+    if width not in IMAGE_THUMBNAIL_WIDTHS or not FILE_NAME.match(name) or "_w" in name:
+        raise HTTPException(status_code=404, detail="Unknown thumbnail")
+    path = image_store.thumbnail(name, width)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Unknown image: {name}")
+    return _file_response(path, os.path.basename(path), if_none_match)
+
+@router.get("/images/{name}")
+def get_image(name: str, if_none_match: Optional[str] = Header(None)):
+    """
+    A generated dish image from the local store, by the content-addressed name in
+    the image URLs the generation endpoints return.
+    """
+    path = image_store.open(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Unknown image: {name}")
+    return _file_response(path, name, if_none_match)
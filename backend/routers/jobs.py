@@ -0,0 +1,37 @@
+from fastapi import APIRouter, HTTPException, Response
+
+from models.schemas import RecommendationRequest
+from core.jobs import job_queue, job_view
+from core.recipe_visual import generate_recipe_with_visual_async
+
+router = APIRouter()
+
+job_queue.register("recipe_visual", generate_recipe_with_visual_async)
+
+@router.post("/generate_recipe_visual/jobs", status_code=202)
+def submit_recipe_visual_job(request: RecommendationRequest, response: Response):
+    """
+    Queues the /generate_recipe_visual pipeline and returns the job id at once; poll
+    /jobs/{id} for its status and result.
+    """
+    job_id = job_queue.submit("recipe_visual", request.dict())
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return {"id": job_id, "status": "queued"}
+
+@router.get("/jobs/stats")
+def get_job_stats():
+    """
+    Jobs per status in the shared store and the workers of this process.
+    """
+    return job_queue.stats()
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Status of a job ("queued", "running", "succeeded" or "failed"), its attempts and,
+    once finished, its result or last error.
+    """
+    job = job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job_view(job)
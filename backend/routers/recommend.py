@@ -1,35 +1,95 @@
 from fastapi import APIRouter, HTTPException
+import os
 import logging
-from models.schemas import RecommendationRequest
+from typing import List, Tuple
+from models.schemas import RecommendationRequest, BatchRecommendationRequest, BatchRecommendationResult
 from core.recommender import (
     map_user_input_to_criteria,
-    get_matching_recipes
+    get_matching_recipes_coalesced,
+    get_matching_recipes_batch,
+    recommend_scheduler,
 )
+from core.score_cache import score_cache
+from core.entity_resolver import entity_resolver, UnknownEntityError
 
 router = APIRouter()
 
+# Upper bound on requests per /recommend/batch call
+MAX_BATCH_SIZE = int(os.environ.get("RECOMMEND_MAX_BATCH_SIZE", "64"))
+
+def _criteria(request: RecommendationRequest) -> List[Tuple[str, str]]:
+    return map_user_input_to_criteria(
+        cooking_method=request.cooking_method,
+        servings_bin=request.servings_bin,
+        diet_types=request.diet_types,
+        meal_type=request.meal_type,
+        cook_time=request.cook_time,
+        health_types=request.health_types,
+        cuisine_region=request.cuisine_region,
+        ingredients=request.ingredients,
+    )
+
 @router.post("/recommend")
 def recommend_recipes(request: RecommendationRequest):
     """
     Endpoint to get top-K recommended recipe IDs based on user criteria.
     """
     try:
-        criteria = map_user_input_to_criteria(
-            cooking_method=request.cooking_method,
-            servings_bin=request.servings_bin,
-            diet_types=request.diet_types,
-            meal_type=request.meal_type,
-            cook_time=request.cook_time,
-            health_types=request.health_types,
-            cuisine_region=request.cuisine_region,
-            ingredients=request.ingredients,
-        )
+        criteria = _criteria(request)
         logging.info(f"Mapped criteria: {criteria}")
 
-        recipe_ids = get_matching_recipes(criteria=criteria, top_k=request.top_k)
+        recipe_ids = get_matching_recipes_coalesced(
+            criteria=criteria,
+            top_k=request.top_k,
+            fusion=request.fusion,
+            retrieval=request.retrieval,
+            constraints=request.constraints,
+        )
         if not recipe_ids:
             raise HTTPException(status_code=404, detail="No matching recipes found.")
         return recipe_ids
+    except UnknownEntityError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "unknown": e.unknown})
     except Exception as e:
         logging.exception("Error in /recommend endpoint")
         raise HTTPException(status_code=500, detail=f"Recommendation error: {e}")
+
+@router.post("/recommend/batch", response_model=List[BatchRecommendationResult])
+def recommend_recipes_batch(batch: BatchRecommendationRequest):
+    """
+    Top-K recipe IDs for several requests at once (e.g. all filter presets of a screen).
+    Criteria shared between requests are scored once; results come back in request
+    order, with a per-request error instead of failing the whole batch.
+    """
+    if len(batch.requests) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(batch.requests)} requests exceeds the limit of {MAX_BATCH_SIZE}.",
+        )
+    try:
+        results = [None] * len(batch.requests)
+        queries, positions = [], []
+        for i, r in enumerate(batch.requests):
+            try:
+                queries.append({"criteria": _criteria(r), "top_k": r.top_k, "fusion": r.fusion, "constraints": r.constraints})
+                positions.append(i)
+            except UnknownEntityError as e:
+                results[i] = {"recipe_ids": [], "error": str(e)}
+        for i, result in zip(positions, get_matching_recipes_batch(queries)):
+            results[i] = result
+        return results
+    except Exception as e:
+        logging.exception("Error in /recommend/batch endpoint")
+        raise HTTPException(status_code=500, detail=f"Recommendation error: {e}")
+
+@router.get("/recommend/stats")
+def recommend_stats():
+    """
+    Micro-batching histograms (queue depth, batch size, wait time), score vector
+    cache and entity resolver counters of this worker.
+    """
+    return {
+        "scheduler": recommend_scheduler.stats(),
+        "score_cache": score_cache.stats(),
+        "resolver": entity_resolver.stats(),
+    }
@@ -1,12 +1,36 @@
-from fastapi import APIRouter
-from typing import List
-from core.data_loading import get_unique_ingredients
+from fastapi import APIRouter, Header, Query, Response
+import os
+from typing import List, Optional
+from core.ingredient_index import ingredient_index, SEARCH_MODES
 
 router = APIRouter()
 
+# The vocabulary only changes on redeploy, so clients and proxies may reuse it for a while
+CACHE_MAX_AGE = int(os.environ.get("INGREDIENTS_CACHE_MAX_AGE", "3600"))
+MAX_PAGE_SIZE = 1000
+
 @router.get("/unique_ingredients", response_model=List[str])
-def get_unique_ingredients_endpoint():
+def get_unique_ingredients_endpoint(
+    response: Response,
+    q: Optional[str] = Query(None, description="Case-insensitive autocomplete query"),
+    match: str = Query("prefix", pattern=f"^({'|'.join(SEARCH_MODES)})$"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    if_none_match: Optional[str] = Header(None),
+):
     """
-    Returns a list of all unique ingredients found in the CSV dataset.
+    Returns the unique ingredients of the dataset, most frequent first. Without
+    parameters this is the full list; `q` narrows it to names starting with (or, with
+    match=substring, containing) the query, and `offset`/`limit` page through the
+    result. X-Total-Count holds the number of matches before paging.
     """
-    return get_unique_ingredients()
+    etag = f'W/"{ingredient_index.etag}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={CACHE_MAX_AGE}"}
+    if if_none_match is not None and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    matches = ingredient_index.search(q or "", match)
+    headers["X-Total-Count"] = str(len(matches))
+    response.headers.update(headers)
+    stop = None if limit is None else offset + limit
+    return list(matches[offset:stop])
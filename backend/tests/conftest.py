@@ -0,0 +1,61 @@
+"""
+Test setup: the core modules build their singletons (scorer, constraint index, ...)
+at import from the pickled model and the triples CSV, which are not part of the
+repository. Before anything from core is imported, a small PyKEEN model trained on
+toy_triples() is registered as core.model, and the binary caches go to a temporary
+directory.
+
+Run from backend/:
+    python -m pytest -q tests
+"""
+import os
+import sys
+import tempfile
+import types
+import numpy as np
+import pandas as pd
+import torch
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+_TMP_DIR = tempfile.mkdtemp(prefix="kge-tests-")
+os.environ["KGE_ENGINE"] = "pickle"
+os.environ["KGE_EMBEDDING_PRECISION"] = "float32"
+os.environ["KGE_CACHE_DIR"] = os.path.join(_TMP_DIR, "cache")
+os.environ["APP_STATE_DIR"] = os.path.join(_TMP_DIR, "state")
+
+from pykeen.models import TransE
+from pykeen.triples import TriplesFactory
+
+DIETS = ["Vegan", "Standard", "Keto"]
+MEALS = ["dinner", "lunch"]
+
+def toy_triples(n_recipes: int = 60, n_ingredients: int = 12, seed: int = 0) -> np.ndarray:
+    """
+    Canonical (head, relation, tail) labels of a small recipe graph.
+    """
+    rng = np.random.default_rng(seed)
+    triples = []
+    for i in range(n_recipes):
+        triples.append((f"recipe_{i}", "hasDietType", f"diet_type_{DIETS[i % len(DIETS)]}"))
+        triples.append((f"recipe_{i}", "isForMealType", f"meal_type_{MEALS[i % len(MEALS)]}"))
+        for j in rng.choice(n_ingredients, 3, replace=False):
+            triples.append((f"recipe_{i}", "containsIngredient", f"ingredient_ing{j}"))
+    return np.array(triples, dtype=str)
+
+def toy_triples_factory() -> TriplesFactory:
+    return TriplesFactory.from_labeled_triples(toy_triples(), create_inverse_triples=False)
+
+def _install_toy_model() -> None:
+    factory = toy_triples_factory()
+    triples_path = os.path.join(_TMP_DIR, "triples.csv")
+    pd.DataFrame(toy_triples(), columns=["Head", "Relation", "Tail"]).to_csv(triples_path, index=False)
+    torch.manual_seed(0)
+    module = types.ModuleType("core.model")
+    module.model = TransE(triples_factory=factory, embedding_dim=8).eval()
+    module.triples_factory = factory
+    module.TRIPLES_PATH = triples_path
+    sys.modules["core.model"] = module
+
+_install_toy_model()
@@ -0,0 +1,47 @@
+"""
+Scores of an exported engine (RecipeScorer.from_engine, native interactions on
+memory-mapped arrays) must match PyKEEN's predict_target on the original model.
+"""
+import pytest
+import torch
+from pykeen.models import ComplEx, DistMult, RotatE, TransE
+from pykeen.predict import predict_target
+
+from conftest import toy_triples_factory
+from core.constraint_index import ConstraintIndex
+from core.engine_store import export_engine, load_manifest
+from core.scoring import RecipeScorer
+
+CRITERIA = [
+    ("diet_type_Vegan", "hasDietType"),
+    ("diet_type_Keto", "hasDietType"),
+    ("meal_type_lunch", "isForMealType"),
+    ("ingredient_ing0", "containsIngredient"),
+    ("ingredient_ing7", "containsIngredient"),
+]
+
+@pytest.mark.parametrize("model_cls", [TransE, DistMult, ComplEx, RotatE])
+@pytest.mark.parametrize("precision", ["float32", "float16"])
+def test_exported_engine_matches_predict_target(tmp_path, model_cls, precision):
+    factory = toy_triples_factory()
+    torch.manual_seed(0)
+    model = model_cls(triples_factory=factory, embedding_dim=8).eval()
+    scorer = RecipeScorer(model, factory, precision="float32")
+    records = {int(rid): {"RecipeId": int(rid), "Name": f"Recipe {rid}"} for rid in scorer.recipe_ids}
+    constraints = ConstraintIndex.build(
+        factory.mapped_triples.numpy(), scorer.recipe_entity_ids.numpy(), scorer.entity_to_id
+    )
+    engine_dir = str(tmp_path / "engine")
+    export_engine(scorer, records, [("ing0", 1)], constraints, out_dir=engine_dir, precision=precision)
+
+    assert load_manifest(engine_dir)["interaction_kwargs"] is not None
+    engine = RecipeScorer.from_engine(engine_dir)
+    actual = engine.score(CRITERIA).float()
+
+    targets = scorer.recipe_entity_ids.tolist()
+    # float16 recipe vectors are only close to the float32 ones
+    atol = 1e-5 if precision == "float32" else 5e-2
+    for row, (tail, relation) in zip(actual, CRITERIA):
+        df = predict_target(model, relation=relation, tail=tail, triples_factory=factory, targets=targets).df
+        expected = torch.as_tensor(df.set_index("head_id").loc[targets, "score"].to_numpy(), dtype=torch.float32)
+        assert torch.allclose(row, expected, atol=atol, rtol=1e-5), f"{model_cls.__name__}: {relation} -> {tail}"
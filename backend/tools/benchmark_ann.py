@@ -0,0 +1,83 @@
+"""
+Recall and latency of retrieval="ann" against exact scoring for a fixed set of criteria.
+
+Usage (from backend/):
+    python -m tools.benchmark_ann [--top-k 10] [--nprobe 1 2 4 8 16 32] [--queries 200]
+"""
+import argparse
+import time
+import numpy as np
+from typing import List, Tuple
+
+import core.recommender as recommender
+from core.ann import ANN_INDEX_PATH, load_recipe_index
+from core.scoring import recipe_scorer
+
+# Relation used for each attribute entity prefix when sampling criteria
+PREFIX_RELATIONS = {
+    "diet_type_": "hasDietType",
+    "meal_type_": "isForMealType",
+    "cuisine_region_": "hasCuisineRegion",
+    "ingredient_": "containsIngredient",
+}
+
+def sample_queries(n: int, max_criteria: int, seed: int) -> List[List[Tuple[str, str]]]:
+    rng = np.random.default_rng(seed)
+    pool = [
+        (label, relation)
+        for label in recipe_scorer.entity_to_id
+        for prefix, relation in PREFIX_RELATIONS.items()
+        if label.startswith(prefix) and relation in recipe_scorer.relation_to_id
+    ]
+    queries = []
+    for _ in range(n):
+        size = int(rng.integers(1, max_criteria + 1))
+        picks = rng.choice(len(pool), size=min(size, len(pool)), replace=False)
+        queries.append([pool[i] for i in picks])
+    return queries
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ANN vs. exact recipe retrieval.")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--max-criteria", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    index = load_recipe_index(recipe_scorer)
+    if index is None:
+        raise SystemExit(f"No usable ANN index at {ANN_INDEX_PATH}; run python -m tools.build_ann_index first.")
+    recommender.DEBUG = False
+    recommender.recipe_index = index
+
+    queries = sample_queries(args.queries, args.max_criteria, args.seed)
+    exact, exact_ms = zip(*[
+        timed(recommender.get_matching_recipes, q, args.top_k) for q in queries
+    ])
+    print(f"{recipe_scorer.num_recipes} recipes, {index.ivf.n_lists} lists, {len(queries)} queries, top_k={args.top_k}")
+    print(f"exact       p50 {np.median(exact_ms):8.2f} ms   p95 {np.percentile(exact_ms, 95):8.2f} ms")
+
+    for nprobe in args.nprobe:
+        recalls, latencies, sizes = [], [], []
+        for q, truth in zip(queries, exact):
+            candidates = index.candidates(q, nprobe=nprobe, min_candidates=args.top_k)
+            sizes.append(recipe_scorer.num_recipes if candidates is None else len(candidates))
+            ids, ms = timed(
+                recommender.get_matching_recipes, q, args.top_k, retrieval="ann", nprobe=nprobe
+            )
+            latencies.append(ms)
+            recalls.append(len(set(ids) & set(truth)) / max(len(truth), 1))
+        print(
+            f"nprobe={nprobe:<4} recall@{args.top_k} {np.mean(recalls):.3f}   "
+            f"p50 {np.median(latencies):8.2f} ms   p95 {np.percentile(latencies, 95):8.2f} ms   "
+            f"mean candidates {np.mean(sizes):.0f}"
+        )
+
+if __name__ == "__main__":
+    main()
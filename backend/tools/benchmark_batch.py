@@ -0,0 +1,49 @@
+"""
+Throughput of /recommend/batch scoring against N sequential get_matching_recipes calls.
+
+Usage (from backend/):
+    python -m tools.benchmark_batch [--batch-sizes 1 4 16 64] [--top-k 10] [--repeats 5]
+"""
+import argparse
+import time
+import numpy as np
+
+import core.recommender as recommender
+from tools.benchmark_ann import sample_queries
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark batched vs. sequential recommendation.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--max-criteria", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    recommender.DEBUG = False
+    for n in args.batch_sizes:
+        queries = sample_queries(n, args.max_criteria, args.seed)
+        batch = [{"criteria": q, "top_k": args.top_k} for q in queries]
+
+        sequential_s, batched_s = [], []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            expected = [recommender.get_matching_recipes(q, args.top_k) for q in queries]
+            sequential_s.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            results = recommender.get_matching_recipes_batch(batch)
+            batched_s.append(time.perf_counter() - start)
+
+        identical = all(r["recipe_ids"] == e for r, e in zip(results, expected))
+        unique = len({c for q in queries for c in q})
+        total = sum(len(q) for q in queries)
+        seq, bat = np.median(sequential_s), np.median(batched_s)
+        print(
+            f"N={n:<4} criteria {total:4d} (unique {unique:4d})   "
+            f"sequential {n / seq:8.1f} req/s   batch {n / bat:8.1f} req/s   "
+            f"speedup {seq / bat:5.2f}x   identical: {identical}"
+        )
+
+if __name__ == "__main__":
+    main()
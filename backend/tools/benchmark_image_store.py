@@ -0,0 +1,126 @@
+"""
+Latency of call_vlm_api_async with the local image store against a fake Recraft
+endpoint (served on a local port) that renders after a delay and hosts the PNG it
+returns. Prompts repeat with casing/whitespace variations, so the normalized prompt
+hashing is exercised; a small --max-bytes shows LRU eviction. Finally fetches a stored
+image and a thumbnail through the /images routes and prints their cache headers.
+Uses a temporary store directory.
+
+Usage (from backend/):
+    python -m tools.benchmark_image_store [--prompts 20] [--requests 100] [--image-latency 1.0]
+"""
+import os
+import time
+import zlib
+import random
+import struct
+import asyncio
+import argparse
+import tempfile
+import numpy as np
+import httpx
+from fastapi import FastAPI, Response
+from typing import Dict
+
+# The image prompt LLM is not used, but the stub keeps the import offline
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("RECRAFT_API_KEY", "benchmark")
+
+import core.vlm_generator as vlm_generator
+from core.image_store import ImageStore
+from core.response_cache import response_cache
+from routers import images
+from tools.local_server import start_server
+
+def fake_png(seed: int) -> bytes:
+    """
+    A valid 64x64 PNG of random pixels, so each render gets its own file.
+    """
+    rng = random.Random(seed)
+    rows = b"".join(b"\x00" + bytes(rng.randrange(256) for _ in range(64 * 3)) for _ in range(64))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", 64, 64, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+def fake_recraft(latency: float) -> FastAPI:
+    app = FastAPI()
+    renders: Dict[str, int] = {}
+
+    @app.post("/v1/images/generations")
+    async def generate(body: Dict) -> Dict:
+        await asyncio.sleep(latency)
+        image_id = len(renders)
+        renders[str(image_id)] = hash(body["prompt"])
+        return {"data": [{"url": f"{app.state.base_url}/files/{image_id}.png"}]}
+
+    @app.get("/files/{image_id}.png")
+    def download(image_id: str) -> Response:
+        return Response(content=fake_png(renders[image_id]), media_type="image/png")
+
+    return app
+
+def variant(prompt: str, rng: random.Random) -> str:
+    return rng.choice([prompt, prompt.upper(), f"  {prompt}\n", prompt.replace(" ", "  ")])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the local image store.")
+    parser.add_argument("--prompts", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--image-latency", type=float, default=1.0, help="seconds the fake image API takes")
+    parser.add_argument("--max-bytes", type=int, default=2 * 1024 ** 3, help="store budget")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # The response cache would hide the renders the store saves
+    response_cache.levels = []
+    recraft = fake_recraft(args.image_latency)
+    recraft.state.base_url = start_server(recraft)
+    vlm_generator.RECRAFT_API_URL = recraft.state.base_url + "/v1/images/generations"
+    store = ImageStore(tempfile.mkdtemp(), args.max_bytes)
+    vlm_generator.image_store = images.image_store = store
+
+    rng = random.Random(args.seed)
+    prompts = [f"Professional food photograph of dish number {i} on a rustic table" for i in range(args.prompts)]
+    sequence = [variant(rng.choice(prompts), rng) for _ in range(args.requests)]
+
+    async def run() -> Dict:
+        hit_ms, miss_ms, urls = [], [], []
+        for prompt in sequence:
+            hit = store.lookup(prompt) is not None
+            start = time.perf_counter()
+            urls.append(await vlm_generator.call_vlm_api_async(prompt))
+            (hit_ms if hit else miss_ms).append((time.perf_counter() - start) * 1000)
+        await vlm_generator.close_async_client()
+        return {"hit_ms": hit_ms, "miss_ms": miss_ms, "urls": urls}
+
+    result = asyncio.run(run())
+    hit_ms, miss_ms = result["hit_ms"], result["miss_ms"]
+    print(
+        f"{args.requests} requests over {args.prompts} prompts: {len(hit_ms) / args.requests:.0%} served from the store\n"
+        f"miss (render + download): p50 {np.percentile(miss_ms, 50):8.1f} ms\n"
+        + (f"hit:                      p50 {np.percentile(hit_ms, 50):8.1f} ms\n" if hit_ms else "")
+        + f"store: {store.stats()}"
+    )
+
+    app = FastAPI()
+    app.include_router(images.router)
+    with httpx.Client(base_url=start_server(app)) as client:
+        url = next((u for u in reversed(result["urls"]) if u.startswith("/images/")), None)
+        if url is None:
+            print("no image left in the store")
+            return
+        name = url.rsplit("/", 1)[1]
+        for path in (url, f"/images/thumbnails/256/{name}"):
+            response = client.get(path)
+            print(
+                f"GET {path[:40]}...: {response.status_code} {response.headers.get('content-type')} "
+                f"{len(response.content)} bytes, Cache-Control: {response.headers.get('cache-control')}"
+            )
+            again = client.get(path, headers={"If-None-Match": response.headers["etag"]})
+            print(f"  conditional GET: {again.status_code}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Per-worker memory of the API process model: a parent loads the app (like gunicorn
+--preload), forks N workers that each serve recommendation queries, and every worker
+reports its unique (USS) and proportional (PSS) set size from /proc. Compares the
+pickled model ("pickle") against the memory-mapped engine export ("mmap").
+
+Linux only. Export the engine first: python -m tools.export_engine
+
+Usage (from backend/):
+    python -m tools.benchmark_memory [--workers 1 4 8] [--modes pickle mmap] [--queries 200]
+"""
+import os
+import sys
+import gc
+import json
+import argparse
+import subprocess
+import multiprocessing as mp
+from typing import Dict, List
+
+def read_memory(pid: str = "self") -> Dict[str, float]:
+    """
+    USS/PSS/RSS in MB from /proc/<pid>/smaps_rollup.
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[-1] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "pss": fields.get("Pss", 0),
+        "rss": fields.get("Rss", 0),
+    }
+
+def _worker(queries, top_k: int, done: mp.Barrier, measured: mp.Barrier, results: mp.Queue) -> None:
+    from core.recommender import get_matching_recipes, fetch_recipes_info
+
+    for criteria in queries:
+        fetch_recipes_info(get_matching_recipes(criteria, top_k))
+    gc.collect()
+    done.wait()  # every worker is alive and warm when memory is read
+    results.put(read_memory())
+    measured.wait()
+
+def run_child(workers: int, n_queries: int, top_k: int) -> None:
+    import core.recommender as recommender
+    from tools.benchmark_ann import sample_queries
+
+    recommender.DEBUG = False
+    queries = sample_queries(n_queries, 3, seed=0)
+    parent = read_memory()
+
+    ctx = mp.get_context("fork")
+    # The parent joins both barriers so its shared pages are counted while all workers live
+    done, measured, results = ctx.Barrier(workers + 1), ctx.Barrier(workers + 1), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(queries, top_k, done, measured, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    done.wait()
+    parent_shared = read_memory()
+    stats = [results.get() for _ in procs]
+    measured.wait()
+    for p in procs:
+        p.join()
+    print(json.dumps({"parent_loaded": parent, "parent": parent_shared, "workers": stats}))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-worker memory for the pickle and mmap engines.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--modes", nargs="+", default=["pickle", "mmap"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--child", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        run_child(args.child, args.queries, args.top_k)
+        return
+
+    for mode in args.modes:
+        for workers in args.workers:
+            # The score vector cache is per-worker by design; keep it out of the comparison
+            env = dict(os.environ, KGE_ENGINE=mode, SCORE_CACHE_MB="0", SCORE_CACHE_WARMUP="0")
+            out = subprocess.run(
+                [sys.executable, "-m", "tools.benchmark_memory", "--child", str(workers),
+                 "--queries", str(args.queries), "--top-k", str(args.top_k)],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            report = json.loads(out.strip().splitlines()[-1])
+            stats: List[Dict[str, float]] = report["workers"]
+            uss = sum(s["uss"] for s in stats) / len(stats)
+            pss = sum(s["pss"] for s in stats)
+            total = pss + report["parent"]["pss"]
+            print(
+                f"{mode:<7} workers={workers:<3} parent RSS {report['parent_loaded']['rss']:7.0f} MB   "
+                f"per-worker USS {uss:7.1f} MB   worker PSS {pss:7.0f} MB   "
+                f"total PSS incl. parent {total:7.0f} MB"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Size and formatting time of the example recipes section of the generation prompt:
+the former layout (13 full fields per example) against the compact, deduplicated
+snippets that are precomputed when the recipes are loaded. Examples are groups of
+random recipes from the loaded dataset; tokens are estimated at
+core.prompt_compaction.CHARS_PER_TOKEN characters per token.
+
+Usage (from backend/):
+    python -m tools.benchmark_prompt [--requests 200] [--examples 5] [--budget 1200]
+"""
+import time
+import random
+import argparse
+import numpy as np
+from typing import Dict, List
+
+from core.data_loading import recipe_store
+from core.prompt_compaction import EXAMPLE_KEYS, estimate_tokens, format_examples
+
+def full_examples(recipes: List[Dict]) -> str:
+    """
+    The example section as generate_recipe_llm used to format it.
+    """
+    text = ""
+    for idx, recipe in enumerate(recipes, start=1):
+        fields = "\n".join(f"{key}: {recipe.get(key, 'Not provided')}" for key in EXAMPLE_KEYS)
+        text += f"Example Recipe {idx}:\n{fields}\n{'-'*40}\n"
+    return text
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark prompt compaction of example recipes.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--examples", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=1200, help="token budget of the example section")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ids = list(recipe_store.records())
+    groups = [rng.sample(ids, args.examples) for _ in range(args.requests)]
+
+    full_tokens, full_ms, compact_tokens, compact_ms, trimmed = [], [], [], [], 0
+    for group in groups:
+        start = time.perf_counter()
+        text = full_examples(recipe_store.fetch_many(group))
+        full_ms.append((time.perf_counter() - start) * 1000)
+        full_tokens.append(estimate_tokens(text))
+
+        start = time.perf_counter()
+        text, was_trimmed = format_examples(recipe_store.snippets(group), args.budget)
+        compact_ms.append((time.perf_counter() - start) * 1000)
+        compact_tokens.append(estimate_tokens(text))
+        trimmed += was_trimmed
+
+    print(f"{args.requests} requests x {args.examples} examples, budget {args.budget} tokens")
+    for name, tokens, ms in (("full", full_tokens, full_ms), ("compact", compact_tokens, compact_ms)):
+        print(
+            f"{name:<8} tokens p50 {np.percentile(tokens, 50):7.0f}   max {max(tokens):7.0f}   "
+            f"format p50 {np.percentile(ms, 50):.3f} ms"
+        )
+    saved = 1 - sum(compact_tokens) / max(sum(full_tokens), 1)
+    print(f"saved {saved:.0%} of example tokens; {trimmed} requests trimmed to the budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Feeds typical defective LLM recipe responses (trailing commas, prose around the JSON,
+truncation, missing or mistyped fields) through core.recipe_validation and reports,
+per defect, the outcome and the latency of repairing against regenerating the whole
+recipe. Re-asks go to the stub LLM backend, which answers them from a valid recipe
+after a latency proportional to the answer length, like a model emitting tokens.
+
+Usage (from backend/):
+    python -m tools.benchmark_recipe_repair [--latency 4.0] [--runs 5]
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+from typing import Callable, Dict
+
+# Benchmark against the fake LLM, never the real one
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+from core.llm_session import STUB_RESPONSE, StubBackend, llm_client, set_backend
+from core.recipe_validation import validate_recipe_json_async, repair_stats
+
+SAMPLE = json.loads(STUB_RESPONSE)
+
+def _recipe(change: Callable[[Dict], None]) -> Dict:
+    data = json.loads(STUB_RESPONSE)
+    change(data["recipes"][0])
+    return data
+
+def defects() -> Dict[str, str]:
+    valid = json.dumps(SAMPLE, indent=2)
+    return {
+        "valid": valid,
+        "trailing commas": re.sub(r"(\]|\}|\d|\")(\s*\n\s*)(\}|\])", r"\1,\2\3", valid),
+        "fenced, with prose": f"Here is your recipe:\n```json\n{valid}\n```\nEnjoy!",
+        "truncated in steps": valid[:valid.index('"Bake at')],
+        "truncated in nutrition": valid[:valid.index('"fiberDailyValue"')],
+        "missing nutritionInfo": json.dumps(_recipe(lambda r: r.pop("nutritionInfo"))),
+        "numeric amounts": json.dumps(_recipe(lambda r: [i.update(amount=500) for i in r["ingredients"]])),
+        "cookingTime as text": json.dumps(_recipe(lambda r: r.update(cookingTime="45 minutes"))),
+        "not JSON": "I'm sorry, I can't help with that.",
+    }
+
+def reask_answer(prompt: str) -> str:
+    """
+    Answers a re-ask prompt with the requested fields of the valid sample.
+    """
+    keys = re.search(r"exactly these keys: (.*)\.", prompt).group(1)
+    fields = re.findall(r'"(\w+)"', keys)
+    return json.dumps({f: SAMPLE["recipes"][0][f] for f in fields})
+
+class ReaskBackend(StubBackend):
+    """
+    Stub whose latency grows with the answer length.
+    """
+
+    def __init__(self, seconds_per_char: float):
+        super().__init__(latency=0.0, response_fn=reask_answer)
+        self.seconds_per_char = seconds_per_char
+
+    async def generate_async(self, prompt: str, response_schema=None) -> str:
+        answer = self._answer(prompt)
+        await asyncio.sleep(len(answer) * self.seconds_per_char)
+        return answer
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark repair of malformed recipe JSON.")
+    parser.add_argument("--latency", type=float, default=4.0, help="seconds the fake LLM takes for a full recipe")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    set_backend(ReaskBackend(args.latency / len(STUB_RESPONSE)))
+
+    async def run() -> None:
+        regenerate_ms = args.latency * 1000
+        print(f"full regeneration: {regenerate_ms:.0f} ms\n")
+        print(f"{'defect':<24} {'outcome':<10} {'p50 ms':>9} {'saved':>7}")
+        for name, text in defects().items():
+            times, outcome = [], None
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                result = await validate_recipe_json_async(text, llm_client.generate_async, regenerate_ms)
+                times.append((time.perf_counter() - start) * 1000)
+                outcome = result.outcome
+            p50 = np.percentile(times, 50)
+            saved = f"{1 - p50 / regenerate_ms:.0%}" if outcome not in ("valid", "failed") else "-"
+            print(f"{name:<24} {outcome:<10} {p50:9.1f} {saved:>7}")
+        print(f"\nstats: {repair_stats.stats()}")
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
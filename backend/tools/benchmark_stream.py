@@ -0,0 +1,84 @@
+"""
+Time to first byte of /generate_recipe against /generate_recipe/stream, served by a
+real uvicorn server on a local port (in-process ASGI transports buffer the whole
+response) with the stub LLM backend emitting chunks at a constant rate. Besides the
+first byte, reports when the first token and the recipe title arrive and the total time.
+The response cache is disabled so every request reaches the LLM.
+
+Usage (from backend/):
+    python -m tools.benchmark_stream [--requests 20] [--latency 2.0] [--chunk-chars 16]
+"""
+import os
+import time
+import argparse
+import numpy as np
+import httpx
+from fastapi import FastAPI
+from typing import Dict, List, Optional
+
+# Benchmark against the fake streaming LLM, never the real one
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+import core.recommender as recommender
+from core.llm_session import StubBackend, set_backend
+from core.response_cache import response_cache
+from routers import generate_recipe
+from tools.load_recommend import sample_bodies
+from tools.local_server import start_server
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(generate_recipe.router)
+    return app
+
+def timed_request(client: httpx.Client, path: str, body: Dict) -> Dict[str, Optional[float]]:
+    """
+    Milliseconds until the first body byte, the first "token" event, the "title"
+    field and the end of the response (the last three only for SSE).
+    """
+    start = time.perf_counter()
+    times: Dict[str, Optional[float]] = {"ttfb": None, "first_token": None, "title": None}
+    buffer = ""
+    with client.stream("POST", path, json=body) as response:
+        response.raise_for_status()
+        for text in response.iter_text():
+            now = (time.perf_counter() - start) * 1000
+            if times["ttfb"] is None:
+                times["ttfb"] = now
+            buffer += text
+            if times["first_token"] is None and "event: token" in buffer:
+                times["first_token"] = now
+            if times["title"] is None and '"name": "title"' in buffer:
+                times["title"] = now
+    times["total"] = (time.perf_counter() - start) * 1000
+    return times
+
+def summary(name: str, runs: List[Dict[str, Optional[float]]]) -> str:
+    parts = []
+    for key in ("ttfb", "first_token", "title", "total"):
+        values = [r[key] for r in runs if r[key] is not None]
+        if values:
+            parts.append(f"{key} p50 {np.percentile(values, 50):7.1f} ms")
+    return f"{name:<24} " + "   ".join(parts)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark TTFB of streamed vs. buffered recipe generation.")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=2.0, help="seconds the fake LLM takes for a full response")
+    parser.add_argument("--chunk-chars", type=int, default=16, help="characters per streamed chunk")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    recommender.DEBUG = False
+    response_cache.levels = []
+    set_backend(StubBackend(latency=args.latency, chunk_chars=args.chunk_chars))
+    base_url = start_server(build_app())
+    bodies = sample_bodies(args.requests, 5, args.seed)
+
+    with httpx.Client(base_url=base_url, timeout=None) as client:
+        for path in ("/generate_recipe", "/generate_recipe/stream"):
+            runs = [timed_request(client, path, body) for body in bodies]
+            print(summary(path, runs))
+
+if __name__ == "__main__":
+    main()
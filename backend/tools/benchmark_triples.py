@@ -0,0 +1,136 @@
+"""
+Compares the dict/networkx graph builder (create_graph_and_triples) with the columnar
+builder (build_triples_columnar) on a synthetic recipe corpus: wall time and peak RSS.
+For corpora up to 200k recipes it also asserts that both produce the same entity and
+relation labels and the same id-mapped triples as TriplesFactory.from_labeled_triples
+would assign to the legacy output.
+
+Each builder runs in its own process so peak RSS is measured independently.
+
+Usage (from backend/):
+    python -m tools.benchmark_triples [--n-recipes 1000000] [--skip-legacy] [--output-dir DIR]
+"""
+import argparse
+import multiprocessing as mp
+import resource
+import time
+import numpy as np
+import pandas as pd
+
+from core.data_loading import load_recipes_from_dataframe
+from core.kg_utils import build_triples_columnar, canonicalize_labels, create_graph_and_triples
+
+DIETS = ["Standard", "Vegan", "Vegetarian", "Keto", "Paleo", "Gluten Free"]
+MEALS = ["breakfast", "lunch", "dinner", "snack", "dessert"]
+HEALTH = ["High Protein", "Low Carb", "Low Fat", "High Calorie", "Low Sodium", "High Fiber"]
+REGIONS = ["Southeast Asia", "Western Europe", "North America", "Middle East", "unknown"]
+METHODS = ["baking", "frying", "boiling", "grilling", "unknown"]
+
+def synthetic_recipes(n: int, n_ingredients: int = 5000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    ingredients = np.array([f"Ingredient {i}" for i in range(n_ingredients)])
+
+    def joined(choices, k_max, sep):
+        picks = rng.integers(0, len(choices), size=(n, k_max))
+        counts = rng.integers(1, k_max + 1, size=n)
+        return [sep.join(choices[p[:c]]) for p, c in zip(picks, counts)]
+
+    df = pd.DataFrame({
+        "RecipeId": np.arange(n),
+        "Cooking_Method": rng.choice(METHODS, n),
+        "servings_bin": rng.choice(["1-2", "3-4", "5-6", "7+"], n),
+        "Diet_Types": joined(np.array(DIETS), 3, ", "),
+        "meal_type": joined(np.array(MEALS), 2, ","),
+        "cook_time": rng.choice(["<15", "15-30", "30-60", ">60"], n),
+        "Healthy_Type": joined(np.array(HEALTH), 3, ", "),
+        "CuisineRegion": rng.choice(REGIONS, n),
+        "BestUsdaIngredientName": joined(ingredients, 10, "; "),
+    })
+    # Some recipes without any usable attribute, so they get no edges at all
+    df.loc[::50, df.columns.drop("RecipeId")] = "unknown"
+    return df
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _legacy(df: pd.DataFrame, out: dict) -> None:
+    start = time.perf_counter()
+    _, triples = create_graph_and_triples(load_recipes_from_dataframe(df))
+    out["seconds"] = time.perf_counter() - start
+    out["rss_mb"] = _peak_rss_mb()
+    out["triples"] = len(triples)
+    if out.get("check"):
+        heads, _ = canonicalize_labels(pd.Series(triples[:, 0]))
+        tails, _ = canonicalize_labels(pd.Series(triples[:, 2]))
+        # Sorted vocabularies, as TriplesFactory.from_labeled_triples builds them
+        entities = np.unique(np.concatenate([heads.to_numpy(dtype=str), tails.to_numpy(dtype=str)]))
+        relations = np.unique(triples[:, 1].astype(str))
+        out["entities"], out["relations"] = entities, relations
+        out["mapped"] = np.stack([
+            np.searchsorted(entities, heads.to_numpy(dtype=str)),
+            np.searchsorted(relations, triples[:, 1].astype(str)),
+            np.searchsorted(entities, tails.to_numpy(dtype=str)),
+        ], axis=1)
+
+def _columnar(df: pd.DataFrame, out: dict, output_dir: str = None) -> None:
+    start = time.perf_counter()
+    mapped, entities, relations, _ = build_triples_columnar(df, output_dir=output_dir)
+    out["seconds"] = time.perf_counter() - start
+    out["rss_mb"] = _peak_rss_mb()
+    out["triples"] = None if mapped is None else len(mapped)
+    if out.get("check") and mapped is not None:
+        out["entities"], out["relations"], out["mapped"] = entities, relations, mapped
+
+def _sorted_rows(triples: np.ndarray) -> np.ndarray:
+    return triples[np.lexsort(triples.T[::-1])]
+
+def _check_parity(legacy: dict, columnar: dict) -> None:
+    """
+    Asserts the columnar output can replace the legacy one in TriplesFactory(...).
+    """
+    assert np.array_equal(legacy["entities"], columnar["entities"]), "entity labels differ"
+    assert np.array_equal(legacy["relations"], columnar["relations"]), "relation labels differ"
+    assert np.array_equal(
+        _sorted_rows(legacy["mapped"]), _sorted_rows(columnar["mapped"])
+    ), "mapped triples differ"
+
+def _run(target, df: pd.DataFrame, check: bool, *args) -> dict:
+    with mp.Manager() as manager:
+        out = manager.dict(check=check)
+        proc = mp.get_context("fork").Process(target=target, args=(df, out, *args))
+        proc.start()
+        proc.join()
+        result = dict(out)
+        result["exitcode"] = proc.exitcode
+        return result
+
+def _report(name: str, result: dict) -> None:
+    if result["exitcode"] != 0:
+        print(f"{name:<9} failed with exit code {result['exitcode']} (negative: killed, e.g. out of memory)")
+        return
+    print(f"{name + ':':<9} {result['seconds']:7.1f}s  peak RSS {result['rss_mb']:7.0f} MB  triples {result['triples']}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the triple builders.")
+    parser.add_argument("--n-recipes", type=int, default=1_000_000)
+    parser.add_argument("--skip-legacy", action="store_true", help="Only run the columnar builder")
+    parser.add_argument("--output-dir", default=None, help="Stream columnar chunks to this directory")
+    args = parser.parse_args()
+
+    df = synthetic_recipes(args.n_recipes)
+    base_rss = _peak_rss_mb()
+    check = args.n_recipes <= 200_000 and not args.skip_legacy and not args.output_dir
+    print(f"{args.n_recipes} synthetic recipes (baseline peak RSS {base_rss:.0f} MB)")
+
+    columnar = _run(_columnar, df, check, args.output_dir)
+    _report("columnar", columnar)
+
+    if not args.skip_legacy:
+        legacy = _run(_legacy, df, check)
+        _report("legacy", legacy)
+        if check and "mapped" in legacy and "mapped" in columnar:
+            _check_parity(legacy, columnar)
+            print("identical entity/relation labels and mapped triples")
+
+if __name__ == "__main__":
+    main()
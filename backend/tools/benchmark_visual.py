@@ -0,0 +1,116 @@
+"""
+End-to-end wall time, LLM calls and prompt size per /generate_recipe_visual request
+for each image prompt mode ("llm" and "template"), with the stub LLM backend and a
+fake Recraft endpoint served on a local port. Also prints the mean per-stage latency.
+The response cache is disabled so every request runs the whole pipeline.
+
+Usage (from backend/):
+    python -m tools.benchmark_visual [--requests 10] [--latency 2.0] [--image-latency 3.0]
+"""
+import os
+import json
+import asyncio
+import argparse
+import numpy as np
+from fastapi import FastAPI
+from typing import Dict, List
+
+# Benchmark against the fake streaming LLM, never the real one
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("RECRAFT_API_KEY", "benchmark")
+
+import core.recommender as recommender
+import core.vlm_generator as vlm_generator
+from core.async_utils import StageTimings
+from core.llm_session import StubBackend, set_backend
+from core.recipe_visual import generate_recipe_with_visual_async
+from core.response_cache import response_cache
+from core.vlm_generator import VLM_PROMPT_MODES, close_async_client
+from tools.load_recommend import sample_bodies
+from tools.local_server import start_server
+
+# A full-size recipe, so the fields after the ingredients take a realistic share of the stream
+SAMPLE_RECIPE = json.dumps({
+    "recipes": [{
+        "id": "",
+        "title": "Smoky Paprika Chickpea Stew",
+        "description": "A hearty one-pot stew of chickpeas, roasted peppers and spinach in a smoky tomato broth.",
+        "imageUrl": "",
+        "cookingTime": 40,
+        "servings": 4,
+        "calories": 420,
+        "difficulty": "Easy",
+        "categories": ["Stew", "Vegan"],
+        "cookingMethod": "simmering",
+        "ingredients": [
+            {"name": name, "amount": "1", "unit": "cup", "notes": "", "category": "Produce", "amountInGrams": 150}
+            for name in ("chickpeas", "roasted red pepper", "spinach", "crushed tomatoes", "onion", "garlic")
+        ],
+        "steps": [
+            {"title": f"Step {i}", "description": "Stir everything together and let it simmer gently until thick.", "duration": 5}
+            for i in range(1, 9)
+        ],
+        "nutritionInfo": {key: 10 for key in (
+            "calories", "protein", "carbohydrates", "fat", "saturatedFat", "transFat", "cholesterol",
+            "sodium", "fiber", "sugars", "vitaminD", "calcium", "iron", "potassium",
+        )},
+    }]
+})
+
+def fake_recraft(latency: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/images/generations")
+    async def generate(body: Dict) -> Dict:
+        await asyncio.sleep(latency)
+        return {"data": [{"url": f"https://images.example/{abs(hash(body['prompt']))}.png"}]}
+
+    return app
+
+async def run_mode(bodies: List[Dict], mode: str) -> Dict:
+    wall, stages = [], {}
+    for body in bodies:
+        timings = StageTimings()
+        await generate_recipe_with_visual_async(body, timings, prompt_mode=mode)
+        wall.append(timings.ms["total"])
+        for stage, ms in timings.ms.items():
+            stages.setdefault(stage, []).append(ms)
+    return {"p50": float(np.percentile(wall, 50)), "stages": {s: float(np.mean(v)) for s, v in stages.items()}}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the visual pipeline per image prompt mode.")
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=2.0, help="seconds the fake LLM takes per response")
+    parser.add_argument("--image-latency", type=float, default=3.0, help="seconds the fake image API takes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    recommender.DEBUG = False
+    response_cache.levels = []
+    vlm_generator.RECRAFT_API_URL = start_server(fake_recraft(args.image_latency)) + "/v1/images/generations"
+    prompt_chars: List[int] = []
+
+    def answer(prompt: str) -> str:
+        prompt_chars.append(len(prompt))
+        return SAMPLE_RECIPE
+
+    stub = StubBackend(latency=args.latency, response_fn=answer)
+    set_backend(stub)
+    bodies = sample_bodies(args.requests, 5, args.seed)
+
+    # One event loop for all modes: the pooled image client is bound to it
+    async def run_all() -> None:
+        for mode in VLM_PROMPT_MODES:
+            stub.calls, prompt_chars[:] = 0, []
+            result = await run_mode(bodies, mode)
+            print(
+                f"{mode:>8}: wall p50 {result['p50']:7.1f} ms   {stub.calls / len(bodies):.1f} LLM calls/request   "
+                f"{sum(prompt_chars) / len(bodies):7.0f} prompt chars/request"
+            )
+            print("          " + "   ".join(f"{s} {ms:.1f}" for s, ms in result["stages"].items()))
+        await close_async_client()
+
+    asyncio.run(run_all())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Offline build of the IVF index used by retrieval="ann" in /recommend.
+
+Usage (from backend/):
+    python -m tools.build_ann_index [--n-lists N] [--n-iter 20] [--output PATH]
+"""
+import argparse
+import time
+
+from core.ann import ANN_INDEX_PATH, build_recipe_index
+from core.scoring import recipe_scorer
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the recipe ANN (IVF) index.")
+    parser.add_argument("--n-lists", type=int, default=None, help="Number of inverted lists (default: 4*sqrt(#recipes))")
+    parser.add_argument("--n-iter", type=int, default=20, help="k-means iterations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=ANN_INDEX_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    ivf = build_recipe_index(
+        recipe_scorer, path=args.output, n_lists=args.n_lists, n_iter=args.n_iter, seed=args.seed
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"Indexed {recipe_scorer.num_recipes} recipes ({recipe_scorer.interaction_name}, "
+        f"metric={ivf.metric}) into {ivf.n_lists} lists in {elapsed:.1f}s -> {args.output}"
+    )
+
+if __name__ == "__main__":
+    main()
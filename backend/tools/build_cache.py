@@ -0,0 +1,42 @@
+"""
+Builds the binary caches of the recipes table, the LLM prompt snippets, the ingredient
+frequencies and the triples factory.
+
+The caches are also rebuilt automatically on startup whenever a source CSV changes;
+run this as a build step (e.g. in the Docker image) so no worker pays the CSV parse.
+
+Usage (from backend/):
+    python -m tools.build_cache [--force]
+"""
+import argparse
+import shutil
+import time
+
+from core.cache import CACHE_DIR
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the recipes/ingredients/triples binary caches.")
+    parser.add_argument("--force", action="store_true", help="Discard existing cache entries first")
+    args = parser.parse_args()
+
+    if args.force:
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    # Both modules load their data through the cache at import time
+    start = time.perf_counter()
+    from core.data_loading import recipes_df, ingredient_counts
+    print(
+        f"recipes: {len(recipes_df)} rows, {len(ingredient_counts)} ingredients "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+    start = time.perf_counter()
+    from core.model import triples_factory
+    print(
+        f"triples: {triples_factory.num_triples} triples, {triples_factory.num_entities} entities, "
+        f"{triples_factory.num_relations} relations in {time.perf_counter() - start:.1f}s (including model load)"
+    )
+    print(f"cache directory: {CACHE_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Checks that an exported engine scores recipes like the original PyKEEN model: for
+(relation, tail) pairs sampled from the training triples, the scores of every recipe
+head from the engine (native interaction, memory-mapped arrays) are compared against
+pykeen.predict.predict_target on the pickled model. Exits with status 1 if any score
+differs by more than the tolerance or any top-k list changes.
+
+Needs pykeen and the pickled model, like tools/export_engine.py.
+
+Usage (from backend/):
+    python -m tools.check_engine_parity [--engine embedding/engine] [--criteria 50] [--atol 1e-5]
+"""
+import argparse
+import time
+import numpy as np
+import torch
+
+from core.engine_store import ENGINE_DIR, load_manifest
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare exported engine scores with the PyKEEN model.")
+    parser.add_argument("--engine", default=ENGINE_DIR)
+    parser.add_argument("--criteria", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--atol", type=float, default=1e-5)
+    parser.add_argument("--rtol", type=float, default=1e-5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from pykeen.predict import predict_target
+    from core.model import model, triples_factory
+    from core.scoring import RecipeScorer
+
+    manifest = load_manifest(args.engine)
+    engine = RecipeScorer.from_engine(args.engine)
+    native = manifest["interaction_kwargs"] is not None
+    print(f"Engine {args.engine}: {manifest['interaction']} ({'native' if native else 'pickled'} interaction)")
+
+    # Criteria actually present in the graph, so that scores span a realistic range
+    rng = np.random.default_rng(args.seed)
+    mapped = triples_factory.mapped_triples
+    rows = rng.choice(len(mapped), size=min(args.criteria, len(mapped)), replace=False)
+    id_to_entity = {i: label for label, i in triples_factory.entity_to_id.items()}
+    id_to_relation = {i: label for label, i in triples_factory.relation_to_id.items()}
+    criteria = [(id_to_entity[int(mapped[i, 2])], id_to_relation[int(mapped[i, 1])]) for i in rows]
+
+    targets = engine.recipe_entity_ids.tolist()
+    max_diff, top_k_mismatches, failures = 0.0, 0, 0
+    reference_time = engine_time = 0.0
+    for tail, relation in criteria:
+        start = time.perf_counter()
+        df = predict_target(
+            model, relation=relation, tail=tail, triples_factory=triples_factory, targets=targets
+        ).df
+        reference_time += time.perf_counter() - start
+        expected = torch.as_tensor(df.set_index("head_id").loc[targets, "score"].to_numpy(), dtype=torch.float32)
+
+        start = time.perf_counter()
+        actual = engine.score([(tail, relation)])[0].float()
+        engine_time += time.perf_counter() - start
+
+        diff = (actual - expected).abs().max().item() if len(targets) else 0.0
+        max_diff = max(max_diff, diff)
+        if not torch.allclose(actual, expected, atol=args.atol, rtol=args.rtol):
+            failures += 1
+            print(f"  MISMATCH {relation} -> {tail}: max abs diff {diff:.3g}")
+        k = min(args.top_k, len(targets))
+        if set(torch.topk(actual, k).indices.tolist()) != set(torch.topk(expected, k).indices.tolist()):
+            top_k_mismatches += 1
+
+    print(
+        f"{len(criteria)} criteria x {len(targets)} recipes: max abs diff {max_diff:.3g}, "
+        f"{failures} outside tolerance, {top_k_mismatches} top-{args.top_k} lists differ"
+    )
+    print(f"predict_target {reference_time * 1000:.0f} ms, engine {engine_time * 1000:.0f} ms")
+    if failures or top_k_mismatches:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compares quantized recipe embeddings (KGE_EMBEDDING_PRECISION=float16 / int8) against
+float32 scoring over a fixed, seeded set of criteria: top-k overlap and Spearman rank
+correlation per criterion, top-k overlap of fused multi-criteria queries, memory held
+by the recipe vectors and scoring time. Use it to pick a safe precision.
+
+Usage (from backend/):
+    python -m tools.evaluate_quantization [--precisions float16 int8] [--queries 200] [--top-k 10]
+"""
+import argparse
+import time
+import torch
+from typing import Dict, List, Tuple
+
+from core.engine_store import ENGINE_DIR, ENGINE_MODE
+from core.fusion import fuse_scores
+from core.quantization import PRECISIONS
+from core.scoring import RecipeScorer
+from tools.benchmark_ann import sample_queries
+
+CHUNK_CRITERIA = 16
+
+def build_scorer(precision: str) -> RecipeScorer:
+    if ENGINE_MODE == "mmap":
+        return RecipeScorer.from_engine(ENGINE_DIR, precision=precision)
+    from core.model import model, triples_factory
+    return RecipeScorer(model, triples_factory, precision=precision)
+
+def score_all(scorer: RecipeScorer, criteria: List[Tuple[str, str]]) -> Tuple[torch.Tensor, float]:
+    start = time.perf_counter()
+    rows = [scorer.score(criteria[i:i + CHUNK_CRITERIA]) for i in range(0, len(criteria), CHUNK_CRITERIA)]
+    return torch.cat(rows).float(), (time.perf_counter() - start) * 1000
+
+def spearman(a: torch.Tensor, b: torch.Tensor) -> torch.Tensor:
+    """
+    Row-wise Spearman correlation (ties broken by position).
+    """
+    ra = a.argsort(dim=1).argsort(dim=1).double()
+    rb = b.argsort(dim=1).argsort(dim=1).double()
+    ra -= ra.mean(dim=1, keepdim=True)
+    rb -= rb.mean(dim=1, keepdim=True)
+    return (ra * rb).sum(dim=1) / (ra.norm(dim=1) * rb.norm(dim=1))
+
+def top_k_overlap(a: torch.Tensor, b: torch.Tensor, k: int) -> torch.Tensor:
+    ta, tb = a.topk(k, dim=1).indices, b.topk(k, dim=1).indices
+    return torch.tensor([len(set(x.tolist()) & set(y.tolist())) / k for x, y in zip(ta, tb)])
+
+def fused_top_k(scores: torch.Tensor, index: Dict[Tuple[str, str], int], queries, k: int) -> List[set]:
+    return [
+        set(fuse_scores(scores[[index[c] for c in query]]).topk(k).indices.tolist())
+        for query in queries
+    ]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evaluate quantized recipe embeddings against float32.")
+    parser.add_argument("--precisions", nargs="+", default=["float16", "int8"], choices=PRECISIONS)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--max-criteria", type=int, default=4)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    reference = build_scorer("float32")
+    queries = sample_queries(args.queries, args.max_criteria, args.seed)
+    criteria = list(dict.fromkeys(c for query in queries for c in query))
+    index = {c: i for i, c in enumerate(criteria)}
+    k = min(args.top_k, reference.num_recipes)
+
+    expected, reference_ms = score_all(reference, criteria)
+    expected_fused = fused_top_k(expected, index, queries, k)
+    print(
+        f"{len(criteria)} criteria, {len(queries)} queries, {reference.num_recipes} recipes, top-{k}\n"
+        f"{'precision':>9} {'MB':>8} {'score ms':>9} {'overlap':>8} {'min':>6} "
+        f"{'spearman':>9} {'min':>8} {'fused overlap':>14} {'fused exact':>12}"
+    )
+    mb = reference.recipe_nbytes / 2**20
+    print(f"{'float32':>9} {mb:8.1f} {reference_ms:9.0f} {1:8.3f} {1:6.2f} {1:9.5f} {1:8.5f} {1:14.3f} {1:12.3f}")
+
+    for precision in args.precisions:
+        scorer = build_scorer(precision)
+        actual, ms = score_all(scorer, criteria)
+        overlap = top_k_overlap(actual, expected, k)
+        rho = spearman(actual, expected)
+        fused = fused_top_k(actual, index, queries, k)
+        fused_overlap = torch.tensor([len(a & b) / k for a, b in zip(fused, expected_fused)])
+        fused_exact = sum(a == b for a, b in zip(fused, expected_fused)) / len(queries)
+        mb = scorer.recipe_nbytes / 2**20
+        print(
+            f"{precision:>9} {mb:8.1f} {ms:9.0f} {overlap.mean():8.3f} {overlap.min():6.2f} "
+            f"{rho.mean():9.5f} {rho.min():8.5f} {fused_overlap.mean():14.3f} {fused_exact:12.3f}"
+        )
+
+if __name__ == "__main__":
+    main()
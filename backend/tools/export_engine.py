@@ -0,0 +1,56 @@
+"""
+Exports the scoring engine (materialized embeddings, label indexes, interaction name
+and hyperparameters, hard-constraint index) and the recipe table into flat files that
+KGE_ENGINE=mmap maps read-only at startup, so gunicorn workers share one copy of them
+instead of each holding its own, and the API boots without importing pykeen. Verify
+an export with python -m tools.check_engine_parity (or tests/test_engine_parity.py).
+With --precision float16/int8 the recipe embeddings are quantized once here and
+mapped as such by every worker.
+
+Usage (from backend/):
+    python -m tools.export_engine [--output embedding/engine] [--precision float32]
+"""
+import os
+import argparse
+import time
+
+from core.engine_store import ENGINE_DIR, ENGINE_MODE, export_engine
+from core.quantization import EMBEDDING_PRECISION, PRECISIONS
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export the memory-mappable scoring engine.")
+    parser.add_argument("--output", default=ENGINE_DIR)
+    parser.add_argument("--precision", default="float32", choices=PRECISIONS, help="storage of the recipe embeddings")
+    args = parser.parse_args()
+
+    if ENGINE_MODE != "pickle":
+        raise SystemExit("Run the export with KGE_ENGINE=pickle: it reads the pickled model and the CSVs.")
+    if EMBEDDING_PRECISION != "float32":
+        raise SystemExit("Run the export with KGE_EMBEDDING_PRECISION=float32; pick the stored precision with --precision.")
+
+    start = time.perf_counter()
+    from core.scoring import recipe_scorer
+    from core.data_loading import recipes_df, recipe_store, count_ingredients
+    from core.constraint_index import constraint_index
+    print(f"Loaded model and data in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    manifest = export_engine(
+        recipe_scorer,
+        recipe_store.records(),
+        count_ingredients(recipes_df),
+        constraint_index,
+        out_dir=args.output,
+        precision=args.precision,
+    )
+    size_mb = sum(
+        os.path.getsize(os.path.join(args.output, name)) for name in os.listdir(args.output)
+    ) / 2**20
+    print(
+        f"Exported {manifest['num_recipes']} {args.precision} recipe embeddings ({manifest['interaction']}) and "
+        f"{manifest['num_rows']} recipe rows in {time.perf_counter() - start:.1f}s "
+        f"-> {args.output} ({size_mb:.0f} MB)"
+    )
+
+if __name__ == "__main__":
+    main()
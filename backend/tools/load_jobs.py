@@ -0,0 +1,110 @@
+"""
+Submits visual generation jobs to /generate_recipe_visual/jobs and polls /jobs/{id}
+until they finish, against the stub LLM backend and a local fake Recraft endpoint
+that fails a given share of renders (to exercise retries). Reports how long the
+submit call takes, job completion times, attempts and final statuses. Uses its own
+temporary job store.
+
+Usage (from backend/):
+    python -m tools.load_jobs [--jobs 20] [--workers 4] [--image-latency 1.0] [--failure-rate 0.3]
+"""
+import os
+import time
+import random
+import asyncio
+import tempfile
+import argparse
+import numpy as np
+import httpx
+from collections import Counter
+from fastapi import FastAPI, HTTPException
+from typing import Dict
+
+# Benchmark against the fake streaming LLM, never the real one
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("RECRAFT_API_KEY", "benchmark")
+
+import core.recommender as recommender
+import core.vlm_generator as vlm_generator
+from core.jobs import JobQueue, JobStore, job_queue
+from core.llm_session import StubBackend, set_backend
+from core.response_cache import response_cache
+from routers import jobs
+from tools.load_recommend import sample_bodies
+from tools.local_server import start_server
+
+def flaky_recraft(latency: float, failure_rate: float, seed: int) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+
+    @app.post("/v1/images/generations")
+    async def generate(body: Dict) -> Dict:
+        await asyncio.sleep(latency)
+        if rng.random() < failure_rate:
+            raise HTTPException(status_code=503, detail="Render failed")
+        return {"data": [{"url": f"https://images.example/{abs(hash(body['prompt']))}.png"}]}
+
+    return app
+
+def build_app(queue: JobQueue) -> FastAPI:
+    app = FastAPI()
+    app.include_router(jobs.router)
+    app.add_event_handler("startup", queue.start)
+    app.add_event_handler("shutdown", queue.stop)
+    return app
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the image generation job queue.")
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds the fake LLM takes per response")
+    parser.add_argument("--image-latency", type=float, default=1.0, help="seconds the fake image API takes")
+    parser.add_argument("--failure-rate", type=float, default=0.3, help="share of renders the fake API fails")
+    parser.add_argument("--backoff", type=float, default=0.5, help="base retry delay in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    recommender.DEBUG = False
+    response_cache.levels = []
+    set_backend(StubBackend(latency=args.latency))
+    vlm_generator.RECRAFT_API_URL = (
+        start_server(flaky_recraft(args.image_latency, args.failure_rate, args.seed)) + "/v1/images/generations"
+    )
+    # The router submits to the shared queue; point it at a throwaway store
+    job_queue.store = JobStore(os.path.join(tempfile.mkdtemp(), "jobs.sqlite"))
+    job_queue.workers, job_queue.backoff, job_queue.poll_interval = args.workers, args.backoff, 0.1
+    base_url = start_server(build_app(job_queue))
+    bodies = sample_bodies(args.jobs, 5, args.seed)
+
+    with httpx.Client(base_url=base_url, timeout=None) as client:
+        submitted, submit_ms = {}, []
+        for body in bodies:
+            start = time.perf_counter()
+            response = client.post("/generate_recipe_visual/jobs", json=body)
+            submit_ms.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+            submitted[response.json()["id"]] = time.perf_counter()
+
+        done: Dict[str, Dict] = {}
+        while len(done) < len(submitted):
+            time.sleep(0.1)
+            for job_id, start in submitted.items():
+                if job_id in done:
+                    continue
+                job = client.get(f"/jobs/{job_id}").json()
+                if job["status"] in ("succeeded", "failed"):
+                    job["seconds"] = time.perf_counter() - start
+                    done[job_id] = job
+
+    seconds = [job["seconds"] for job in done.values()]
+    statuses = Counter(job["status"] for job in done.values())
+    attempts = Counter(job["attempts"] for job in done.values())
+    print(
+        f"{args.jobs} jobs, {args.workers} workers, {args.failure_rate:.0%} render failures\n"
+        f"submit: p50 {np.percentile(submit_ms, 50):.1f} ms   p95 {np.percentile(submit_ms, 95):.1f} ms\n"
+        f"completion: p50 {np.percentile(seconds, 50):.2f} s   max {max(seconds):.2f} s\n"
+        f"statuses: {dict(statuses)}   attempts: {dict(sorted(attempts.items()))}"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Load generator for /recommend against the in-process app, with and without
+micro-batching of concurrent requests.
+
+Usage (from backend/):
+    python -m tools.load_recommend [--requests 2000] [--concurrency 1 8 32] [--mode both]
+"""
+import time
+import json
+import asyncio
+import argparse
+import numpy as np
+import httpx
+from fastapi import FastAPI
+from typing import Dict, List
+
+import core.recommender as recommender
+from routers import recommend
+from tools.benchmark_ann import sample_queries
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(recommend.router)
+    return app
+
+def sample_bodies(n: int, top_k: int, seed: int) -> List[Dict]:
+    fields = {
+        "hasDietType": ("diet_types", "diet_type_"),
+        "isForMealType": ("meal_type", "meal_type_"),
+        "containsIngredient": ("ingredients", "ingredient_"),
+    }
+    bodies = []
+    for criteria in sample_queries(n, 3, seed):
+        body: Dict = {"top_k": top_k}
+        for tail, relation in criteria:
+            if relation == "hasCuisineRegion":
+                body["cuisine_region"] = tail[len("cuisine_region_"):]
+            elif relation in fields:
+                key, prefix = fields[relation]
+                body.setdefault(key, []).append(tail[len(prefix):])
+        bodies.append(body)
+    return bodies
+
+async def run_load(app: FastAPI, bodies: List[Dict], concurrency: int) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal next_index, errors
+        while next_index < len(bodies):
+            body = bodies[next_index]
+            next_index += 1
+            start = time.perf_counter()
+            response = await client.post("/recommend", json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+    return {
+        "throughput": len(bodies) / elapsed,
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+        "p99": float(np.percentile(latencies, 99)),
+        "errors": errors,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test /recommend in process.")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--mode", choices=["direct", "batched", "both"], default="both")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--window-ms", type=float, default=None, help="override RECOMMEND_BATCH_WINDOW_MS")
+    parser.add_argument("--stats", action="store_true", help="print scheduler histograms after batched runs")
+    args = parser.parse_args()
+
+    recommender.DEBUG = False
+    if args.window_ms is not None:
+        recommender.recommend_scheduler.window_ms = args.window_ms
+    app = build_app()
+    bodies = sample_bodies(args.requests, args.top_k, args.seed)
+    modes = ["direct", "batched"] if args.mode == "both" else [args.mode]
+
+    for concurrency in args.concurrency:
+        for mode in modes:
+            recommender.MICRO_BATCHING = mode == "batched"
+            result = asyncio.run(run_load(app, bodies, concurrency))
+            print(
+                f"concurrency={concurrency:<4} {mode:<8} {result['throughput']:8.1f} req/s   "
+                f"p50 {result['p50']:7.2f} ms   p95 {result['p95']:7.2f} ms   p99 {result['p99']:7.2f} ms   "
+                f"errors {result['errors']}"
+            )
+    if args.stats:
+        print(json.dumps(recommender.recommend_scheduler.stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
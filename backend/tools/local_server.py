@@ -0,0 +1,22 @@
+"""
+Runs an ASGI app on a local port in a background thread, for benchmarks that need a
+real HTTP server (streamed responses, fake upstream APIs).
+"""
+import time
+import socket
+import threading
+import uvicorn
+from fastapi import FastAPI
+
+def start_server(app: FastAPI) -> str:
+    """
+    Serves `app` on a free local port and returns its base URL once it accepts requests.
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"